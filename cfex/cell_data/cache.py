@@ -0,0 +1,474 @@
+import os
+import uuid
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+from cfex.cell_data.polygons import as_polygon_array
+
+
+class TileCache:
+    """
+    Thread-safe cache of decoded WSI tiles with a byte budget and LRU eviction.
+
+    Tiles are keyed by (slide, level, tile x index, tile y index) on a grid
+    of square tiles with a given side length.
+
+    Parameters
+    ----------
+    max_bytes : int, optional, default 512 MiB
+        Maximum total size of cached tiles in bytes.
+    tile_size : int, optional, default 512
+        Side length of a cached tile.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = 512 * 2**20,
+        tile_size: Optional[int] = 512,
+    ):
+        self.max_bytes = max_bytes
+        self.tile_size = tile_size
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def get(self, key: Hashable, read_tile: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Get a tile from the cache, reading and storing it on a miss.
+
+        Parameters
+        ----------
+        key : hashable
+            Tuple with slide identifier, level and tile grid coordinates.
+        read_tile : callable
+            Function without arguments returning tile pixels, called on a cache miss.
+
+        Returns
+        -------
+        ndarray
+            Read-only tile image.
+        """
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+        # decode outside of the lock so that other threads are not blocked
+        tile = np.asarray(read_tile())
+        tile.flags.writeable = False
+        with self._lock:
+            if key not in self._tiles and tile.nbytes <= self.max_bytes:
+                self._tiles[key] = tile
+                self.current_bytes += tile.nbytes
+                while self.current_bytes > self.max_bytes:
+                    _, evicted_tile = self._tiles.popitem(last=False)
+                    self.current_bytes -= evicted_tile.nbytes
+        return tile
+
+    def clear(self):
+        """
+        Remove all tiles from the cache and reset its counters.
+        """
+        with self._lock:
+            self._tiles.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Dictionary with hit and miss counts, amount of cached tiles and their size in bytes.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "tiles": len(self._tiles),
+            "bytes": self.current_bytes,
+        }
+
+
+def _update_wsi_hash(key_hash, wsi_path: Union[str, Path]):
+    wsi_path = Path(wsi_path).resolve()
+    wsi_stat = wsi_path.stat()
+    key_hash.update(
+        f"{wsi_path}|{wsi_stat.st_size}|{wsi_stat.st_mtime_ns}".encode("utf-8")
+    )
+
+
+def calculate_wsi_cache_key(wsi_path: Union[str, Path], **parameters) -> str:
+    """
+    Calculate a key identifying data derived from the whole WSI.
+
+    The key is a hash of the WSI path, size and modification time
+    and given parameters.
+
+    Parameters
+    ----------
+    wsi_path : str or Path
+        Path to the WSI.
+    **parameters
+        Parameters affecting the derived data.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the key.
+    """
+    key_hash = hashlib.sha256()
+    _update_wsi_hash(key_hash, wsi_path)
+    key_hash.update(repr(sorted(parameters.items())).encode("utf-8"))
+    return key_hash.hexdigest()
+
+
+def calculate_cell_images_cache_key(
+    wsi_path: Union[str, Path], cell_polygons: Sequence, **parameters
+) -> str:
+    """
+    Calculate a key identifying cell images loaded from a WSI.
+
+    The key is a hash of the WSI path, size and modification time,
+    cell polygon coordinates and given loading parameters.
+
+    Parameters
+    ----------
+    wsi_path : str or Path
+        Path to the WSI from which the cell images are loaded.
+    cell_polygons : PolygonArray, Series or array-like
+        Polygons of cells defining loaded regions.
+    **parameters
+        Loading parameters affecting the cell images, e.g. bounding_box_margin.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the key.
+    """
+    cell_polygons = as_polygon_array(cell_polygons)
+    key_hash = hashlib.sha256()
+    _update_wsi_hash(key_hash, wsi_path)
+    key_hash.update(np.ascontiguousarray(cell_polygons.coordinates).tobytes())
+    key_hash.update(np.ascontiguousarray(cell_polygons.offsets).tobytes())
+    key_hash.update(repr(sorted(parameters.items())).encode("utf-8"))
+    return key_hash.hexdigest()
+
+
+def calculate_cell_cache_keys(
+    wsi_path: Union[str, Path], cell_polygon_columns: Sequence, **parameters
+) -> np.ndarray:
+    """
+    Calculate keys identifying results of processing every single cell.
+
+    A key is a hash of the WSI path, size and modification time,
+    coordinates of the cell polygons and given processing parameters,
+    so it only changes for cells that are new or edited.
+
+    Parameters
+    ----------
+    wsi_path : str or Path
+        Path to the WSI containing the cells.
+    cell_polygon_columns : array-like of PolygonArray, Series or array-like
+        Columns with polygons of cells, e.g. cell and nucleus polygons.
+    **parameters
+        Parameters affecting the results, e.g. bounding_box_margin.
+
+    Returns
+    -------
+    ndarray
+        Array with a hexadecimal digest of the key of every cell.
+    """
+    base_hash = hashlib.sha256()
+    _update_wsi_hash(base_hash, wsi_path)
+    base_hash.update(repr(sorted(parameters.items())).encode("utf-8"))
+    polygon_arrays = [as_polygon_array(polygons) for polygons in cell_polygon_columns]
+    cell_cache_keys = []
+    for i in range(len(polygon_arrays[0]) if polygon_arrays else 0):
+        key_hash = base_hash.copy()
+        for polygons in polygon_arrays:
+            start, stop = polygons.offsets[i], polygons.offsets[i + 1]
+            # vertex counts separate polygons of consecutive columns
+            key_hash.update(np.int64(stop - start).tobytes())
+            key_hash.update(polygons.coordinates[start:stop].tobytes())
+        cell_cache_keys.append(key_hash.hexdigest())
+    return np.array(cell_cache_keys, dtype=str)
+
+
+def save_cell_images_cache(
+    cache_path: Union[str, Path], cell_image_list: Sequence[np.ndarray]
+):
+    """
+    Save cell images to a pair of .npy files: a flat pixel buffer and an index.
+
+    Index rows contain the offset of the image in the buffer followed by its shape.
+    The index is written last, so a partially written cache is never loaded.
+
+    Parameters
+    ----------
+    cache_path : str or Path
+        Path to the cache files without suffix.
+    cell_image_list : array-like of ndarray
+        List containing cell images of equal dimensionality.
+    """
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    dtype = cell_image_list[0].dtype if len(cell_image_list) else np.uint8
+    ndim = cell_image_list[0].ndim if len(cell_image_list) else 3
+    index = np.zeros((len(cell_image_list), ndim + 1), dtype=np.int64)
+    for i, cell_image in enumerate(cell_image_list):
+        index[i, 1:] = cell_image.shape
+    sizes = index[:, 1:].prod(axis=1)
+    index[1:, 0] = np.cumsum(sizes)[:-1]
+    # temporary files are unique, so concurrent writers of a key do not collide
+    tmp_suffix = f".{uuid.uuid4().hex}.tmp"
+    buffer_path = cache_path.with_suffix(f".npy{tmp_suffix}")
+    buffer = np.lib.format.open_memmap(
+        buffer_path, mode="w+", dtype=dtype, shape=(int(sizes.sum()),)
+    )
+    for (offset, *_), size, cell_image in zip(index, sizes, cell_image_list):
+        buffer[offset : offset + size] = np.ravel(cell_image)
+    buffer.flush()
+    del buffer
+    os.replace(buffer_path, cache_path.with_suffix(".npy"))
+    index_path = cache_path.with_suffix(f".index{tmp_suffix}")
+    with open(index_path, "wb") as index_file:
+        np.save(index_file, index)
+    os.replace(index_path, cache_path.with_suffix(".index.npy"))
+
+
+def load_cell_images_cache(
+    cache_path: Union[str, Path]
+) -> Optional[List[np.ndarray]]:
+    """
+    Load cell images saved with save_cell_images_cache as memory-mapped views.
+
+    Parameters
+    ----------
+    cache_path : str or Path
+        Path to the cache files without suffix.
+
+    Returns
+    -------
+    list of ndarray or None
+        List containing read-only cell images or None if the cache does not exist.
+    """
+    cache_path = Path(cache_path)
+    index_path = cache_path.with_suffix(".index.npy")
+    if not index_path.exists():
+        return None
+    index = np.load(index_path)
+    buffer = np.load(cache_path.with_suffix(".npy"), mmap_mode="r")
+    cell_image_list = []
+    for offset, *shape in index.tolist():
+        size = int(np.prod(shape))
+        cell_image_list.append(buffer[offset : offset + size].reshape(shape))
+    return cell_image_list
+
+
+class CellResultCache:
+    """
+    Content-addressed cache of results of processing single cells:
+    labels, segmentation status, object masks and features.
+
+    Results of every saved group of cells are written once to a new pack directory,
+    its keys are written last, so a partially written pack is never loaded.
+    Cells are looked up by keys calculated with calculate_cell_cache_keys,
+    a result saved for the same key in several packs is taken from any of them.
+
+    Parameters
+    ----------
+    cache_path : str or Path
+        Path to the cache directory, created if it does not exist.
+    """
+
+    def __init__(self, cache_path: Union[str, Path]):
+        self.cache_path = Path(cache_path)
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self._index = {}
+        self._packs = {}
+        for keys_path in sorted(self.cache_path.glob("pack_*/keys.npy")):
+            self._add_pack_keys(keys_path.parent.name, np.load(keys_path))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _add_pack_keys(self, pack_name: str, cell_cache_keys: np.ndarray):
+        for position, cell_cache_key in enumerate(cell_cache_keys.tolist()):
+            self._index[cell_cache_key] = (pack_name, position)
+
+    def _load_pack(self, pack_name: str) -> Dict:
+        pack = self._packs.get(pack_name)
+        if pack is None:
+            pack_path = self.cache_path / pack_name
+            segmentation_status = np.load(pack_path / "segmentation_status.npy")
+            mask_names = [
+                mask_index_path.name.split(".")[0]
+                for mask_index_path in pack_path.glob("*Mask.index.npy")
+            ]
+            features_path = pack_path / "features.parquet"
+            cell_features_data = None
+            if features_path.exists():
+                cell_features_data = pd.read_parquet(features_path, engine="pyarrow")
+            pack = {
+                "labels": load_cell_images_cache(pack_path / "labels"),
+                "segmentation_status": segmentation_status,
+                # masks and features are only stored for segmented cells
+                "segmented_positions": np.cumsum(segmentation_status) - 1,
+                "masks": {
+                    mask_name: load_cell_images_cache(pack_path / mask_name)
+                    for mask_name in mask_names
+                },
+                "features": cell_features_data,
+            }
+            self._packs[pack_name] = pack
+        return pack
+
+    def contains(self, cell_cache_keys: Sequence[str]) -> np.ndarray:
+        """
+        Check which cells have cached results.
+
+        Parameters
+        ----------
+        cell_cache_keys : array-like of str
+            Keys of cells.
+
+        Returns
+        -------
+        ndarray
+            Boolean array, True for cells with cached results.
+        """
+        return np.fromiter(
+            (cell_cache_key in self._index for cell_cache_key in cell_cache_keys),
+            dtype=bool,
+            count=len(cell_cache_keys),
+        )
+
+    def save(
+        self,
+        cell_cache_keys: Sequence[str],
+        cell_detected_nucleus_list: Sequence[np.ndarray],
+        segmentation_status: np.ndarray,
+        object_masks: Dict[str, Sequence[Optional[np.ndarray]]],
+        cell_features_data: Optional[pd.DataFrame] = None,
+    ) -> Optional[Path]:
+        """
+        Save results of a group of cells to a new pack.
+
+        Parameters
+        ----------
+        cell_cache_keys : array-like of str
+            Keys of cells.
+        cell_detected_nucleus_list : array-like of ndarray
+            List of cell labels.
+        segmentation_status : ndarray
+            Boolean array, True for cells with a detected nucleus.
+        object_masks : dict
+            Dictionary with lists of object masks of all cells by mask names,
+            masks of cells without a detected nucleus are ignored.
+        cell_features_data : DataFrame, optional, default None
+            DataFrame with a row of features for every segmented cell in order.
+
+        Returns
+        -------
+        Path or None
+            Path to the pack directory or None if no cells were given.
+        """
+        if not len(cell_cache_keys):
+            return None
+        pack_name = f"pack_{uuid.uuid4().hex}"
+        pack_path = self.cache_path / pack_name
+        pack_path.mkdir()
+        save_cell_images_cache(pack_path / "labels", cell_detected_nucleus_list)
+        np.save(pack_path / "segmentation_status.npy", segmentation_status)
+        for mask_name, mask_list in object_masks.items():
+            segmented_mask_list = [
+                mask for mask, status in zip(mask_list, segmentation_status) if status
+            ]
+            save_cell_images_cache(pack_path / mask_name, segmented_mask_list)
+        if cell_features_data is not None:
+            cell_features_data.reset_index(drop=True).to_parquet(
+                pack_path / "features.parquet", engine="pyarrow"
+            )
+        cell_cache_keys = np.asarray(cell_cache_keys, dtype=str)
+        keys_tmp_path = pack_path / "keys.tmp"
+        with open(keys_tmp_path, "wb") as keys_file:
+            np.save(keys_file, cell_cache_keys)
+        os.replace(keys_tmp_path, pack_path / "keys.npy")
+        self._add_pack_keys(pack_name, cell_cache_keys)
+        return pack_path
+
+    def load(
+        self, cell_cache_keys: Sequence[str]
+    ) -> Tuple[
+        List[np.ndarray],
+        np.ndarray,
+        Dict[str, List[Optional[np.ndarray]]],
+        Optional[pd.DataFrame],
+    ]:
+        """
+        Load cached results of cells.
+
+        Parameters
+        ----------
+        cell_cache_keys : array-like of str
+            Keys of cells with cached results.
+
+        Returns
+        -------
+        tuple of list, ndarray, dict and DataFrame or None
+            List of cell labels, segmentation status, dictionary with lists
+            of object masks by mask names (None for cells without a detected nucleus)
+            and DataFrame with a row of features for every segmented cell in order,
+            None if features of some of the cells were not cached.
+        """
+        cell_detected_nucleus_list = []
+        segmentation_status = np.zeros(len(cell_cache_keys), dtype=bool)
+        object_masks = {}
+        feature_rows = {}
+        segmented_count = 0
+        for i, cell_cache_key in enumerate(cell_cache_keys):
+            pack_name, position = self._index[cell_cache_key]
+            pack = self._load_pack(pack_name)
+            cell_detected_nucleus_list.append(pack["labels"][position])
+            segmentation_status[i] = pack["segmentation_status"][position]
+            segmented_position = pack["segmented_positions"][position]
+            for mask_name, mask_list in pack["masks"].items():
+                object_masks.setdefault(mask_name, [None] * len(cell_cache_keys))
+                if segmentation_status[i]:
+                    object_masks[mask_name][i] = mask_list[segmented_position]
+            if segmentation_status[i]:
+                feature_rows.setdefault(pack_name, []).append(
+                    (segmented_count, segmented_position)
+                )
+                segmented_count += 1
+        cell_features_data = None
+        if all(self._packs[name]["features"] is not None for name in feature_rows):
+            feature_orders, feature_frames = [], []
+            for pack_name, rows in feature_rows.items():
+                orders, positions = zip(*rows)
+                feature_orders.extend(orders)
+                feature_frames.append(
+                    self._packs[pack_name]["features"].iloc[list(positions)]
+                )
+            if feature_frames:
+                cell_features_data = pd.concat(feature_frames).iloc[
+                    np.argsort(feature_orders)
+                ]
+                cell_features_data.reset_index(drop=True, inplace=True)
+        return (
+            cell_detected_nucleus_list,
+            segmentation_status,
+            object_masks,
+            cell_features_data,
+        )
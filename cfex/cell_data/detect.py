@@ -1,4 +1,8 @@
+import os
+import functools
+import multiprocessing
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 from typing import Union, Optional, Sequence, Tuple, List, Dict 
 
@@ -11,40 +15,356 @@ def get_cell_box_segmentation_status(cell_box_labels: np.ndarray) -> bool:
     return bool(cell_box_labels[cell_box_image_center])
 
 
+def get_segmentation_status(
+    cell_detected_nucleus_list: Sequence[np.ndarray],
+) -> np.ndarray:
+    """
+    Check which cell boxes have a detected nucleus at their center.
+
+    Parameters
+    ----------
+    cell_detected_nucleus_list : array-like of ndarray
+        List of cell labels.
+
+    Returns
+    -------
+    ndarray
+        Boolean array, True for cells segmented by the instance segmentation.
+    """
+    return np.fromiter(
+        (
+            get_cell_box_segmentation_status(labels)
+            for labels in cell_detected_nucleus_list
+        ),
+        dtype=bool,
+        count=len(cell_detected_nucleus_list),
+    )
+
+
+# the model is loaded once per process and reused by every chunk of a run
+@functools.lru_cache(maxsize=None)
+def _load_model_stardist():
+    from stardist.models import StarDist2D
+
+    return StarDist2D.from_pretrained("2D_versatile_he")
+
+
+def _normalize_image_stardist(
+    image: np.ndarray,
+    normalization_statistics: Optional[Tuple[float, float]] = None,
+) -> np.ndarray:
+    if normalization_statistics is not None:
+        return normalize_image(image, normalization_statistics)
+    from csbdeep.utils import normalize
+
+    return normalize(image, 1, 99.8, axis=(0, 1, 2))
+
+
+def calculate_normalization_statistics(
+    image_list: Sequence[np.ndarray],
+    lower_percentile: Optional[float] = 1,
+    upper_percentile: Optional[float] = 99.8,
+) -> Tuple[float, float]:
+    """
+    Calculate intensity percentiles over all pixels of given images.
+
+    Parameters
+    ----------
+    image_list : array-like of ndarray
+        List containing images, e.g. tissue tiles sampled from the WSI.
+    lower_percentile : float, optional, default 1
+        Percentile mapped to 0 by the normalization.
+    upper_percentile : float, optional, default 99.8
+        Percentile mapped to 1 by the normalization.
+
+    Returns
+    -------
+    tuple of float
+        Tuple with the lower and the upper intensity percentile.
+    """
+    pixel_values = np.concatenate([np.ravel(image) for image in image_list])
+    lower_value, upper_value = np.percentile(
+        pixel_values, (lower_percentile, upper_percentile)
+    )
+    return float(lower_value), float(upper_value)
+
+
+def normalize_image(
+    image: np.ndarray, normalization_statistics: Tuple[float, float]
+) -> np.ndarray:
+    """
+    Apply an affine intensity normalization with precomputed percentiles.
+
+    Parameters
+    ----------
+    image : ndarray
+        Image or a stack of images.
+    normalization_statistics : tuple of float
+        Tuple with intensity values mapped to 0 and 1.
+
+    Returns
+    -------
+    ndarray
+        Normalized float32 image.
+    """
+    lower_value, upper_value = normalization_statistics
+    scale = np.float32(1 / (upper_value - lower_value + 1e-20))
+    return (np.asarray(image, dtype=np.float32) - np.float32(lower_value)) * scale
+
+
+def _predict_labels_stardist(model, image: np.ndarray) -> np.ndarray:
+    labels, _ = model.predict_instances(
+        image,
+        show_tile_progress=False,
+        verbose=False,
+    )
+    return labels
+
+
+def build_image_mosaic(
+    image_list: Sequence[np.ndarray],
+    mosaic_gap: Optional[int] = 16,
+    fill_value: Optional[float] = 1.0,
+) -> Tuple[np.ndarray, List[Tuple[int]]]:
+    """
+    Arrange images of the same shape into a square grid separated by filled gaps.
+
+    Returns a mosaic image and positions of the given images in the mosaic.
+
+    Parameters
+    ----------
+    image_list : array-like of ndarray
+        List containing images of the same shape.
+    mosaic_gap : int, optional, default 16
+        Width of the gap between neighbouring images in pixels.
+    fill_value : float, optional, default 1.0
+        Value of the gap pixels, by default white in a normalized image.
+
+    Returns
+    -------
+    tuple of ndarray and list
+        Mosaic image as the first element and a list of tuples with
+        y, x coordinates of the upper left corner of every image as the second element.
+    """
+    image_height, image_width = image_list[0].shape[:2]
+    column_count = int(np.ceil(np.sqrt(len(image_list))))
+    row_count = int(np.ceil(len(image_list) / column_count))
+    step_y, step_x = image_height + mosaic_gap, image_width + mosaic_gap
+    mosaic = np.full(
+        (row_count * step_y - mosaic_gap, column_count * step_x - mosaic_gap)
+        + image_list[0].shape[2:],
+        fill_value,
+        dtype=image_list[0].dtype,
+    )
+    positions = []
+    for i, image in enumerate(image_list):
+        position_y = (i // column_count) * step_y
+        position_x = (i % column_count) * step_x
+        mosaic[
+            position_y : position_y + image_height,
+            position_x : position_x + image_width,
+        ] = image
+        positions.append((position_y, position_x))
+    return mosaic, positions
+
+
+def _predict_labels_batched_stardist(
+    model,
+    cell_image_list: Sequence[np.ndarray],
+    batch_size: int,
+    show_progress: Optional[bool],
+    normalization_statistics: Optional[Tuple[float, float]] = None,
+) -> List[np.ndarray]:
+    progress_bar = tqdm(total=len(cell_image_list), disable=not show_progress)
+    cell_detected_nucleus_list = [None] * len(cell_image_list)
+    if batch_size <= 1:
+        for i, image in enumerate(cell_image_list):
+            cell_detected_nucleus_list[i] = _predict_labels_stardist(
+                model, _normalize_image_stardist(image, normalization_statistics)
+            )
+            progress_bar.update()
+        progress_bar.close()
+        return cell_detected_nucleus_list
+    # only images of the same shape can share a mosaic
+    shape_groups = {}
+    for i, image in enumerate(cell_image_list):
+        shape_groups.setdefault(image.shape, []).append(i)
+    for image_indices in shape_groups.values():
+        for batch_start in range(0, len(image_indices), batch_size):
+            batch_indices = image_indices[batch_start : batch_start + batch_size]
+            mosaic, positions = build_image_mosaic(
+                [
+                    _normalize_image_stardist(
+                        cell_image_list[i], normalization_statistics
+                    )
+                    for i in batch_indices
+                ]
+            )
+            mosaic_labels = _predict_labels_stardist(model, mosaic)
+            for i, (position_y, position_x) in zip(batch_indices, positions):
+                image_height, image_width = cell_image_list[i].shape[:2]
+                cell_detected_nucleus_list[i] = mosaic_labels[
+                    position_y : position_y + image_height,
+                    position_x : position_x + image_width,
+                ]
+            progress_bar.update(len(batch_indices))
+    progress_bar.close()
+    return cell_detected_nucleus_list
+
+
+# model loaded once by every worker process of a sharded detection run
+_worker_model = None
+
+
+def _initialize_worker_stardist(thread_count: int):
+    global _worker_model
+    os.environ["OMP_NUM_THREADS"] = str(thread_count)
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(thread_count)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    _worker_model = _load_model_stardist()
+
+
+def _predict_labels_shard_stardist(
+    cell_image_shard: Sequence[np.ndarray],
+    batch_size: int,
+    normalization_statistics: Optional[Tuple[float, float]] = None,
+) -> List[np.ndarray]:
+    return _predict_labels_batched_stardist(
+        _worker_model,
+        cell_image_shard,
+        batch_size,
+        show_progress=False,
+        normalization_statistics=normalization_statistics,
+    )
+
+
+class CellDetectionPool:
+    """
+    Pool of worker processes running cell instance segmentation.
+
+    Every worker process loads its model once and is limited to its share
+    of CPU threads. The pool is meant to be created once per run and passed
+    to every detect_cells call, it can be used as a context manager.
+
+    Parameters
+    ----------
+    cell_detection_backend : str
+        Name of the supported cell detection backend.
+    workers : int
+        Amount of worker processes.
+    """
+
+    def __init__(self, cell_detection_backend: str, workers: int):
+        if cell_detection_backend not in CellDetectionBackend.values():
+            raise ValueError(
+                f"Unsupported cell detection backend: {cell_detection_backend}"
+            )
+        self.cell_detection_backend = cell_detection_backend
+        self.workers = workers
+        thread_count = max(1, (os.cpu_count() or 1) // workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=globals()[f"_initialize_worker_{cell_detection_backend}"],
+            initargs=(thread_count,),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def shutdown(self):
+        """
+        Stop the worker processes of the pool, cancelling pending work.
+        """
+        self.executor.shutdown(cancel_futures=True)
+
+
+def _predict_labels_sharded_stardist(
+    cell_image_list: Sequence[np.ndarray],
+    batch_size: int,
+    detection_pool: CellDetectionPool,
+    show_progress: Optional[bool],
+    normalization_statistics: Optional[Tuple[float, float]] = None,
+) -> List[np.ndarray]:
+    shard_size = max(
+        1, int(np.ceil(len(cell_image_list) / (detection_pool.workers * 4)))
+    )
+    shard_starts = range(0, len(cell_image_list), shard_size)
+    progress_bar = tqdm(total=len(cell_image_list), disable=not show_progress)
+    cell_detected_nucleus_list = [None] * len(cell_image_list)
+    futures = {
+        detection_pool.executor.submit(
+            _predict_labels_shard_stardist,
+            [np.asarray(image) for image in cell_image_list[i : i + shard_size]],
+            batch_size,
+            normalization_statistics,
+        ): i
+        for i in shard_starts
+    }
+    for future in as_completed(futures):
+        shard_start = futures[future]
+        shard_labels = future.result()
+        cell_detected_nucleus_list[
+            shard_start : shard_start + len(shard_labels)
+        ] = shard_labels
+        progress_bar.update(len(shard_labels))
+    progress_bar.close()
+    return cell_detected_nucleus_list
+
+
 def _detect_cells_stardist(
     cell_image_list: Sequence[np.ndarray],
     stash_undetected: Optional[bool],
     show_progress: Optional[bool],
+    batch_size: Optional[int] = 1,
+    workers: Optional[int] = 1,
+    normalization_statistics: Optional[Tuple[float, float]] = None,
+    detection_pool: Optional[CellDetectionPool] = None,
 ) -> Union[List[np.ndarray], Tuple[List[np.ndarray], Dict]]:
-    from stardist.plot import render_label
-    from csbdeep.utils import normalize
-    from stardist.models import StarDist2D
-
-    model = StarDist2D.from_pretrained("2D_versatile_he")
-    segmented_count = 0
-    unsegmented_cell_data = []
-    cell_detected_nucleus_list = []
-    cell_image_iterable = enumerate(cell_image_list)
-    if show_progress:
-        cell_image_iterable = tqdm(cell_image_iterable)
-    for i, image in cell_image_iterable:
-        labels, _ = model.predict_instances(
-            normalize(image, 1, 99.8, axis=(0, 1, 2)),
-            show_tile_progress=False,
-            verbose=False,
+    if detection_pool is not None:
+        cell_detected_nucleus_list = _predict_labels_sharded_stardist(
+            cell_image_list,
+            batch_size,
+            detection_pool,
+            show_progress,
+            normalization_statistics=normalization_statistics,
         )
-        segmentation_status = get_cell_box_segmentation_status(labels)
-        cell_detected_nucleus_list.append(labels)
-        if segmentation_status:
-            segmented_count += 1
-        else:
-            predictions_overlayed = render_label(labels, img=image)
-            unsegmented_cell_data.append(
-                {"id": i, "labeled_image": predictions_overlayed}
+    elif workers > 1:
+        with CellDetectionPool("stardist", workers) as detection_pool:
+            cell_detected_nucleus_list = _predict_labels_sharded_stardist(
+                cell_image_list,
+                batch_size,
+                detection_pool,
+                show_progress,
+                normalization_statistics=normalization_statistics,
             )
+    else:
+        model = _load_model_stardist()
+        cell_detected_nucleus_list = _predict_labels_batched_stardist(
+            model,
+            cell_image_list,
+            batch_size,
+            show_progress,
+            normalization_statistics=normalization_statistics,
+        )
     # TODO: check why cells are correctly segmented by
     # StarDist more often (46 > 43) on smaller cell boxes
     if stash_undetected:
+        from stardist.plot import render_label
+
+        # overlays are only rendered for undetected cells when they are stashed
+        unsegmented_cell_data = [
+            {"id": i, "labeled_image": render_label(labels, img=image)}
+            for i, (image, labels) in enumerate(
+                zip(cell_image_list, cell_detected_nucleus_list)
+            )
+            if not get_cell_box_segmentation_status(labels)
+        ]
         return (cell_detected_nucleus_list, unsegmented_cell_data)
     return cell_detected_nucleus_list
 
@@ -54,6 +374,10 @@ def detect_cells(
     cell_detection_backend: str,
     stash_undetected: Optional[bool] = False,
     show_progress: Optional[bool] = False,
+    batch_size: Optional[int] = 1,
+    workers: Optional[int] = 1,
+    normalization_statistics: Optional[Tuple[float, float]] = None,
+    detection_pool: Optional[CellDetectionPool] = None,
 ) -> Union[List[np.ndarray], Tuple[List[np.ndarray], Dict]]:
     """
     Run cell instance segmentation on a given list of images.
@@ -73,6 +397,21 @@ def detect_cells(
         to be returned by the function as a second element of a tuple.
     show_progress: bool, optional, default False
         Flag for printing cell instance segmentation progress to stdout.
+    batch_size : int, optional, default 1
+        Amount of images of the same shape segmented by a single model call.
+        Images of a batch are normalized separately, arranged into a mosaic
+        with gaps between them, and labels are sliced back per image.
+    workers : int, optional, default 1
+        Amount of processes segmenting contiguous shards of images, each loading
+        its own model and limited to its share of CPU threads.
+        Order of the returned labels follows cell_image_list regardless of the amount.
+    normalization_statistics : tuple of float, optional, default None
+        Intensity values mapped to 0 and 1 for all images (e.g. percentiles
+        calculated once per slide), by default every image is normalized
+        with its own percentiles.
+    detection_pool : CellDetectionPool, optional, default None
+        Pool of worker processes created once per run, used instead of
+        creating a pool of the given amount of workers for every call.
 
     Returns
     -------
@@ -87,4 +426,8 @@ def detect_cells(
             cell_image_list=cell_image_list,
             show_progress=show_progress,
             stash_undetected=stash_undetected,
+            batch_size=batch_size,
+            workers=workers,
+            normalization_statistics=normalization_statistics,
+            detection_pool=detection_pool,
         )
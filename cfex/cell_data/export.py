@@ -1,13 +1,186 @@
 import arrow
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Union, Optional, Sequence
+from typing import Dict, List, Union, Optional, Sequence
 from skimage.io import imsave
 from tqdm import tqdm
 
-from cfex.cell_data.geometry import calculate_centroid
+from cfex.enums import CellImageExportFormat
+from cfex.cell_data.geometry import calculate_pixel_centroids
 
-# TODO: prepare images for a pipeline run in-memory
+CELL_IMAGES_ARCHIVE_FILENAME = "cells.h5"
+CELL_IMAGES_ARCHIVE_CHUNK_SIZE = 2**16
+
+
+def create_cell_images_directory(export_path: Union[str, Path]) -> Path:
+    """
+    Create a timestamped directory for cell image files.
+
+    Parameters
+    ----------
+    export_path : str or Path
+        Path to the output directory.
+
+    Returns
+    -------
+    Path
+        Path to the created directory.
+    """
+    cell_images_dirname = Path(f"cells_{arrow.now().isoformat()}")
+    cell_images_path = Path(export_path) / cell_images_dirname
+    cell_images_path.mkdir(parents=True, exist_ok=True)
+    return cell_images_path
+
+
+def create_cell_image_filenames(cell_data: pd.DataFrame) -> List[str]:
+    """
+    Create names of cell image files without suffixes.
+
+    A name contains the cell index, target class, nucleus centroid coordinates
+    and WSI name, e.g. cell12_Tumor_1024_2048_scan.
+
+    Parameters
+    ----------
+    cell_data : DataFrame
+        DataFrame containing NucleusPolygon and WSI columns
+        and optionally a Target column.
+
+    Returns
+    -------
+    list of str
+        List containing a file name for every cell.
+    """
+    nucleus_centroids = calculate_pixel_centroids(cell_data["NucleusPolygon"])
+    if "Target" in cell_data.columns:
+        target_names = cell_data["Target"].tolist()
+    else:
+        target_names = ["n"] * len(cell_data.index)
+    return [
+        f"cell{i}_{target_name}_{centroid_x}_{centroid_y}_{scan_name}"
+        for i, target_name, (centroid_x, centroid_y), scan_name in zip(
+            cell_data.index, target_names, nucleus_centroids, cell_data["WSI"]
+        )
+    ]
+
+
+def _save_cell_image_files(
+    cell_images_path: Path,
+    cell_image_filename: str,
+    cell_image: np.ndarray,
+    cell_masks: Dict[str, np.ndarray],
+):
+    imsave(
+        cell_images_path / f"{cell_image_filename}.png",
+        cell_image,
+        check_contrast=False,
+    )
+    for mask_name, mask in cell_masks.items():
+        imsave(
+            cell_images_path / f"{cell_image_filename}_{mask_name}.tif",
+            mask.astype("uint16"),
+            check_contrast=False,
+        )
+
+
+def _save_cell_objects_image_data_files(
+    cell_data: pd.DataFrame,
+    cell_images_path: Path,
+    mask_names: Sequence[str],
+    show_progress: bool,
+    workers: int,
+):
+    cell_image_filenames = create_cell_image_filenames(cell_data)
+    cell_images = cell_data["ColorImage"].tolist()
+    cell_mask_lists = {
+        mask_name: cell_data[mask_name].tolist() for mask_name in mask_names
+    }
+    # writing files is bound by storage latency, so threads overlap the writes
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _save_cell_image_files,
+                cell_images_path,
+                cell_image_filename,
+                cell_image,
+                {
+                    mask_name: mask_list[i]
+                    for mask_name, mask_list in cell_mask_lists.items()
+                },
+            )
+            for i, (cell_image_filename, cell_image) in enumerate(
+                zip(cell_image_filenames, cell_images)
+            )
+        ]
+        completed_futures = as_completed(futures)
+        if show_progress:
+            completed_futures = tqdm(completed_futures, total=len(futures))
+        for future in completed_futures:
+            future.result()
+
+
+def _append_archive_dataset(archive, dataset_name: str, values: np.ndarray):
+    if dataset_name not in archive:
+        row_size = max(int(np.prod(values.shape[1:])), 1)
+        archive.create_dataset(
+            dataset_name,
+            shape=(0, *values.shape[1:]),
+            maxshape=(None, *values.shape[1:]),
+            dtype=values.dtype,
+            chunks=(CELL_IMAGES_ARCHIVE_CHUNK_SIZE // row_size, *values.shape[1:]),
+            compression="gzip",
+        )
+    dataset = archive[dataset_name]
+    start = dataset.shape[0]
+    dataset.resize(start + len(values), axis=0)
+    dataset[start:] = values
+
+
+def _save_cell_objects_image_data_hdf5(
+    cell_data: pd.DataFrame,
+    cell_images_path: Path,
+    mask_names: Sequence[str],
+    show_progress: bool,
+    workers: int,
+):
+    import h5py
+
+    if cell_data.empty:
+        return
+    cell_image_filenames = create_cell_image_filenames(cell_data)
+    # cells of every call are appended, so chunks of a run share the archive
+    with h5py.File(cell_images_path / CELL_IMAGES_ARCHIVE_FILENAME, "a") as archive:
+        cell_count = archive["CellId"].shape[0] if "CellId" in archive else 0
+        image_names = ["ColorImage", *mask_names]
+        if show_progress:
+            image_names = tqdm(image_names)
+        for image_name in image_names:
+            image_list = cell_data[image_name].tolist()
+            group = archive.require_group(image_name)
+            if "offsets" in group and group["offsets"].shape[0] > cell_count:
+                # rows of an interrupted call are not indexed and are overwritten
+                pixel_count = group["offsets"][cell_count]
+                for dataset_name in ("offsets", "shapes"):
+                    group[dataset_name].resize(cell_count, axis=0)
+                group["pixels"].resize(pixel_count, axis=0)
+            shapes = np.array([np.shape(image) for image in image_list], dtype=np.int64)
+            sizes = shapes.prod(axis=1)
+            start = group["pixels"].shape[0] if "pixels" in group else 0
+            offsets = start + np.cumsum(sizes) - sizes
+            pixels = np.concatenate([np.ravel(image) for image in image_list])
+            _append_archive_dataset(group, "pixels", pixels)
+            _append_archive_dataset(group, "offsets", offsets)
+            _append_archive_dataset(group, "shapes", shapes)
+        # cells are indexed only after all of their pixel data is written
+        _append_archive_dataset(
+            archive, "CellId", np.asarray(cell_data.index, dtype=np.int64)
+        )
+        _append_archive_dataset(
+            archive,
+            "FileName",
+            np.array(cell_image_filenames, dtype=h5py.string_dtype()),
+        )
 
 
 def save_cell_objects_image_data(
@@ -15,6 +188,9 @@ def save_cell_objects_image_data(
     export_path: Union[str, Path],
     include_masks: Optional[Sequence[str]] = ["nucleus", "outline"],
     show_progress: Optional[bool] = False,
+    create_subdirectory: Optional[bool] = True,
+    export_format: Optional[str] = "files",
+    workers: Optional[int] = 1,
 ):
     """
     Save images of cells within the bounds of regions described in data.
@@ -29,41 +205,93 @@ def save_cell_objects_image_data(
         Sequence of mask types to include in the export.
     show_progress: bool, optional, default False
         Flag for printing export progress to stdout.
+    create_subdirectory : bool, optional, default True
+        Flag for saving images to a new timestamped directory inside export_path
+        instead of export_path itself.
+    export_format : str, optional, default "files"
+        Name of the supported export format. "files" saves a PNG image and TIF masks
+        for every cell, "hdf5" appends images and masks of all cells to a single
+        compressed archive, which is read with load_cell_objects_image_data.
+    workers : int, optional, default 1
+        Amount of threads writing files concurrently in the "files" format.
 
     Returns
     -------
     Path
-        Path to the timestamped directory with image files.
+        Path to the directory with image files.
     """
-    cell_data_iterator = cell_data.iterrows()
-    if show_progress:
-        cell_data_iterator = tqdm(cell_data_iterator)
-    cell_images_dirname = Path(f"cells_{arrow.now().isoformat()}")
-    cell_images_path = Path(export_path) / cell_images_dirname
-    cell_images_path.mkdir(parents=True, exist_ok=True)
-    for i, cell_data_point in cell_data_iterator:
-        try:
-            target_name = cell_data_point.Target
-        except:
-            target_name = "n"
-        scan_name = cell_data_point.WSI
-        centroid_x, centroid_y = calculate_centroid(
-            cell_data_point.NucleusPolygon
-        ).astype("int")
-        cell_image_filename = (
-            f"cell{i}_{target_name}_{centroid_x}_{centroid_y}_{scan_name}"
-        )
-        imsave(
-            cell_images_path / f"{cell_image_filename}.png",
-            cell_data_point.ColorImage,
-            check_contrast=False,
+    cell_images_path = Path(export_path)
+    if create_subdirectory:
+        cell_images_path = create_cell_images_directory(export_path)
+    mask_names = [
+        f"{mask_type.capitalize()}Mask" for mask_type in (include_masks or [])
+    ]
+    if export_format in CellImageExportFormat.values():
+        save_cell_objects_image_data_func = globals()[
+            f"_save_cell_objects_image_data_{export_format}"
+        ]
+        save_cell_objects_image_data_func(
+            cell_data,
+            cell_images_path,
+            mask_names=mask_names,
+            show_progress=show_progress,
+            workers=workers,
         )
-        if include_masks:
-            for mask_type in include_masks:
-                mask_name = f"{mask_type.capitalize()}Mask"
-                imsave(
-                    cell_images_path / f"{cell_image_filename}_{mask_name}.tif",
-                    cell_data_point[mask_name].astype("uint16"),
-                    check_contrast=False,
-                )
     return cell_images_path
+
+
+def load_cell_objects_image_data(
+    archive_path: Union[str, Path],
+    cell_ids: Optional[Sequence[int]] = None,
+    image_names: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Load cell images and masks from an archive saved in the "hdf5" export format.
+
+    Only the requested cells are read from the archive.
+
+    Parameters
+    ----------
+    archive_path : str or Path
+        Path to the archive file or the directory containing it.
+    cell_ids : array-like of int, optional, default None
+        Indices of cells to load, by default all cells are loaded.
+    image_names : array-like of str, optional, default None
+        Names of images to load, e.g. ColorImage or NucleusMask,
+        by default all stored images are loaded.
+
+    Returns
+    -------
+    DataFrame
+        DataFrame indexed by cell indices with a FileName column
+        and a column for every loaded image.
+    """
+    import h5py
+
+    archive_path = Path(archive_path)
+    if archive_path.is_dir():
+        archive_path = archive_path / CELL_IMAGES_ARCHIVE_FILENAME
+    with h5py.File(archive_path, "r") as archive:
+        stored_cell_ids = archive["CellId"][:]
+        if cell_ids is None:
+            positions = np.arange(len(stored_cell_ids))
+        else:
+            positions = pd.Index(stored_cell_ids).get_indexer(cell_ids)
+            if (positions < 0).any():
+                raise KeyError("Some of the requested cells are not in the archive")
+        if image_names is None:
+            image_names = [
+                name for name in archive if isinstance(archive[name], h5py.Group)
+            ]
+        file_names = archive["FileName"].asstr()[:]
+        cell_images_data = {"FileName": [file_names[i] for i in positions]}
+        for image_name in image_names:
+            group = archive[image_name]
+            offsets = group["offsets"][:]
+            shapes = group["shapes"][:]
+            pixels = group["pixels"]
+            cell_images_data[image_name] = [
+                pixels[offsets[i] : offsets[i] + shapes[i].prod()].reshape(shapes[i])
+                for i in positions
+            ]
+    return pd.DataFrame(cell_images_data, index=stored_cell_ids[positions])
@@ -1,9 +1,13 @@
 import pandas as pd
 import numpy as np
 import typing as t
+import itertools
+import json
 import io
+import codecs
 
 from cfex.enums import CellDataFormat
+from cfex.cell_data.polygons import PolygonArray
 
 
 def format_feature_name(feature_name: str) -> str:
@@ -36,20 +40,160 @@ def format_feature_name(feature_name: str) -> str:
     return "".join([letter for letter in capitalized_name if letter.isalnum()])
 
 
-def _extract_cell_measurements_qupath(data: t.Union[str, t.Dict]) -> pd.DataFrame:
-    cell_measurements = []
-    data = pd.read_json(data)
-    for extracted_cell_data in data["properties"]:
-        cell_data = {}
-        for measurement in extracted_cell_data.get("measurements"):
+def _iter_json_array_items(
+    data: t.IO, buffer_size: t.Optional[int] = 2**20
+) -> t.Iterator[t.Any]:
+    decoder = json.JSONDecoder()
+    # characters split between reads of bytes are decoded once they are complete
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    end_of_data = False
+
+    def read_more():
+        nonlocal buffer, position, end_of_data
+        chunk = data.read(buffer_size)
+        if not chunk:
+            end_of_data = True
+        if isinstance(chunk, bytes):
+            chunk = text_decoder.decode(chunk, final=end_of_data)
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def skip(characters):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer) or end_of_data:
+                return
+            read_more()
+
+    def decode():
+        nonlocal position
+        while True:
+            try:
+                value, value_end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if end_of_data:
+                    raise
+                read_more()
+                continue
+            # a number ending with the buffer or followed by a part of a number
+            # (e.g. 1 read of 1.5) may continue in the unread data
+            next_character = buffer[value_end : value_end + 1]
+            if not end_of_data and (not next_character or next_character in ".eE"):
+                read_more()
+                continue
+            position = value_end
+            return value
+
+    def iter_array_items():
+        nonlocal position
+        if buffer[position : position + 1] != "[":
+            raise ValueError("Cell object data is not a JSON array of features")
+        position += 1
+        while True:
+            skip(" \t\r\n,")
+            if buffer[position : position + 1] in ("]", ""):
+                position += 1
+                return
+            yield decode()
+
+    read_more()
+    skip(" \t\r\n")
+    if buffer[position : position + 1] != "{":
+        yield from iter_array_items()
+        return
+    # feature collections keep the array under a key, other values are skipped
+    position += 1
+    while True:
+        skip(" \t\r\n,")
+        if buffer[position : position + 1] in ("}", ""):
+            return
+        key = decode()
+        skip(" \t\r\n:")
+        if key == "features":
+            yield from iter_array_items()
+        else:
+            decode()
+
+
+def _iter_cell_features_qupath(
+    data: t.Union[t.IO, str, t.List, t.Dict]
+) -> t.Iterator[t.Dict]:
+    if isinstance(data, str):
+        data = io.StringIO(data)
+    if isinstance(data, dict):
+        data = data.get("features", [])
+    if isinstance(data, list):
+        return iter(data)
+    return _iter_json_array_items(data)
+
+
+def _get_exterior_ring_qupath(geometry: t.Dict) -> t.List:
+    coordinates = geometry["coordinates"]
+    if geometry.get("type") == "MultiPolygon":
+        coordinates = coordinates[0] if coordinates else []
+    return coordinates[0] if coordinates else []
+
+
+def _parse_cell_feature_qupath(
+    feature: t.Dict,
+    extract_polygons: t.Optional[bool] = True,
+    extract_measurements: t.Optional[bool] = False,
+) -> t.Optional[t.Dict]:
+    geometry = feature.get("geometry")
+    nucleus_geometry = feature.get("nucleusGeometry")
+    if not geometry or not nucleus_geometry:
+        return None
+    cell_ring = _get_exterior_ring_qupath(geometry)
+    nucleus_ring = _get_exterior_ring_qupath(nucleus_geometry)
+    # cells with empty polygons have no centroid and are skipped as well
+    if not cell_ring or not nucleus_ring:
+        return None
+    cell_data = {}
+    if extract_polygons:
+        cell_data["CellPolygon"] = cell_ring
+        cell_data["NucleusPolygon"] = nucleus_ring
+    if extract_measurements:
+        properties = feature.get("properties") or {}
+        measurements = properties.get("measurements") or []
+        if isinstance(measurements, dict):
+            measurements = [
+                {"name": name, "value": value} for name, value in measurements.items()
+            ]
+        for measurement in measurements:
             column_name = format_feature_name(measurement["name"])
             cell_data[column_name] = measurement["value"]
         try:
-            cell_data["Target"] = extracted_cell_data["classification"]["name"]
+            cell_data["Target"] = properties["classification"]["name"]
         except:
             cell_data["Target"] = np.nan
-        cell_measurements.append(cell_data)
-    return cell_measurements
+    return cell_data
+
+
+def _iter_cell_records_qupath(
+    data: t.Union[t.IO, str, t.List, t.Dict],
+    extract_polygons: t.Optional[bool] = True,
+    extract_measurements: t.Optional[bool] = False,
+) -> t.Iterator[t.Dict]:
+    for feature in _iter_cell_features_qupath(data):
+        cell_data = _parse_cell_feature_qupath(
+            feature,
+            extract_polygons=extract_polygons,
+            extract_measurements=extract_measurements,
+        )
+        if cell_data is not None:
+            yield cell_data
+
+
+def _extract_cell_measurements_qupath(data: t.Union[str, t.Dict]) -> t.List[t.Dict]:
+    return list(
+        _iter_cell_records_qupath(
+            data, extract_polygons=False, extract_measurements=True
+        )
+    )
 
 
 def extract_cell_measurements(
@@ -77,20 +221,34 @@ def extract_cell_measurements(
     return pd.DataFrame(cell_measurements)
 
 
-def _extract_cell_polygons_qupath(data: t.Union[str, t.Dict]) -> pd.DataFrame:
-    cell_polygons = []
-    data = pd.read_json(data)
-    data.dropna(inplace=True)
-    for _, single_cell_data in data.iterrows():
-        cell_data = {}
-        cell_data["CellPolygon"] = np.array(
-            single_cell_data["geometry"]["coordinates"], dtype=np.int32
-        )
-        cell_data["NucleusPolygon"] = np.array(
-            single_cell_data["nucleusGeometry"]["coordinates"], dtype=np.int32
+def _extract_cell_polygons_qupath(data: t.Union[str, t.Dict]) -> t.List[t.Dict]:
+    return list(_iter_cell_records_qupath(data))
+
+
+def _build_polygon_array(rings: t.Sequence[t.List]) -> PolygonArray:
+    coordinates = []
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    for i, ring in enumerate(rings):
+        coordinates.extend(ring)
+        offsets[i + 1] = len(coordinates)
+    return PolygonArray(
+        np.array(coordinates, dtype=np.int32).reshape(-1, 2), offsets
+    )
+
+
+def _build_cell_data_frame(
+    cell_records: t.Sequence[t.Dict], index: t.Optional[pd.Index] = None
+) -> pd.DataFrame:
+    polygon_columns = {
+        column_name: _build_polygon_array(
+            [cell_record.pop(column_name) for cell_record in cell_records]
         )
-        cell_polygons.append(cell_data)
-    return cell_polygons
+        for column_name in ("CellPolygon", "NucleusPolygon")
+    }
+    cell_data = pd.DataFrame(cell_records, index=index)
+    for i, (column_name, polygons) in enumerate(polygon_columns.items()):
+        cell_data.insert(i, column_name, pd.Series(polygons, index=cell_data.index))
+    return cell_data
 
 
 def extract_cell_polygons(data: t.Union[str, t.Dict], data_format: str) -> pd.DataFrame:
@@ -115,13 +273,65 @@ def extract_cell_polygons(data: t.Union[str, t.Dict], data_format: str) -> pd.Da
         # TODO: replace globals with scope of this module
         extract_cell_polygons_func = globals()[f"_extract_cell_polygons_{data_format}"]
         cell_polygons = extract_cell_polygons_func(data)
-    return pd.DataFrame(cell_polygons)
+    return _build_cell_data_frame(cell_polygons)
+
+
+def iter_cell_data(
+    data: t.Union[t.IO, str, t.Dict],
+    data_format: str,
+    extract_measurements: t.Optional[bool] = False,
+    chunk_size: t.Optional[int] = 10000,
+    size: t.Optional[int] = None,
+) -> t.Iterator[pd.DataFrame]:
+    """
+    Incrementally extract cell measurements and geometry from data.
+    Yields dataframes with at most chunk_size cells each, indexed by cell position in data.
+
+    Cell objects are parsed in a single pass, so memory usage is bounded
+    by the chunk size rather than by the size of the data.
+
+    Parameters
+    ----------
+    data : file-like, str or dict
+        Cell object data containing polygons.
+    data_format: str
+        Supported format name.
+    extract_measurements: bool, optional, default False
+        Flag for extracting existing cell measurements from data.
+    chunk_size : int, optional, default 10000
+        Maximum amount of cells in a single yielded dataframe.
+    size : int, optional, default None
+        Amount of cells after which the extraction stops.
+
+    Yields
+    ------
+    DataFrame
+        DataFrame containing cell polygons and (optionally) measurements data.
+    """
+    if data_format not in CellDataFormat.values():
+        return
+    iter_cell_records_func = globals()[f"_iter_cell_records_{data_format}"]
+    cell_records = iter_cell_records_func(
+        data, extract_measurements=extract_measurements
+    )
+    if size is not None:
+        cell_records = itertools.islice(cell_records, size)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(cell_records, chunk_size))
+        if not chunk:
+            return
+        yield _build_cell_data_frame(
+            chunk, index=pd.RangeIndex(start, start + len(chunk))
+        )
+        start += len(chunk)
 
 
 def extract_cell_data(
     data: t.Union[t.IO, str, t.Dict],
     data_format: str,
     extract_measurements: t.Optional[bool] = False,
+    size: t.Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Extract cell measurements and geometry from data.
@@ -129,22 +339,28 @@ def extract_cell_data(
 
     Parameters
     ----------
-    data : str or dict
+    data : file-like, str or dict
         Cell object data containing polygons.
     data_format: str
         Supported format name.
     extract_measurements: bool, optional, default False
         Flag for extracting existing cell measurements from data.
+    size : int, optional, default None
+        Amount of cells after which the extraction stops.
 
     Returns
     -------
     DataFrame
         DataFrame containing cell polygons and (optionally) measurements data.
     """
-    if isinstance(data, io.IOBase):
-        data = data.read()
-    cell_data = extract_cell_polygons(data, data_format)
-    if extract_measurements:
-        cell_measurements = extract_cell_measurements(data, data_format)
-        cell_data = pd.concat([cell_data, cell_measurements], axis=1)
-    return cell_data
+    cell_data_chunks = list(
+        iter_cell_data(
+            data,
+            data_format,
+            extract_measurements=extract_measurements,
+            size=size,
+        )
+    )
+    if not cell_data_chunks:
+        return _build_cell_data_frame([])
+    return pd.concat(cell_data_chunks)
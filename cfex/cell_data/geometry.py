@@ -1,7 +1,8 @@
-from cv2 import boundingRect
-from typing import Sequence, Tuple
+from typing import Sequence, Tuple, List
 import numpy as np
 
+from cfex.cell_data.polygons import as_polygon_array
+
 
 def calculate_centroid(object_polygon: Sequence) -> np.ndarray:
     """
@@ -74,13 +75,8 @@ def calculate_roi_bounding_box(object_polygons: Sequence) -> Tuple[int]:
         Tuple with x and y coordinate of the upper left corner of the bounding box,
         its width and its height.
     """
-    X = []
-    Y = []
-    for contour in object_polygons:
-        # TODO: reimplement without boundingRect
-        x, y, _, _ = boundingRect(contour)
-        X.append(x)
-        Y.append(y)
+    bounding_boxes = calculate_bounding_boxes(object_polygons)
+    X, Y = bounding_boxes[:, 0], bounding_boxes[:, 1]
     roi_bounding_box = (
         np.min(X),
         np.min(Y),
@@ -141,3 +137,245 @@ def calculate_image_center(image: np.ndarray) -> Tuple[int]:
     image_center_x = image_dimensions[0] // 2
     image_center_y = image_dimensions[1] // 2
     return image_center_x, image_center_y
+
+
+def _reduce_polygons(
+    reduce_func: np.ufunc, values: np.ndarray, offsets: np.ndarray
+) -> np.ndarray:
+    lengths = np.diff(offsets)
+    result = np.full((len(lengths),) + values.shape[1:], np.nan)
+    non_empty = lengths > 0
+    if non_empty.any():
+        result[non_empty] = reduce_func.reduceat(
+            values[: offsets[-1]], offsets[:-1][non_empty], axis=0
+        )
+    return result
+
+
+def calculate_centroids(object_polygons: Sequence) -> np.ndarray:
+    """
+    Calculate centroid coordinates of all cells at once - means of polygon points coordinates.
+
+    Returns an array with x, y coordinates of cell centroids,
+    rows of empty polygons are filled with NaN.
+
+    Parameters
+    ----------
+    object_polygons : PolygonArray, Series or array-like
+        Sequence of arrays with x, y coordinates of cell polygons.
+
+    Returns
+    -------
+    ndarray
+        Array of shape (N, 2) with x, y coordinates of cell centroids.
+    """
+    polygons = as_polygon_array(object_polygons)
+    coordinate_sums = _reduce_polygons(
+        np.add, polygons.coordinates.astype(np.float64), polygons.offsets
+    )
+    return coordinate_sums / polygons.lengths[:, np.newaxis]
+
+
+def calculate_pixel_centroids(object_polygons: Sequence) -> np.ndarray:
+    """
+    Calculate centroid pixel coordinates of all cells at once.
+
+    Returns an array with x, y coordinates of cell centroids truncated to integers.
+    Empty polygons have no centroid, so a ValueError is raised if any is given.
+
+    Parameters
+    ----------
+    object_polygons : PolygonArray, Series or array-like
+        Sequence of arrays with x, y coordinates of cell polygons.
+
+    Returns
+    -------
+    ndarray
+        Integer array of shape (N, 2) with x, y coordinates of cell centroids.
+    """
+    centroids = calculate_centroids(object_polygons)
+    empty_positions = np.flatnonzero(np.isnan(centroids).any(axis=1))
+    if len(empty_positions):
+        raise ValueError(
+            f"Empty polygons at positions {empty_positions.tolist()} have no centroid"
+        )
+    return centroids.astype(np.int64)
+
+
+def calculate_bounding_boxes(object_polygons: Sequence) -> np.ndarray:
+    """
+    Calculate minimum upright bounding boxes of all polygons at once.
+
+    Returns an array with x, y coordinates of the upper left corner of each
+    bounding box, its width and its height (inclusive of both edge pixels).
+
+    Parameters
+    ----------
+    object_polygons : PolygonArray, Series or array-like
+        Sequence of arrays with x, y coordinates of polygons.
+
+    Returns
+    -------
+    ndarray
+        Integer array of shape (N, 4) with bounding boxes, empty polygons get zero-sized boxes.
+    """
+    polygons = as_polygon_array(object_polygons)
+    coordinates = polygons.coordinates.astype(np.float64)
+    minimum = _reduce_polygons(np.minimum, coordinates, polygons.offsets)
+    maximum = _reduce_polygons(np.maximum, coordinates, polygons.offsets)
+    bounding_boxes = np.hstack((minimum, maximum - minimum + 1))
+    return np.nan_to_num(bounding_boxes).astype(np.int64)
+
+
+def calculate_areas(object_polygons: Sequence) -> np.ndarray:
+    """
+    Calculate areas of all polygons at once using the shoelace formula.
+
+    Parameters
+    ----------
+    object_polygons : PolygonArray, Series or array-like
+        Sequence of arrays with x, y coordinates of polygons.
+
+    Returns
+    -------
+    ndarray
+        Array of shape (N,) with polygon areas, empty polygons have zero area.
+    """
+    polygons = as_polygon_array(object_polygons)
+    offsets = polygons.offsets
+    coordinates = polygons.coordinates[: offsets[-1]].astype(np.float64)
+    next_vertex_indices = np.arange(1, len(coordinates) + 1)
+    lengths = polygons.lengths
+    polygon_ends = offsets[1:][lengths > 0] - 1
+    next_vertex_indices[polygon_ends] = offsets[:-1][lengths > 0]
+    next_coordinates = coordinates[next_vertex_indices]
+    cross_products = (
+        coordinates[:, 0] * next_coordinates[:, 1]
+        - next_coordinates[:, 0] * coordinates[:, 1]
+    )
+    areas = _reduce_polygons(np.add, cross_products, offsets)
+    return np.abs(np.nan_to_num(areas)) / 2
+
+
+def calculate_cell_roi_bounding_boxes(
+    cell_point_coordinates: np.ndarray, bounding_box_margin: int
+) -> np.ndarray:
+    """
+    Calculate bounding boxes for all cell points with a given distance margin.
+
+    Parameters
+    ----------
+    cell_point_coordinates : ndarray
+        Array of shape (N, 2) with x and y coordinates of cell centroids.
+    bounding_box_margin : int
+        Distance between the cell centroid and the edge of the intended bounding box.
+
+    Returns
+    ------
+    ndarray
+        Integer array of shape (N, 4) with x, y coordinate of the upper left corner
+        of each bounding box, its width and its height.
+    """
+    cell_point_coordinates = np.asarray(cell_point_coordinates).astype(np.int64)
+    cell_boxes = np.empty((len(cell_point_coordinates), 4), dtype=np.int64)
+    cell_boxes[:, :2] = cell_point_coordinates - bounding_box_margin
+    cell_boxes[:, 2:] = bounding_box_margin * 2
+    return cell_boxes
+
+
+DEFAULT_BUCKET_SIZES = (32, 48, 64, 96, 128, 192)
+
+
+def calculate_adaptive_cell_roi_bounding_boxes(
+    cell_point_coordinates: np.ndarray,
+    object_bounding_boxes: np.ndarray,
+    padding: int,
+    bucket_sizes: Sequence[int] = DEFAULT_BUCKET_SIZES,
+) -> np.ndarray:
+    """
+    Calculate square bounding boxes centered on cell points and sized by object extents.
+
+    The side of every box is twice the largest distance from the cell point to
+    the edge of the object bounding box plus padding, rounded up to the nearest
+    bucket size, so that boxes share a few shapes. Sides larger than the largest
+    bucket size are rounded up to its multiple, so large objects are not clipped.
+
+    Parameters
+    ----------
+    cell_point_coordinates : ndarray
+        Array of shape (N, 2) with x and y coordinates of cell centroids.
+    object_bounding_boxes : ndarray
+        Array of shape (N, 4) with bounding boxes of cell polygons.
+    padding : int
+        Distance between the object bounding box and the edge of the intended bounding box.
+    bucket_sizes : array-like of int, optional, default (32, 48, 64, 96, 128, 192)
+        Allowed side lengths of the bounding boxes.
+
+    Returns
+    ------
+    ndarray
+        Integer array of shape (N, 4) with x, y coordinate of the upper left corner
+        of each bounding box, its width and its height.
+    """
+    cell_point_coordinates = np.asarray(cell_point_coordinates).astype(np.int64)
+    object_bounding_boxes = np.asarray(object_bounding_boxes, dtype=np.int64)
+    object_start = object_bounding_boxes[:, :2]
+    object_end = object_start + object_bounding_boxes[:, 2:]
+    half_extent = np.maximum(
+        cell_point_coordinates - object_start, object_end - cell_point_coordinates
+    ).max(axis=1)
+    required_sizes = 2 * (half_extent + padding)
+    bucket_sizes = np.sort(np.asarray(bucket_sizes, dtype=np.int64))
+    bucket_indices = np.searchsorted(bucket_sizes, required_sizes)
+    largest_bucket_size = bucket_sizes[-1]
+    box_sizes = np.where(
+        bucket_indices < len(bucket_sizes),
+        bucket_sizes[np.minimum(bucket_indices, len(bucket_sizes) - 1)],
+        -(-required_sizes // largest_bucket_size) * largest_bucket_size,
+    )
+    cell_boxes = np.empty((len(cell_point_coordinates), 4), dtype=np.int64)
+    cell_boxes[:, :2] = cell_point_coordinates - box_sizes[:, np.newaxis] // 2
+    cell_boxes[:, 2] = box_sizes
+    cell_boxes[:, 3] = box_sizes
+    return cell_boxes
+
+
+def group_cell_boxes(
+    cell_boxes: np.ndarray, tile_size: int
+) -> List[Tuple[Tuple[int], np.ndarray]]:
+    """
+    Group cell bounding boxes by an aligned tile grid.
+
+    Every box is assigned to the tile containing its upper left corner,
+    boxes sharing a tile are covered by a single minimum region.
+
+    Parameters
+    ----------
+    cell_boxes : ndarray
+        Integer array of shape (N, 4) with x, y coordinate of the upper left corner
+        of each bounding box, its width and its height.
+    tile_size : int
+        Side length of a square tile of the grid.
+
+    Returns
+    -------
+    list of tuple
+        List of tuples with a region bounding box as the first element and
+        an array of indices of cell boxes covered by the region as the second element.
+    """
+    cell_boxes = np.asarray(cell_boxes, dtype=np.int64).reshape(-1, 4)
+    tile_coordinates = cell_boxes[:, :2] // tile_size
+    _, tile_indices = np.unique(tile_coordinates, axis=0, return_inverse=True)
+    tile_indices = tile_indices.reshape(-1)
+    cell_order = np.argsort(tile_indices, kind="stable")
+    group_starts = np.flatnonzero(np.diff(tile_indices[cell_order], prepend=-1))
+    groups = []
+    for cell_indices in np.split(cell_order, group_starts[1:]):
+        group_boxes = cell_boxes[cell_indices]
+        region_start = group_boxes[:, :2].min(axis=0)
+        region_end = (group_boxes[:, :2] + group_boxes[:, 2:]).max(axis=0)
+        region_box = tuple(
+            int(value) for value in (*region_start, *(region_end - region_start))
+        )
+        groups.append((region_box, cell_indices))
+    return groups
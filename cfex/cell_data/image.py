@@ -1,12 +1,187 @@
 import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from tqdm import tqdm
 import pandas as pd
 import slideio as sio
 
-from typing import Optional, Union, List
-from cfex.enums import CellImageLoadBackend
-from cfex.cell_data.geometry import calculate_centroid, calculate_cell_roi_bounding_box
+from typing import Optional, Union, List, Sequence, Tuple
+from cfex.enums import CellCropMode, CellImageLoadBackend, CellImageReadMode
+from cfex.cell_data.cache import (
+    TileCache,
+    calculate_cell_images_cache_key,
+    load_cell_images_cache,
+    save_cell_images_cache,
+)
+from cfex.cell_data.geometry import (
+    DEFAULT_BUCKET_SIZES,
+    calculate_adaptive_cell_roi_bounding_boxes,
+    calculate_bound_transform_coordinates,
+    calculate_bounding_boxes,
+    calculate_cell_roi_bounding_boxes,
+    calculate_pixel_centroids,
+    group_cell_boxes,
+)
+
+
+def _group_cell_boxes_cell(
+    cell_boxes: np.ndarray, tile_size: Optional[int]
+) -> List[Tuple[Tuple[int], np.ndarray]]:
+    return [
+        (tuple(cell_box), np.array([i]))
+        for i, cell_box in enumerate(cell_boxes.tolist())
+    ]
+
+
+def _group_cell_boxes_tile(
+    cell_boxes: np.ndarray, tile_size: Optional[int]
+) -> List[Tuple[Tuple[int], np.ndarray]]:
+    return group_cell_boxes(cell_boxes, tile_size)
+
+
+def _crop_region_image(
+    region_image: np.ndarray, region_box: Tuple[int], cell_box: Sequence[int]
+) -> np.ndarray:
+    cell_x, cell_y = calculate_bound_transform_coordinates(region_box, cell_box[:2])
+    _, _, cell_width, cell_height = cell_box
+    return region_image[cell_y : cell_y + cell_height, cell_x : cell_x + cell_width]
+
+
+def _calculate_cell_boxes(
+    cell_data: pd.DataFrame,
+    bounding_box_margin: Optional[int],
+    crop_mode: Optional[str] = "fixed",
+    crop_padding: Optional[int] = 8,
+    crop_bucket_sizes: Optional[Sequence[int]] = DEFAULT_BUCKET_SIZES,
+) -> np.ndarray:
+    cell_centroids = calculate_pixel_centroids(cell_data["CellPolygon"])
+    if crop_mode == CellCropMode.ADAPTIVE.value:
+        return calculate_adaptive_cell_roi_bounding_boxes(
+            cell_centroids,
+            calculate_bounding_boxes(cell_data["CellPolygon"]),
+            crop_padding,
+            crop_bucket_sizes,
+        )
+    return calculate_cell_roi_bounding_boxes(cell_centroids, bounding_box_margin)
+
+
+def _open_scene_slideio(wsi_path: str, scene_storage: threading.local):
+    if not hasattr(scene_storage, "scene"):
+        scene_storage.slide = sio.open_slide(wsi_path, "SVS")
+        scene_storage.scene = scene_storage.slide.get_scene(0)
+    return scene_storage.scene
+
+
+def _read_block_slideio(scene, block_box: Tuple[int]) -> np.ndarray:
+    _, _, scene_width, scene_height = scene.rect
+    block_x, block_y, block_width, block_height = block_box
+    # parts of the block outside of the slide are padded with zeros, so regions
+    # are read the same way with and without a tile cache
+    block = np.zeros((block_height, block_width, scene.num_channels), dtype=np.uint8)
+    left, top = max(block_x, 0), max(block_y, 0)
+    right = min(block_x + block_width, scene_width)
+    bottom = min(block_y + block_height, scene_height)
+    if right <= left or bottom <= top:
+        return block
+    pixels = scene.read_block((left, top, right - left, bottom - top))
+    block[top - block_y : bottom - block_y, left - block_x : right - block_x] = pixels
+    return block
+
+
+def _read_region_cached_slideio(
+    scene, wsi_path: str, region_box: Tuple[int], tile_cache: TileCache
+) -> np.ndarray:
+    region_x, region_y, region_width, region_height = region_box
+    tile_size = tile_cache.tile_size
+    region_image = None
+    for tile_y in range(
+        region_y // tile_size, (region_y + region_height - 1) // tile_size + 1
+    ):
+        for tile_x in range(
+            region_x // tile_size, (region_x + region_width - 1) // tile_size + 1
+        ):
+            tile_box = (tile_x * tile_size, tile_y * tile_size, tile_size, tile_size)
+            tile = tile_cache.get(
+                (wsi_path, 0, tile_x, tile_y),
+                lambda: _read_block_slideio(scene, tile_box),
+            )
+            if region_image is None:
+                region_image = np.zeros(
+                    (region_height, region_width) + tile.shape[2:], dtype=tile.dtype
+                )
+            # overlap of the tile and the region in tile coordinates
+            left = max(region_x - tile_box[0], 0)
+            top = max(region_y - tile_box[1], 0)
+            right = min(region_x + region_width - tile_box[0], tile.shape[1])
+            bottom = min(region_y + region_height - tile_box[1], tile.shape[0])
+            if right <= left or bottom <= top:
+                continue
+            offset_x = tile_box[0] + left - region_x
+            offset_y = tile_box[1] + top - region_y
+            region_image[
+                offset_y : offset_y + bottom - top, offset_x : offset_x + right - left
+            ] = tile[top:bottom, left:right]
+    return region_image
+
+
+def _read_regions_slideio(
+    wsi_path: str,
+    region_boxes: Sequence[Tuple[int, Tuple[int]]],
+    scene_storage: threading.local,
+    tile_cache: Optional[TileCache] = None,
+) -> List[Tuple[int, np.ndarray]]:
+    scene = _open_scene_slideio(wsi_path, scene_storage)
+    region_images = []
+    for i, region_box in region_boxes:
+        if tile_cache is not None:
+            region_image = _read_region_cached_slideio(
+                scene, wsi_path, region_box, tile_cache
+            )
+        else:
+            region_image = _read_block_slideio(scene, region_box)
+        region_images.append((i, region_image))
+    return region_images
+
+
+def _read_cell_box_group_regions_slideio(
+    wsi_path: str,
+    cell_box_groups: Sequence[Tuple[Tuple[int], np.ndarray]],
+    show_progress: Optional[bool],
+    workers: Optional[int] = 1,
+    tile_cache: Optional[TileCache] = None,
+) -> List[np.ndarray]:
+    # every thread reads through its own slide handle
+    scene_storage = threading.local()
+    region_boxes = [
+        (i, region_box) for i, (region_box, _) in enumerate(cell_box_groups)
+    ]
+    work_size = max(1, len(region_boxes) // (max(1, workers) * 8))
+    work_units = [
+        region_boxes[i : i + work_size] for i in range(0, len(region_boxes), work_size)
+    ]
+    progress_bar = tqdm(
+        total=sum(len(cell_indices) for _, cell_indices in cell_box_groups),
+        disable=not show_progress,
+    )
+    region_image_list = [None] * len(region_boxes)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(
+                _read_regions_slideio,
+                wsi_path,
+                work_unit,
+                scene_storage,
+                tile_cache,
+            )
+            for work_unit in work_units
+        ]
+        for future in as_completed(futures):
+            for i, region_image in future.result():
+                region_image_list[i] = region_image
+                progress_bar.update(len(cell_box_groups[i][1]))
+    progress_bar.close()
+    return region_image_list
 
 
 def _load_cell_images_slideio(
@@ -14,19 +189,113 @@ def _load_cell_images_slideio(
     cell_data: pd.DataFrame,
     bounding_box_margin: Optional[int],
     show_progress: Optional[bool],
+    read_mode: Optional[str] = "cell",
+    tile_size: Optional[int] = 1024,
+    workers: Optional[int] = 1,
+    tile_cache: Optional[TileCache] = None,
+    crop_mode: Optional[str] = "fixed",
+    crop_padding: Optional[int] = 8,
+    crop_bucket_sizes: Optional[Sequence[int]] = DEFAULT_BUCKET_SIZES,
 ) -> List[np.ndarray]:
-    slide = sio.open_slide(wsi_path, "SVS")
-    scene = slide.get_scene(0)
-    cell_data_iterable = cell_data.iterrows()
-    if show_progress:
-        cell_data_iterable = tqdm(cell_data_iterable)
-    cell_image_list = []
-    for _, single_cell_data in cell_data_iterable:
-        cell_polygon = single_cell_data["CellPolygon"]
-        cell_centroid = calculate_centroid(cell_polygon).astype(int)
-        cell_box = calculate_cell_roi_bounding_box(cell_centroid, bounding_box_margin)
-        image = scene.read_block(cell_box)
-        cell_image_list.append(image)
+    cell_boxes = _calculate_cell_boxes(
+        cell_data, bounding_box_margin, crop_mode, crop_padding, crop_bucket_sizes
+    )
+    group_cell_boxes_func = globals()[f"_group_cell_boxes_{read_mode}"]
+    cell_box_groups = group_cell_boxes_func(cell_boxes, tile_size)
+    region_image_list = _read_cell_box_group_regions_slideio(
+        wsi_path, cell_box_groups, show_progress, workers, tile_cache
+    )
+    return split_region_images(region_image_list, cell_box_groups, cell_boxes)
+
+
+def _load_cell_region_images_slideio(
+    wsi_path: str,
+    cell_data: pd.DataFrame,
+    bounding_box_margin: Optional[int],
+    show_progress: Optional[bool],
+    tile_size: Optional[int] = 1024,
+    workers: Optional[int] = 1,
+    tile_cache: Optional[TileCache] = None,
+    crop_mode: Optional[str] = "fixed",
+    crop_padding: Optional[int] = 8,
+    crop_bucket_sizes: Optional[Sequence[int]] = DEFAULT_BUCKET_SIZES,
+) -> Tuple[List[np.ndarray], List[Tuple[Tuple[int], np.ndarray]], np.ndarray]:
+    cell_boxes = _calculate_cell_boxes(
+        cell_data, bounding_box_margin, crop_mode, crop_padding, crop_bucket_sizes
+    )
+    cell_box_groups = group_cell_boxes(cell_boxes, tile_size)
+    region_image_list = _read_cell_box_group_regions_slideio(
+        wsi_path, cell_box_groups, show_progress, workers, tile_cache
+    )
+    return region_image_list, cell_box_groups, cell_boxes
+
+
+def _sample_tissue_tiles_slideio(
+    wsi_path: str,
+    tile_size: int,
+    sample_count: int,
+    thumbnail_width: int,
+    seed: int,
+) -> List[np.ndarray]:
+    scene = _open_scene_slideio(wsi_path, threading.local())
+    _, _, scene_width, scene_height = scene.rect
+    thumbnail = scene.read_block(scene.rect, size=(thumbnail_width, 0))
+    scale_x = scene_width / thumbnail.shape[1]
+    scale_y = scene_height / thumbnail.shape[0]
+    # tissue pixels are neither bright background nor unsaturated gray
+    tissue_mask = (thumbnail.mean(axis=2) < 220) & (np.ptp(thumbnail, axis=2) > 15)
+    tissue_y, tissue_x = np.nonzero(tissue_mask)
+    if not len(tissue_x):
+        tissue_y, tissue_x = np.nonzero(np.ones(thumbnail.shape[:2], dtype=bool))
+    rng = np.random.default_rng(seed)
+    sample_indices = rng.choice(
+        len(tissue_x), size=min(sample_count, len(tissue_x)), replace=False
+    )
+    tile_width, tile_height = min(tile_size, scene_width), min(tile_size, scene_height)
+    tile_list = []
+    for i in sample_indices:
+        tile_x = int(tissue_x[i] * scale_x) - tile_width // 2
+        tile_y = int(tissue_y[i] * scale_y) - tile_height // 2
+        tile_x = min(max(tile_x, 0), scene_width - tile_width)
+        tile_y = min(max(tile_y, 0), scene_height - tile_height)
+        tile_list.append(scene.read_block((tile_x, tile_y, tile_width, tile_height)))
+    return tile_list
+
+
+def split_region_images(
+    region_image_list: Sequence[np.ndarray],
+    cell_box_groups: Sequence[Tuple[Tuple[int], np.ndarray]],
+    cell_boxes: np.ndarray,
+) -> List[np.ndarray]:
+    """
+    Slice images of cell bounding boxes out of images of regions covering them.
+
+    Returns a list of cell images ordered by cell box index,
+    each being a view of the corresponding region image.
+
+    Parameters
+    ----------
+    region_image_list : array-like of ndarray
+        List containing region images (e.g. color images or label images).
+    cell_box_groups : array-like of tuple
+        List of tuples with a region bounding box as the first element and
+        an array of indices of cell boxes covered by the region as the second element.
+    cell_boxes : ndarray
+        Integer array of shape (N, 4) with cell bounding boxes.
+
+    Returns
+    -------
+    list of ndarray
+        List containing cell images.
+    """
+    cell_image_list = [None] * len(cell_boxes)
+    for region_image, (region_box, cell_indices) in zip(
+        region_image_list, cell_box_groups
+    ):
+        for i in cell_indices:
+            cell_image_list[i] = _crop_region_image(
+                region_image, region_box, cell_boxes[i]
+            )
     return cell_image_list
 
 
@@ -39,6 +308,14 @@ def load_cell_images(
     cell_image_load_backend: str,
     bounding_box_margin: Optional[int] = 50,
     show_progress: Optional[bool] = False,
+    read_mode: Optional[str] = "cell",
+    tile_size: Optional[int] = 1024,
+    workers: Optional[int] = 1,
+    tile_cache: Optional[TileCache] = None,
+    cache_dir: Optional[Union[str, Path]] = None,
+    crop_mode: Optional[str] = "fixed",
+    crop_padding: Optional[int] = 8,
+    crop_bucket_sizes: Optional[Sequence[int]] = DEFAULT_BUCKET_SIZES,
 ) -> List[np.ndarray]:
     """
     Load WSI regions containing given cells to memory.
@@ -58,16 +335,193 @@ def load_cell_images(
         Distance from the cell centroid to the side of the desired bounding box.
     show_progress : bool, optional, default False
         Flag for printing image loading progress to stdout.
+    read_mode : str, optional, default "cell"
+        Name of the supported WSI read mode. In "tile" mode cell bounding boxes
+        are grouped by an aligned tile grid, each group is read as a single region
+        and cell images are returned as views of that region.
+    tile_size : int, optional, default 1024
+        Side length of a tile used for grouping cell bounding boxes in "tile" mode.
+    workers : int, optional, default 1
+        Amount of threads reading the WSI concurrently, each through its own slide handle.
+        Order of the returned images follows cell_data regardless of the amount.
+    tile_cache : TileCache, optional, default None
+        Cache of decoded WSI tiles shared by all region reads,
+        regions outside of the WSI are filled with zeros when it is used.
+    cache_dir : str or Path, optional, default None
+        Directory for the on-disk cache of cell images. Images are stored in files
+        keyed by the WSI identity, cell polygons and loading parameters, calls with
+        the same input return read-only memory-mapped views without reading the WSI.
+    crop_mode : str, optional, default "fixed"
+        Name of the supported way of sizing cell bounding boxes. In "adaptive"
+        mode boxes cover cell polygons with crop_padding and are rounded up
+        to crop_bucket_sizes, bounding_box_margin is not used.
+    crop_padding : int, optional, default 8
+        Distance from the cell polygon extent to the side of an adaptive box.
+    crop_bucket_sizes : array-like of int, optional, default (32, 48, 64, 96, 128, 192)
+        Allowed side lengths of boxes in "adaptive" mode.
 
     Returns
     -------
     list of ndarray
         List containing cell images.
     """
-    if cell_image_load_backend in CellImageLoadBackend.values():
+    if (
+        cell_image_load_backend in CellImageLoadBackend.values()
+        and read_mode in CellImageReadMode.values()
+        and crop_mode in CellCropMode.values()
+    ):
+        if cache_dir is not None:
+            cache_key = calculate_cell_images_cache_key(
+                wsi_path,
+                cell_data["CellPolygon"],
+                bounding_box_margin=bounding_box_margin,
+                read_mode=read_mode,
+                crop_mode=crop_mode,
+                crop_padding=crop_padding,
+                crop_bucket_sizes=tuple(crop_bucket_sizes),
+            )
+            cache_path = Path(cache_dir) / f"cells_{cache_key}"
+            cell_image_list = load_cell_images_cache(cache_path)
+            if cell_image_list is not None:
+                return cell_image_list
         load_cell_images_func = globals()[
             f"_load_cell_images_{cell_image_load_backend}"
         ]
-        return load_cell_images_func(
-            str(wsi_path), cell_data, bounding_box_margin, show_progress
+        cell_image_list = load_cell_images_func(
+            str(wsi_path),
+            cell_data,
+            bounding_box_margin,
+            show_progress,
+            read_mode=read_mode,
+            tile_size=tile_size,
+            workers=workers,
+            tile_cache=tile_cache,
+            crop_mode=crop_mode,
+            crop_padding=crop_padding,
+            crop_bucket_sizes=crop_bucket_sizes,
+        )
+        if cache_dir is not None:
+            save_cell_images_cache(cache_path, cell_image_list)
+            return load_cell_images_cache(cache_path)
+        return cell_image_list
+
+
+def load_cell_region_images(
+    wsi_path: Union[str, Path],
+    cell_data: pd.DataFrame,
+    cell_image_load_backend: str,
+    bounding_box_margin: Optional[int] = 50,
+    show_progress: Optional[bool] = False,
+    tile_size: Optional[int] = 1024,
+    workers: Optional[int] = 1,
+    tile_cache: Optional[TileCache] = None,
+    crop_mode: Optional[str] = "fixed",
+    crop_padding: Optional[int] = 8,
+    crop_bucket_sizes: Optional[Sequence[int]] = DEFAULT_BUCKET_SIZES,
+) -> Tuple[List[np.ndarray], List[Tuple[Tuple[int], np.ndarray]], np.ndarray]:
+    """
+    Load WSI regions covering groups of given cells to memory.
+    Cell bounding boxes are grouped by an aligned tile grid, each group is covered
+    by a single region, which can be processed as a whole and split into cell images
+    with split_region_images.
+
+    Returns a tuple with a list of region images, a list of cell box groups
+    and an array of cell bounding boxes.
+
+    Parameters
+    ----------
+    wsi_path : str or Path
+        Path to the WSI from which the cell objects are analyzed.
+    cell_data : DataFrame
+        DataFrame containing cell polygons.
+    cell_image_load_backend : str
+        Name of the supported WSI load backend.
+    bounding_box_margin : int, optional, default 50
+        Distance from the cell centroid to the side of the desired bounding box.
+    show_progress : bool, optional, default False
+        Flag for printing image loading progress to stdout.
+    tile_size : int, optional, default 1024
+        Side length of a tile used for grouping cell bounding boxes.
+    workers : int, optional, default 1
+        Amount of threads reading the WSI concurrently, each through its own slide handle.
+    tile_cache : TileCache, optional, default None
+        Cache of decoded WSI tiles shared by all region reads.
+    crop_mode : str, optional, default "fixed"
+        Name of the supported way of sizing cell bounding boxes. In "adaptive"
+        mode boxes cover cell polygons with crop_padding and are rounded up
+        to crop_bucket_sizes, bounding_box_margin is not used.
+    crop_padding : int, optional, default 8
+        Distance from the cell polygon extent to the side of an adaptive box.
+    crop_bucket_sizes : array-like of int, optional, default (32, 48, 64, 96, 128, 192)
+        Allowed side lengths of boxes in "adaptive" mode.
+
+    Returns
+    -------
+    tuple of list, list and ndarray
+        List containing region images, list of tuples with a region bounding box
+        and an array of indices of cells covered by the region, and an integer array
+        of shape (N, 4) with cell bounding boxes.
+    """
+    if (
+        cell_image_load_backend in CellImageLoadBackend.values()
+        and crop_mode in CellCropMode.values()
+    ):
+        load_cell_region_images_func = globals()[
+            f"_load_cell_region_images_{cell_image_load_backend}"
+        ]
+        return load_cell_region_images_func(
+            str(wsi_path),
+            cell_data,
+            bounding_box_margin,
+            show_progress,
+            tile_size=tile_size,
+            workers=workers,
+            tile_cache=tile_cache,
+            crop_mode=crop_mode,
+            crop_padding=crop_padding,
+            crop_bucket_sizes=crop_bucket_sizes,
+        )
+
+
+def sample_tissue_tiles(
+    wsi_path: Union[str, Path],
+    cell_image_load_backend: str,
+    tile_size: Optional[int] = 256,
+    sample_count: Optional[int] = 32,
+    thumbnail_width: Optional[int] = 1024,
+    seed: Optional[int] = 0,
+) -> List[np.ndarray]:
+    """
+    Read randomly sampled tiles containing tissue from the WSI.
+    Tissue is located on a thumbnail of the WSI as pixels which are
+    neither bright background nor unsaturated gray.
+
+    Returns a list of tile images.
+
+    Parameters
+    ----------
+    wsi_path : str or Path
+        Path to the WSI.
+    cell_image_load_backend : str
+        Name of the supported WSI load backend.
+    tile_size : int, optional, default 256
+        Side length of a sampled tile.
+    sample_count : int, optional, default 32
+        Amount of sampled tiles.
+    thumbnail_width : int, optional, default 1024
+        Width of the thumbnail used for locating tissue.
+    seed : int, optional, default 0
+        Seed of the random sampling, so that repeated runs sample the same tiles.
+
+    Returns
+    -------
+    list of ndarray
+        List containing tile images.
+    """
+    if cell_image_load_backend in CellImageLoadBackend.values():
+        sample_tissue_tiles_func = globals()[
+            f"_sample_tissue_tiles_{cell_image_load_backend}"
+        ]
+        return sample_tissue_tiles_func(
+            str(wsi_path), tile_size, sample_count, thumbnail_width, seed
         )
@@ -3,8 +3,10 @@ import numpy as np
 from skimage.measure import find_contours, regionprops
 from skimage.draw import polygon
 import pyclipper
-from typing import Optional, Sequence
+from scipy.ndimage import distance_transform_edt
+from typing import Dict, Optional, Sequence
 
+from cfex.enums import CellExpansionMethod
 from cfex.cell_data.geometry import calculate_image_center
 
 # TODO: implement a CellMaskGenerator class
@@ -93,9 +95,150 @@ def create_cell_outline_mask(
     return cell_expansion_mask - nucleus_mask
 
 
+def create_nucleus_mask_stack(nuclei_labels_stack: np.ndarray) -> np.ndarray:
+    """
+    Create masks of cell nuclei for a stack of label images of the same shape.
+
+    Returns a stack of cell nucleus labels.
+
+    Parameters
+    ----------
+    nuclei_labels_stack : ndarray
+        Array of shape (N, H, W) with multi-label images of WSI regions
+        defined by cell bounding boxes.
+
+    Returns
+    -------
+    ndarray
+        Contiguous uint8 array of shape (N, H, W) with cell nucleus labels.
+    """
+    center_x, center_y = calculate_image_center(nuclei_labels_stack[0])
+    focused_nucleus_colors = nuclei_labels_stack[:, center_x, center_y]
+    nucleus_mask_stack = (
+        nuclei_labels_stack == focused_nucleus_colors[:, np.newaxis, np.newaxis]
+    )
+    nucleus_mask_stack &= (focused_nucleus_colors != 0)[:, np.newaxis, np.newaxis]
+    return nucleus_mask_stack.view(np.uint8)
+
+
+def _create_cell_expansion_mask_stack_contour(
+    nuclei_labels_stack: np.ndarray,
+    nucleus_mask_stack: np.ndarray,
+    expansion_size: int,
+) -> np.ndarray:
+    cell_expansion_mask_stack = np.empty_like(nucleus_mask_stack, dtype=np.uint8)
+    for i, nucleus_mask in enumerate(nucleus_mask_stack):
+        cell_expansion_mask_stack[i] = create_cell_expansion_mask(
+            nucleus_mask, expansion_size
+        )
+    return cell_expansion_mask_stack
+
+
+def _create_cell_expansion_mask_stack_raster(
+    nuclei_labels_stack: np.ndarray,
+    nucleus_mask_stack: np.ndarray,
+    expansion_size: int,
+) -> np.ndarray:
+    center_x, center_y = calculate_image_center(nuclei_labels_stack[0])
+    focused_nucleus_colors = nuclei_labels_stack[:, center_x, center_y]
+    cell_expansion_mask_stack = np.zeros_like(nucleus_mask_stack, dtype=np.uint8)
+    for i in np.flatnonzero(focused_nucleus_colors):
+        nuclei_labels_image = nuclei_labels_stack[i]
+        # every pixel takes the label of its nearest nucleus,
+        # so the expansion never overlaps neighbouring nuclei
+        distances, (nearest_x, nearest_y) = distance_transform_edt(
+            nuclei_labels_image == 0, return_indices=True
+        )
+        nearest_labels = nuclei_labels_image[nearest_x, nearest_y]
+        cell_expansion_mask_stack[i] = (
+            nearest_labels == focused_nucleus_colors[i]
+        ) & (distances <= expansion_size)
+    return cell_expansion_mask_stack
+
+
+def create_cell_expansion_mask_stack(
+    nuclei_labels_stack: np.ndarray,
+    nucleus_mask_stack: np.ndarray,
+    expansion_size: Optional[int] = 6,
+    expansion_method: Optional[str] = "raster",
+) -> np.ndarray:
+    """
+    Create masks of cell expansion for a stack of label images of the same shape.
+
+    Returns a stack of cell expansion labels.
+
+    Parameters
+    ----------
+    nuclei_labels_stack : ndarray
+        Array of shape (N, H, W) with multi-label images of WSI regions
+        defined by cell bounding boxes.
+    nucleus_mask_stack : ndarray
+        Array of shape (N, H, W) with cell nucleus labels.
+    expansion_size : int, optional, default 6
+        Factor by which the initial area is offset.
+    expansion_method : str, optional, default "raster"
+        Name of the supported expansion method. "raster" expands the nucleus
+        by a distance transform of the label image without overlapping
+        neighbouring nuclei, "contour" offsets the nucleus contour polygon.
+
+    Returns
+    -------
+    ndarray
+        Contiguous uint8 array of shape (N, H, W) with cell expansion labels.
+    """
+    if expansion_method in CellExpansionMethod.values():
+        create_cell_expansion_mask_stack_func = globals()[
+            f"_create_cell_expansion_mask_stack_{expansion_method}"
+        ]
+        return create_cell_expansion_mask_stack_func(
+            nuclei_labels_stack, nucleus_mask_stack, expansion_size
+        )
+
+
+def create_object_masks_stack(
+    nuclei_labels_stack: np.ndarray,
+    expansion_size: Optional[int] = 6,
+    expansion_method: Optional[str] = "raster",
+) -> Dict[str, np.ndarray]:
+    """
+    Create masks of cell objects for a stack of label images of the same shape.
+
+    Returns a dictionary with NucleusMask, ExpansionMask and OutlineMask keys,
+    values of which are contiguous uint8 arrays of shape (N, H, W).
+
+    Parameters
+    ----------
+    nuclei_labels_stack : ndarray
+        Array of shape (N, H, W) with multi-label images of WSI regions
+        defined by cell bounding boxes.
+    expansion_size : int, optional, default 6
+        Factor by which the nucleus area is offset.
+    expansion_method : str, optional, default "raster"
+        Name of the supported expansion method.
+
+    Returns
+    -------
+    dict
+        Dictionary containing stacks of cell objects masks.
+    """
+    nucleus_mask_stack = create_nucleus_mask_stack(nuclei_labels_stack)
+    cell_expansion_mask_stack = create_cell_expansion_mask_stack(
+        nuclei_labels_stack, nucleus_mask_stack, expansion_size, expansion_method
+    )
+    cell_outline_mask_stack = cell_expansion_mask_stack - nucleus_mask_stack
+    return {
+        "NucleusMask": nucleus_mask_stack,
+        "ExpansionMask": cell_expansion_mask_stack,
+        "OutlineMask": cell_outline_mask_stack,
+    }
+
+
 def create_object_masks_data(
     cell_detected_nucleus_list: Sequence[np.ndarray],
     to_dataframe: Optional[bool] = False,
+    expansion_size: Optional[int] = 6,
+    expansion_method: Optional[str] = "raster",
+    segmentation_status: Optional[Sequence[bool]] = None,
 ):
     """
     Create masks of cell objects.
@@ -111,40 +254,53 @@ def create_object_masks_data(
         List of cell labels.
     to_dataframe : bool, optional, default False
         Flag for converting resulting dictionary to a DataFrame.
+    expansion_size : int, optional, default 6
+        Factor by which the nucleus area is offset.
+    expansion_method : str, optional, default "raster"
+        Name of the supported expansion method.
+    segmentation_status : array-like of bool, optional, default None
+        Flags of cells with a detected nucleus, masks of other cells are not
+        created and are left as None. By default masks are created for all cells.
 
     Returns
     -------
     dict or DataFrame
         Data instance containing cell objects masks.
     """
-    nucleus_mask_list = [
-        create_nucleus_mask(nuclei_labels_image)
-        for nuclei_labels_image in cell_detected_nucleus_list
-    ]
-    cell_expansion_mask_list = [
-        create_cell_expansion_mask(nucleus_mask) for nucleus_mask in nucleus_mask_list
-    ]
-    cell_outline_mask_list = cell_outline_mask_list = [
-        create_cell_outline_mask(nucleus_mask, cell_expansion_mask)
-        for (nucleus_mask, cell_expansion_mask) in zip(
-            nucleus_mask_list, cell_expansion_mask_list
-        )
-    ]
     object_masks = {
-        "NucleusMask": nucleus_mask_list,
-        "ExpansionMask": cell_expansion_mask_list,
-        "OutlineMask": cell_outline_mask_list,
+        mask_name: [None] * len(cell_detected_nucleus_list)
+        for mask_name in ("NucleusMask", "ExpansionMask", "OutlineMask")
     }
+    # label images of the same shape are processed as a single stack
+    if segmentation_status is None:
+        segmented_indices = range(len(cell_detected_nucleus_list))
+    else:
+        segmented_indices = np.flatnonzero(segmentation_status)
+    shape_groups = {}
+    for i in segmented_indices:
+        nuclei_labels_image = cell_detected_nucleus_list[i]
+        shape_groups.setdefault(np.shape(nuclei_labels_image), []).append(i)
+    for image_indices in shape_groups.values():
+        object_masks_stack = create_object_masks_stack(
+            np.stack([cell_detected_nucleus_list[i] for i in image_indices]),
+            expansion_size=expansion_size,
+            expansion_method=expansion_method,
+        )
+        for mask_name, mask_stack in object_masks_stack.items():
+            for i, mask in zip(image_indices, mask_stack):
+                object_masks[mask_name][i] = mask
     if to_dataframe:
         return pd.DataFrame.from_dict(object_masks)
     return object_masks
 
 
 def create_object_image_data(
-    # TODO: exclude undetected cells from running mask creation
     cell_image_list: Sequence[np.ndarray],
     cell_detected_nucleus_list: Sequence[np.ndarray],
     to_dataframe: Optional[bool] = False,
+    expansion_size: Optional[int] = 6,
+    expansion_method: Optional[str] = "raster",
+    segmentation_status: Optional[Sequence[bool]] = None,
 ):
     """
     Assemble cell object image data structure with generated masks.
@@ -163,12 +319,25 @@ def create_object_image_data(
         List of cell labels.
     to_dataframe : bool, optional, default False
         Flag for converting resulting dictionary to a DataFrame.
+    expansion_size : int, optional, default 6
+        Factor by which the nucleus area is offset.
+    expansion_method : str, optional, default "raster"
+        Name of the supported expansion method.
+    segmentation_status : array-like of bool, optional, default None
+        Flags of cells with a detected nucleus, masks of other cells are not
+        created and are left as None. By default masks are created for all cells.
 
     Returns
     -------
     dict or DataFrame
         Data instance containing cell images and cell objects masks.
     """
-    object_masks = create_object_masks_data(cell_detected_nucleus_list, to_dataframe)
+    object_masks = create_object_masks_data(
+        cell_detected_nucleus_list,
+        to_dataframe,
+        expansion_size=expansion_size,
+        expansion_method=expansion_method,
+        segmentation_status=segmentation_status,
+    )
     object_masks["ColorImage"] = cell_image_list
     return object_masks
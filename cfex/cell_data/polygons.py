@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import (
+    ExtensionArray,
+    ExtensionDtype,
+    register_extension_dtype,
+)
+from pandas.api.types import is_integer
+from typing import Optional, Sequence, Union
+
+
+@register_extension_dtype
+class PolygonDtype(ExtensionDtype):
+    """
+    Data type of a DataFrame column containing cell polygons stored in a PolygonArray.
+    """
+
+    name = "polygon"
+    type = np.ndarray
+    kind = "O"
+    na_value = None
+
+    @classmethod
+    def construct_array_type(cls):
+        return PolygonArray
+
+
+class PolygonArray(ExtensionArray):
+    """
+    Columnar ragged array of polygons.
+
+    Vertices of all polygons are kept in a single flat (M, 2) coordinate buffer,
+    polygon i spans rows offsets[i]:offsets[i + 1] of the buffer.
+    A single polygon is returned as a (1, K, 2) view of the buffer, which matches
+    the layout of polygon arrays built from GeoJSON coordinates.
+    Empty polygons are considered missing values.
+
+    Parameters
+    ----------
+    coordinates : array-like
+        Array with x, y coordinates of vertices of all polygons.
+    offsets : array-like
+        Array of N + 1 positions of the first vertex of each polygon in coordinates.
+    """
+
+    def __init__(self, coordinates: Sequence, offsets: Sequence):
+        self.coordinates = np.asarray(coordinates, dtype=np.int32).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_polygons(cls, polygons: Sequence) -> "PolygonArray":
+        """
+        Build a polygon array from a sequence of polygons.
+
+        Parameters
+        ----------
+        polygons : array-like
+            Sequence of arrays with x, y coordinates of polygon vertices,
+            missing polygons are represented with None.
+
+        Returns
+        -------
+        PolygonArray
+            Polygon array containing given polygons.
+        """
+        coordinates = []
+        lengths = []
+        for object_polygon in polygons:
+            if object_polygon is None or (
+                np.ndim(object_polygon) == 0 and pd.isna(object_polygon)
+            ):
+                lengths.append(0)
+                continue
+            object_polygon = np.asarray(object_polygon).reshape(-1, 2)
+            coordinates.append(object_polygon)
+            lengths.append(len(object_polygon))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if coordinates:
+            return cls(np.concatenate(coordinates), offsets)
+        return cls(np.empty((0, 2), dtype=np.int32), offsets)
+
+    @classmethod
+    def _from_sequence(cls, scalars, dtype=None, copy=False):
+        if isinstance(scalars, cls):
+            return scalars.copy() if copy else scalars
+        return cls.from_polygons(scalars)
+
+    @classmethod
+    def _from_factorized(cls, values, original):
+        return cls.from_polygons(values)
+
+    @classmethod
+    def _concat_same_type(cls, to_concat):
+        to_concat = list(to_concat)
+        coordinates = [
+            polygons.coordinates[polygons.offsets[0] : polygons.offsets[-1]]
+            for polygons in to_concat
+        ]
+        lengths = [polygons.lengths for polygons in to_concat]
+        lengths = np.concatenate(lengths) if lengths else np.empty(0, dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if coordinates:
+            return cls(np.concatenate(coordinates), offsets)
+        return cls(np.empty((0, 2), dtype=np.int32), offsets)
+
+    @property
+    def dtype(self) -> PolygonDtype:
+        return PolygonDtype()
+
+    @property
+    def nbytes(self) -> int:
+        return self.coordinates.nbytes + self.offsets.nbytes
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """
+        Array with vertex counts of each polygon.
+        """
+        return np.diff(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key):
+        if is_integer(key):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("Polygon index out of range")
+            start, stop = self.offsets[key], self.offsets[key + 1]
+            if start == stop:
+                return None
+            return self.coordinates[start:stop][np.newaxis]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                stop = max(start, stop)
+                offsets = self.offsets[start : stop + 1]
+                coordinates = self.coordinates[offsets[0] : offsets[-1]]
+                return type(self)(coordinates, offsets - offsets[0])
+        key = pd.api.indexers.check_array_indexer(self, key)
+        return self.take(np.arange(len(self))[key])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        polygons = np.empty(len(self), dtype=object)
+        polygons[:] = list(self)
+        return polygons
+
+    def isna(self) -> np.ndarray:
+        return self.lengths == 0
+
+    def copy(self) -> "PolygonArray":
+        return type(self)(self.coordinates.copy(), self.offsets.copy())
+
+    def take(
+        self,
+        indices: Sequence[int],
+        allow_fill: Optional[bool] = False,
+        fill_value: Optional[Union[np.ndarray, None]] = None,
+    ) -> "PolygonArray":
+        indices = np.asarray(indices, dtype=np.intp)
+        fill_mask = np.zeros(len(indices), dtype=bool)
+        if allow_fill:
+            if (indices < -1).any():
+                raise ValueError("Invalid value in 'indices', must be all >= -1")
+            fill_mask = indices == -1
+            indices = np.where(fill_mask, 0, indices)
+        else:
+            indices = np.where(indices < 0, indices + len(self), indices)
+        if len(indices) and (indices.min() < 0 or indices.max() >= max(len(self), 1)):
+            raise IndexError("Polygon index out of range")
+        if not len(self):
+            if not fill_mask.all():
+                raise IndexError("Cannot take from an empty polygon array")
+            return type(self)(
+                np.empty((0, 2), dtype=np.int32),
+                np.zeros(len(indices) + 1, dtype=np.int64),
+            )
+        lengths = np.where(fill_mask, 0, self.lengths[indices])
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        vertex_indices = np.repeat(
+            self.offsets[indices] - offsets[:-1], lengths
+        ) + np.arange(offsets[-1])
+        return type(self)(self.coordinates[vertex_indices], offsets)
+
+
+def as_polygon_array(polygons: Union[pd.Series, Sequence]) -> PolygonArray:
+    """
+    Represent given polygons as a PolygonArray without copying them if possible.
+
+    Parameters
+    ----------
+    polygons : Series or array-like
+        Column or sequence containing polygons.
+
+    Returns
+    -------
+    PolygonArray
+        Polygon array containing given polygons.
+    """
+    if isinstance(polygons, pd.Series):
+        polygons = polygons.array
+    if isinstance(polygons, PolygonArray):
+        return polygons
+    return PolygonArray.from_polygons(polygons)
@@ -1,30 +1,65 @@
 import click
+import json
+import hashlib
+import contextlib
 
 # import sys
 from pathlib import Path
-from typing import Optional, List
+from typing import Iterator, Optional, List
 
+import numpy as np
 import pandas as pd
 
-from cfex.cell_data.extract import extract_cell_data
-from cfex.cell_data.image import load_cell_images
-from cfex.cell_data.detect import detect_cells
+from cfex.enums import (
+    CellCropMode,
+    CellExpansionMethod,
+    CellFeaturesBackend,
+    CellFeaturesFormat,
+    CellImageExportFormat,
+    CellImageReadMode,
+    CellSegmentationMode,
+    RunStage,
+)
+from cfex.cell_data.extract import iter_cell_data
+from cfex.cell_data.image import (
+    load_cell_images,
+    load_cell_region_images,
+    sample_tissue_tiles,
+    split_region_images,
+)
+from cfex.cell_data.cache import (
+    CellResultCache,
+    TileCache,
+    calculate_cell_cache_keys,
+    calculate_wsi_cache_key,
+)
+from cfex.cell_data.detect import (
+    CellDetectionPool,
+    calculate_normalization_statistics,
+    detect_cells,
+    get_segmentation_status,
+)
 from cfex.cell_data.mask import create_object_image_data
-from cfex.cell_data.export import save_cell_objects_image_data
-from cfex.feature_extraction.extract import extract_measurements
+from cfex.cell_data.export import (
+    create_cell_images_directory,
+    save_cell_objects_image_data,
+)
+from cfex.feature_extraction.extract import (
+    extract_measurements,
+    save_cell_features_data,
+)
+from cfex.feature_extraction.store import append_cell_features_store
+from cfex.checkpoint import RunCheckpoint, load_run_manifest
 
 # TODO: make the script launch faster by restructuring entry points and local imports
 
-# TODO: implement an alternative way to call this function
-def load_data(
+def iter_cell_data_chunks(
     wsi_path: Path,
     cell_data_path: Path,
     size: Optional[int],
-    cell_image_load_backend: str,
-    bounding_box_margin: Optional[int] = 50,
+    chunk_size: int,
     extract_measurements: bool = False,
-    silent: bool = False,
-):
+) -> Iterator[pd.DataFrame]:
     verbose_print(
         "[loading input data]",
         ":: WSI path:",
@@ -35,64 +70,266 @@ def load_data(
     )
     wsi_path, cell_data_path = Path(wsi_path).resolve(), Path(cell_data_path).resolve()
     wsi_name = wsi_path.stem.split(".")[0]
-    verbose_print(":: Extracting cell data... ", end="", flush=True)
-    with open(cell_data_path) as cell_data:
-        cell_data = extract_cell_data(
-            cell_data, data_format="qupath", extract_measurements=extract_measurements
-        )[:size]
-        cell_data["WSI"] = wsi_name
-        verbose_print("Done!")
-    verbose_print(f":: Cell object count: {len(cell_data.index)}")
-    verbose_print(
-        f":: Loading WSI regions defined by a {bounding_box_margin * 2}x{bounding_box_margin * 2} pixels bounding box...",
-    )
+    with open(cell_data_path) as cell_data_file:
+        for cell_data in iter_cell_data(
+            cell_data_file,
+            data_format="qupath",
+            extract_measurements=extract_measurements,
+            chunk_size=chunk_size,
+            size=size,
+        ):
+            cell_data["WSI"] = wsi_name
+            yield cell_data
+
+
+def load_cell_image_data(
+    wsi_path: Path,
+    cell_data: pd.DataFrame,
+    cell_image_load_backend: str,
+    bounding_box_margin: Optional[int] = 50,
+    read_mode: str = "cell",
+    tile_size: int = 1024,
+    load_workers: int = 1,
+    tile_cache: Optional[TileCache] = None,
+    cache_dir: Optional[Path] = None,
+    crop_mode: str = "fixed",
+    crop_padding: int = 8,
+    silent: bool = False,
+):
+    if crop_mode == CellCropMode.ADAPTIVE.value:
+        verbose_print(
+            f":: Loading WSI regions defined by cell polygons padded by {crop_padding} pixels...",
+        )
+    else:
+        verbose_print(
+            f":: Loading WSI regions defined by a {bounding_box_margin * 2}x{bounding_box_margin * 2} pixels bounding box...",
+        )
     cell_image_list = load_cell_images(
-        wsi_path=wsi_path,
+        wsi_path=Path(wsi_path).resolve(),
         cell_data=cell_data,
-        cell_image_load_backend="slideio",
+        cell_image_load_backend=cell_image_load_backend,
         bounding_box_margin=bounding_box_margin,
         show_progress=not silent,
+        read_mode=read_mode,
+        tile_size=tile_size,
+        workers=load_workers,
+        tile_cache=tile_cache,
+        cache_dir=cache_dir,
+        crop_mode=crop_mode,
+        crop_padding=crop_padding,
+    )
+    if tile_cache is not None:
+        verbose_print(
+            f":: Tile cache hits: {tile_cache.hits}, misses: {tile_cache.misses}"
+        )
+    return cell_image_list
+
+
+# TODO: implement an alternative way to call this function
+def load_data(
+    wsi_path: Path,
+    cell_data_path: Path,
+    size: Optional[int],
+    cell_image_load_backend: str,
+    bounding_box_margin: Optional[int] = 50,
+    extract_measurements: bool = False,
+    read_mode: str = "cell",
+    tile_size: int = 1024,
+    load_workers: int = 1,
+    tile_cache_size: int = 0,
+    cache_dir: Optional[Path] = None,
+    silent: bool = False,
+):
+    cell_data_chunks = list(
+        iter_cell_data_chunks(
+            wsi_path=wsi_path,
+            cell_data_path=cell_data_path,
+            size=size,
+            chunk_size=size or 10000,
+            extract_measurements=extract_measurements,
+        )
+    )
+    cell_data = pd.concat(cell_data_chunks) if cell_data_chunks else pd.DataFrame()
+    verbose_print(f":: Cell object count: {len(cell_data.index)}")
+    tile_cache = None
+    if tile_cache_size:
+        tile_cache = TileCache(max_bytes=tile_cache_size * 2**20)
+    cell_image_list = load_cell_image_data(
+        wsi_path=wsi_path,
+        cell_data=cell_data,
+        cell_image_load_backend=cell_image_load_backend,
+        bounding_box_margin=bounding_box_margin,
+        read_mode=read_mode,
+        tile_size=tile_size,
+        load_workers=load_workers,
+        tile_cache=tile_cache,
+        cache_dir=cache_dir,
+        silent=silent,
     )
     return cell_data, cell_image_list
 
 
+def get_normalization_statistics(
+    wsi_path, cell_image_load_backend, cache_dir, silent=True
+):
+    verbose_print(
+        "[slide normalization]",
+        ":: Calculating intensity percentiles on sampled tissue tiles...",
+        sep="\n",
+    )
+    sampling_parameters = {"tile_size": 256, "sample_count": 32, "seed": 0}
+    cache_key = calculate_wsi_cache_key(wsi_path, **sampling_parameters)
+    statistics_path = Path(cache_dir) / f"normalization_{cache_key}.json"
+    if statistics_path.exists():
+        with open(statistics_path) as statistics_file:
+            normalization_statistics = tuple(json.load(statistics_file))
+        verbose_print(":: Loaded cached percentiles:", statistics_path, sep="\n")
+    else:
+        tile_list = sample_tissue_tiles(
+            wsi_path, cell_image_load_backend, **sampling_parameters
+        )
+        normalization_statistics = calculate_normalization_statistics(tile_list)
+        statistics_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(statistics_path, "w") as statistics_file:
+            json.dump(normalization_statistics, statistics_file)
+    verbose_print(f":: Intensity percentiles: {normalization_statistics}")
+    return normalization_statistics
+
+
 # TODO: account for cell boxes around the edges of the slide
-def get_segmentation_data(cell_image_list, cell_detection_backend, silent=True):
+def get_segmentation_data(
+    cell_image_list,
+    cell_detection_backend,
+    batch_size=1,
+    workers=1,
+    normalization_statistics=None,
+    detection_pool=None,
+    silent=True,
+):
     verbose_print(
         "[instance segmentation]",
         ":: Running cell instance segmentation...",
         sep="\n",
     )
-    cell_detected_nucleus_list, unsegmented_cell_data = detect_cells(
+    cell_detected_nucleus_list = detect_cells(
         cell_image_list=cell_image_list,
         cell_detection_backend=cell_detection_backend,
         show_progress=not silent,
-        stash_undetected=True,
+        batch_size=batch_size,
+        workers=workers,
+        normalization_statistics=normalization_statistics,
+        detection_pool=detection_pool,
     )
+    segmentation_status = get_segmentation_status(cell_detected_nucleus_list)
+    verbose_print(f":: Found cell instances: {segmentation_status.sum()}")
+    return cell_detected_nucleus_list, segmentation_status
+
+
+def get_region_segmentation_data(
+    wsi_path,
+    cell_data,
+    cell_image_load_backend,
+    cell_detection_backend,
+    bounding_box_margin=50,
+    tile_size=1024,
+    load_workers=1,
+    tile_cache=None,
+    detection_workers=1,
+    normalization_statistics=None,
+    detection_pool=None,
+    crop_mode="fixed",
+    crop_padding=8,
+    silent=True,
+):
     verbose_print(
-        f":: Found cell instances: {len(cell_detected_nucleus_list) - len(unsegmented_cell_data)}",
+        "[region instance segmentation]",
+        f":: Loading WSI regions covering cells on a {tile_size}x{tile_size} pixels tile grid...",
+        sep="\n",
     )
-    return cell_detected_nucleus_list, unsegmented_cell_data
+    region_image_list, cell_box_groups, cell_boxes = load_cell_region_images(
+        wsi_path=Path(wsi_path).resolve(),
+        cell_data=cell_data,
+        cell_image_load_backend=cell_image_load_backend,
+        bounding_box_margin=bounding_box_margin,
+        show_progress=not silent,
+        tile_size=tile_size,
+        workers=load_workers,
+        tile_cache=tile_cache,
+        crop_mode=crop_mode,
+        crop_padding=crop_padding,
+    )
+    verbose_print(
+        f":: Running cell instance segmentation on {len(region_image_list)} regions..."
+    )
+    region_label_list = detect_cells(
+        cell_image_list=region_image_list,
+        cell_detection_backend=cell_detection_backend,
+        show_progress=not silent,
+        workers=detection_workers,
+        normalization_statistics=normalization_statistics,
+        detection_pool=detection_pool,
+    )
+    cell_image_list = split_region_images(
+        region_image_list, cell_box_groups, cell_boxes
+    )
+    cell_detected_nucleus_list = split_region_images(
+        region_label_list, cell_box_groups, cell_boxes
+    )
+    segmentation_status = get_segmentation_status(cell_detected_nucleus_list)
+    verbose_print(f":: Found cell instances: {segmentation_status.sum()}")
+    return cell_image_list, cell_detected_nucleus_list, segmentation_status
 
 
-def get_image_object_data(cell_image_list, cell_detected_nucleus_list, silent=True):
+def get_image_object_data(
+    cell_image_list,
+    cell_detected_nucleus_list,
+    expansion_size=6,
+    expansion_method="raster",
+    segmentation_status=None,
+    silent=True,
+):
     verbose_print(
         "[object mask generation]", ":: Creating cell object masks...", sep="\n"
     )
     image_object_data = create_object_image_data(
-        cell_image_list, cell_detected_nucleus_list, to_dataframe=True
+        cell_image_list,
+        cell_detected_nucleus_list,
+        to_dataframe=True,
+        expansion_size=expansion_size,
+        expansion_method=expansion_method,
+        segmentation_status=segmentation_status,
     )
     # TODO: add modes (e.g. cell box image extraction, cell feature extraction)
     return image_object_data
 
 
-def export_to_files(cell_data, image_object_data, export_path):
+def export_to_files(
+    cell_data,
+    image_object_data,
+    export_path,
+    create_subdirectory=True,
+    segmentation_status=None,
+    export_format="files",
+    workers=1,
+):
     verbose_print("[export]", ":: Saving cell images...", sep="\n")
-    cell_data_extended = pd.concat([cell_data, image_object_data], axis=1).dropna()
+    image_object_data.index = cell_data.index
+    if segmentation_status is None:
+        cell_data_extended = pd.concat(
+            [cell_data, image_object_data], axis=1
+        ).dropna()
+    else:
+        cell_data_extended = pd.concat(
+            [cell_data[segmentation_status], image_object_data[segmentation_status]],
+            axis=1,
+        )
     cell_images_path = save_cell_objects_image_data(
         cell_data_extended,
         export_path,
         show_progress=True,
+        create_subdirectory=create_subdirectory,
+        export_format=export_format,
+        workers=workers,
     )
     return cell_images_path
 
@@ -102,16 +339,75 @@ def extract_features(
     feature_extraction_backend,
     output_path,
     cell_profiler_pipeline_path,
+    cell_data=None,
+    batch_size=None,
+    workers=1,
+    output_format="parquet",
+    feature_store_path=None,
+    checkpoint=None,
 ):
     verbose_print("[extraction]", ":: Extracting cell features...", sep="\n")
-    extract_measurements(
+    return extract_measurements(
         cell_images_path=cell_images_path,
         feature_extraction_backend=feature_extraction_backend,
         output_path=output_path,
         cell_profiler_pipeline_path=cell_profiler_pipeline_path,
+        cell_data=cell_data,
+        batch_size=batch_size,
+        workers=workers,
+        output_format=output_format,
+        feature_store_path=feature_store_path,
+        checkpoint=checkpoint,
     )
 
 
+# parameters affecting only the speed or verbosity of a run may differ on resume
+RUN_IGNORED_PARAMETERS = [
+    "load_workers",
+    "tile_cache_size",
+    "cache_dir",
+    "detection_workers",
+    "cellprofiler_workers",
+    "export_workers",
+    "silent",
+]
+
+
+# distance from the cell centroid to the side of a fixed cell bounding box
+CELL_BOUNDING_BOX_MARGIN = 50
+
+
+# parameters affecting results of processing single cells, part of cell cache keys
+CELL_CACHE_PARAMETERS = [
+    "measurement_extraction",
+    "read_mode",
+    "crop_mode",
+    "crop_padding",
+    "segmentation_mode",
+    "tile_size",
+    "detection_batch_size",
+    "slide_normalization",
+    "expansion_size",
+    "expansion_method",
+    "feature_backend",
+    "cellprofiler_in_memory",
+]
+
+
+def load_resumed_run_parameters(ctx, param, value):
+    # parameters of the resumed run serve as defaults of options not given explicitly
+    if value is not None:
+        manifest = load_run_manifest(value)
+        if manifest is None:
+            raise click.BadParameter("the directory contains no run manifest")
+        ctx.default_map = {**manifest["parameters"], **(ctx.default_map or {})}
+        # recent click versions prompt for values taken from the default map
+        for command_param in ctx.command.params:
+            if command_param.name in manifest["parameters"]:
+                command_param.prompt = None
+    return value
+
+
 @click.command()
 @click.option(
     "-w",
@@ -168,6 +464,175 @@ def extract_features(
     default=False,
     help="Extract existing measurements from the cell object data file as additional features",
 )
+@click.option(
+    "--read-mode",
+    type=click.Choice(CellImageReadMode.values()),
+    default=CellImageReadMode.TILE.value,
+    show_default=True,
+    help="Strategy of reading cell regions from the WSI",
+)
+@click.option(
+    "--tile-size",
+    type=int,
+    default=1024,
+    show_default=True,
+    help="Side length of the tile grid used for grouping cell regions in tile read mode",
+)
+@click.option(
+    "--load-workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Amount of threads reading cell regions from the WSI concurrently",
+)
+@click.option(
+    "--tile-cache-size",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Memory budget in MiB for caching decoded WSI tiles between region reads (0 disables the cache)",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(resolve_path=True, file_okay=False, dir_okay=True),
+    required=False,
+    help="Path to the directory for caching loaded cell images between runs",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+    help="Amount of cells going through all processing stages at once",
+)
+@click.option(
+    "--detection-batch-size",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Amount of cell images segmented by a single StarDist call",
+)
+@click.option(
+    "--detection-workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Amount of processes running cell instance segmentation, each with its own model",
+)
+@click.option(
+    "--segmentation-mode",
+    type=click.Choice(CellSegmentationMode.values()),
+    default=CellSegmentationMode.CELL.value,
+    show_default=True,
+    help="Segment every cell image separately or whole regions covering neighbouring cells once",
+)
+@click.option(
+    "--slide-normalization",
+    is_flag=True,
+    default=False,
+    help="Normalize all cell images with intensity percentiles calculated once on sampled tissue tiles of the WSI",
+)
+@click.option(
+    "--crop-mode",
+    type=click.Choice(CellCropMode.values()),
+    default=CellCropMode.FIXED.value,
+    show_default=True,
+    help="Use fixed-size cell boxes or boxes sized by cell polygons and rounded to a few bucket sizes",
+)
+@click.option(
+    "--crop-padding",
+    type=click.IntRange(min=0),
+    default=8,
+    show_default=True,
+    help="Distance in pixels from the cell polygon to the side of the box in adaptive crop mode",
+)
+@click.option(
+    "--expansion-size",
+    type=click.IntRange(min=0),
+    default=6,
+    show_default=True,
+    help="Distance in pixels by which the nucleus mask is expanded into the cell expansion mask",
+)
+@click.option(
+    "--expansion-method",
+    type=click.Choice(CellExpansionMethod.values()),
+    default=CellExpansionMethod.RASTER.value,
+    show_default=True,
+    help="Expand nuclei by a distance transform limited by neighbouring nuclei or by offsetting their contours",
+)
+@click.option(
+    "--feature-backend",
+    type=click.Choice(CellFeaturesBackend.values()),
+    default=CellFeaturesBackend.CELLPROFILER.value,
+    show_default=True,
+    help="Extract features with a CellProfiler pipeline from exported files or calculate shape features in-process from masks in memory",
+)
+@click.option(
+    "--cellprofiler-in-memory",
+    is_flag=True,
+    default=False,
+    help="Pass cell images and masks to the CellProfiler pipeline in memory instead of exporting them to files",
+)
+@click.option(
+    "--cellprofiler-batch-size",
+    type=click.IntRange(min=1),
+    required=False,
+    help="Amount of exported cells measured by a single CellProfiler pipeline run (all cells by default)",
+)
+@click.option(
+    "--cellprofiler-workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Amount of processes running CellProfiler pipeline batches, each with its own JVM",
+)
+@click.option(
+    "--export-format",
+    type=click.Choice(CellImageExportFormat.values()),
+    default=CellImageExportFormat.FILES.value,
+    show_default=True,
+    help="Save a PNG image and TIF masks for every cell or all cells to a single HDF5 archive",
+)
+@click.option(
+    "--export-workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Amount of threads writing cell image files concurrently",
+)
+@click.option(
+    "--features-format",
+    type=click.Choice(CellFeaturesFormat.values()),
+    default=CellFeaturesFormat.PARQUET.value,
+    show_default=True,
+    help="Save cell features with float32 values to a Parquet file or to a CSV file",
+)
+@click.option(
+    "--feature-store-path",
+    type=click.Path(resolve_path=True, file_okay=False, dir_okay=True),
+    required=False,
+    help="Path to a dataset directory partitioned by slide to which cell features are appended",
+)
+@click.option(
+    "--cell-cache-dir",
+    type=click.Path(resolve_path=True, file_okay=False, dir_okay=True),
+    required=False,
+    help="Path to a directory caching labels, masks and features of single cells, only new or edited cells are processed",
+)
+@click.option(
+    "--run-dir",
+    type=click.Path(resolve_path=True, file_okay=False, dir_okay=True),
+    required=False,
+    help="Path to a directory for the run manifest and per-chunk checkpoints, an interrupted run in it is resumed",
+)
+@click.option(
+    "--resume",
+    type=click.Path(resolve_path=True, exists=True, file_okay=False, dir_okay=True),
+    required=False,
+    is_eager=True,
+    callback=load_resumed_run_parameters,
+    help="Path to the directory of an interrupted run to resume with its parameters, skipping completed stages and chunks",
+)
 @click.option(
     "--silent",
     is_flag=True,
@@ -183,39 +648,338 @@ def run_extraction(
     cell_image_export_path,
     output_path,
     cell_profiler_pipeline_path,
+    read_mode,
+    tile_size,
+    load_workers,
+    tile_cache_size,
+    cache_dir,
+    chunk_size,
+    detection_batch_size,
+    detection_workers,
+    segmentation_mode,
+    slide_normalization,
+    crop_mode,
+    crop_padding,
+    expansion_size,
+    expansion_method,
+    feature_backend,
+    cellprofiler_in_memory,
+    cellprofiler_batch_size,
+    cellprofiler_workers,
+    export_format,
+    export_workers,
+    features_format,
+    feature_store_path,
+    cell_cache_dir,
+    run_dir,
+    resume,
     silent,
 ):
     """Extract features from cell data"""
     global verbose_print
     verbose_print = print if not silent else lambda *args, **kwargs: None
-    cell_data, cell_image_list = load_data(
+    tile_cache = None
+    if tile_cache_size:
+        tile_cache = TileCache(max_bytes=tile_cache_size * 2**20)
+    in_memory_features = (
+        feature_backend == CellFeaturesBackend.NATIVE.value or cellprofiler_in_memory
+    )
+    if export_format != CellImageExportFormat.FILES.value and not in_memory_features:
+        raise click.BadParameter(
+            "the CellProfiler pipeline reads exported image files, use the files "
+            "export format or extract features in memory",
+            param_hint="--export-format",
+        )
+    cell_cache = None
+    if cell_cache_dir:
+        if not in_memory_features or cell_image_export_path:
+            raise click.BadParameter(
+                "images of cached cells are not loaded, extract features in memory "
+                "without exporting cell images",
+                param_hint="--cell-cache-dir",
+            )
+        cell_cache = CellResultCache(cell_cache_dir)
+        cell_cache_parameters = {
+            name: value
+            for name, value in click.get_current_context().params.items()
+            if name in CELL_CACHE_PARAMETERS
+        }
+        cell_cache_parameters["bounding_box_margin"] = CELL_BOUNDING_BOX_MARGIN
+        if cell_profiler_pipeline_path:
+            cell_cache_parameters["cell_profiler_pipeline"] = hashlib.sha256(
+                Path(cell_profiler_pipeline_path).read_bytes()
+            ).hexdigest()
+        verbose_print(f":: Cached cells: {len(cell_cache)}")
+    checkpoint = None
+    run_path = resume or run_dir
+    if run_path:
+        if export_format == CellImageExportFormat.HDF5.value:
+            raise click.BadParameter(
+                "cells of an interrupted chunk cannot be removed from the HDF5 "
+                "archive on resume, use the files export format",
+                param_hint="--export-format",
+            )
+        run_parameters = {
+            name: value
+            for name, value in click.get_current_context().params.items()
+            if name not in ("run_dir", "resume")
+        }
+        try:
+            checkpoint = RunCheckpoint(
+                run_path, run_parameters, ignored_parameters=RUN_IGNORED_PARAMETERS
+            )
+        except ValueError as error:
+            raise click.BadParameter(str(error), param_hint="--resume")
+        verbose_print("[checkpoint]", ":: Run directory:", run_path, sep="\n")
+        if checkpoint.features_complete:
+            verbose_print(":: All stages of the run are already completed.")
+            return
+    cell_images_path = None
+    # features extracted in memory only need exported files on request
+    if cell_image_export_path or not in_memory_features:
+        if checkpoint is not None and checkpoint.cell_images_path is not None:
+            # chunks completed by the resumed run were exported to this directory
+            cell_images_path = checkpoint.cell_images_path
+        else:
+            cell_images_path = create_cell_images_directory(
+                Path(cell_image_export_path)
+            )
+            if checkpoint is not None:
+                checkpoint.set_cell_images_path(cell_images_path)
+    normalization_statistics = None
+    if slide_normalization:
+        normalization_statistics = get_normalization_statistics(
+            wsi_path=wsi,
+            cell_image_load_backend="slideio",
+            cache_dir=cache_dir or output_path or Path.cwd(),
+            silent=silent,
+        )
+    cell_data_chunks = iter_cell_data_chunks(
         wsi_path=wsi,
         cell_data_path=data,
         size=size,
-        cell_image_load_backend="slideio",
+        chunk_size=chunk_size,
         extract_measurements=measurement_extraction,
-        silent=silent,
-    )
-    cell_detected_nucleus_list, _ = get_segmentation_data(
-        cell_image_list, cell_detection_backend="stardist", silent=silent
     )
-    image_object_data = get_image_object_data(
-        cell_image_list=cell_image_list,
-        cell_detected_nucleus_list=cell_detected_nucleus_list,
-        silent=silent,
-    )
-    # TODO: alternative calls to functions called below
-    cell_images_path = export_to_files(
-        cell_data=cell_data,
-        image_object_data=image_object_data,
-        export_path=Path(cell_image_export_path),
-    )
-    extract_features(
-        cell_images_path=cell_images_path,
-        feature_extraction_backend="cellprofiler",
-        output_path=Path(output_path),
-        cell_profiler_pipeline_path=cell_profiler_pipeline_path,
+    cell_count = segmented_count = 0
+    cell_features_chunks = []
+    detection_pool_context = contextlib.nullcontext()
+    if detection_workers > 1:
+        # worker processes load the model once and segment cells of all chunks
+        detection_pool_context = CellDetectionPool("stardist", detection_workers)
+    # worker processes are stopped even if a chunk fails
+    with detection_pool_context as detection_pool:
+        # every chunk goes through all stages before the next one is read
+        for chunk_number, cell_data in enumerate(cell_data_chunks):
+            verbose_print(
+                f"[chunk] :: Cells {cell_data.index[0]}-{cell_data.index[-1]}",
+            )
+            chunk_stage = None
+            if checkpoint is not None:
+                chunk_stage = checkpoint.get_chunk_stage(chunk_number, cell_data)
+            if chunk_stage == RunStage.COMPLETE.value:
+                verbose_print(":: Skipping the chunk completed by the resumed run")
+                chunk_cell_count, chunk_segmented_count = checkpoint.get_chunk_counts(
+                    chunk_number
+                )
+                cell_count += chunk_cell_count
+                segmented_count += chunk_segmented_count
+                chunk_features_data = checkpoint.load_features(chunk_number)
+                if chunk_features_data is not None:
+                    cell_features_chunks.append(chunk_features_data)
+                continue
+            chunk_cell_data = cell_data
+            if cell_cache is not None:
+                # only cells without cached results go through the stages below
+                cell_cache_keys = calculate_cell_cache_keys(
+                    wsi,
+                    [chunk_cell_data["CellPolygon"], chunk_cell_data["NucleusPolygon"]],
+                    **cell_cache_parameters,
+                )
+                cached_status = cell_cache.contains(cell_cache_keys)
+                verbose_print(
+                    f":: Reusing cached results of cells: {cached_status.sum()} of {len(cached_status)}"
+                )
+                cell_data = chunk_cell_data[~cached_status]
+            if chunk_stage == RunStage.SEGMENTED.value:
+                verbose_print(":: Loading cell images and labels of the resumed run...")
+                (
+                    cell_image_list,
+                    cell_detected_nucleus_list,
+                    segmentation_status,
+                ) = checkpoint.load_segmentation(chunk_number)
+            elif cell_data.empty:
+                cell_image_list, cell_detected_nucleus_list = [], []
+                segmentation_status = np.zeros(0, dtype=bool)
+            elif segmentation_mode == CellSegmentationMode.REGION.value:
+                (
+                    cell_image_list,
+                    cell_detected_nucleus_list,
+                    segmentation_status,
+                ) = get_region_segmentation_data(
+                    wsi_path=wsi,
+                    cell_data=cell_data,
+                    cell_image_load_backend="slideio",
+                    cell_detection_backend="stardist",
+                    bounding_box_margin=CELL_BOUNDING_BOX_MARGIN,
+                    tile_size=tile_size,
+                    load_workers=load_workers,
+                    tile_cache=tile_cache,
+                    detection_workers=detection_workers,
+                    normalization_statistics=normalization_statistics,
+                    detection_pool=detection_pool,
+                    crop_mode=crop_mode,
+                    crop_padding=crop_padding,
+                    silent=silent,
+                )
+            else:
+                cell_image_list = load_cell_image_data(
+                    wsi_path=wsi,
+                    cell_data=cell_data,
+                    cell_image_load_backend="slideio",
+                    bounding_box_margin=CELL_BOUNDING_BOX_MARGIN,
+                    read_mode=read_mode,
+                    tile_size=tile_size,
+                    load_workers=load_workers,
+                    tile_cache=tile_cache,
+                    cache_dir=cache_dir,
+                    crop_mode=crop_mode,
+                    crop_padding=crop_padding,
+                    silent=silent,
+                )
+                cell_detected_nucleus_list, segmentation_status = get_segmentation_data(
+                    cell_image_list,
+                    cell_detection_backend="stardist",
+                    batch_size=detection_batch_size,
+                    workers=detection_workers,
+                    normalization_statistics=normalization_statistics,
+                    detection_pool=detection_pool,
+                    silent=silent,
+                )
+            if checkpoint is not None and chunk_stage is None:
+                checkpoint.save_segmentation(
+                    chunk_number,
+                    chunk_cell_data,
+                    cell_image_list,
+                    cell_detected_nucleus_list,
+                    segmentation_status,
+                )
+            chunk_cell_count = len(chunk_cell_data.index)
+            chunk_segmented_count = int(segmentation_status.sum())
+            # masks and image files are only created for cells with a detected nucleus
+            image_object_data = get_image_object_data(
+                cell_image_list=cell_image_list,
+                cell_detected_nucleus_list=cell_detected_nucleus_list,
+                expansion_size=expansion_size,
+                expansion_method=expansion_method,
+                segmentation_status=segmentation_status,
+                silent=silent,
+            )
+            # TODO: alternative calls to functions called below
+            if cell_images_path is not None:
+                export_to_files(
+                    cell_data=cell_data,
+                    image_object_data=image_object_data,
+                    export_path=cell_images_path,
+                    create_subdirectory=False,
+                    segmentation_status=segmentation_status,
+                    export_format=export_format,
+                    workers=export_workers,
+                )
+            chunk_features_data = computed_features_data = None
+            if in_memory_features and segmentation_status.any():
+                image_object_data.index = cell_data.index
+                chunk_features_data = computed_features_data = extract_features(
+                    cell_images_path=None,
+                    feature_extraction_backend=feature_backend,
+                    output_path=None,
+                    cell_profiler_pipeline_path=cell_profiler_pipeline_path,
+                    cell_data=pd.concat(
+                        [
+                            cell_data[segmentation_status],
+                            image_object_data[segmentation_status],
+                        ],
+                        axis=1,
+                    ),
+                )
+            if cell_cache is not None and cached_status.any():
+                (
+                    _,
+                    cached_segmentation_status,
+                    _,
+                    cached_features_data,
+                ) = cell_cache.load(cell_cache_keys[cached_status])
+                chunk_segmented_count += int(cached_segmentation_status.sum())
+                if cached_features_data is not None:
+                    chunk_segmentation_status = np.zeros(chunk_cell_count, dtype=bool)
+                    chunk_segmentation_status[~cached_status] = segmentation_status
+                    chunk_segmentation_status[cached_status] = (
+                        cached_segmentation_status
+                    )
+                    cached_features_data.index = chunk_cell_data.index[cached_status][
+                        cached_segmentation_status
+                    ]
+                    chunk_features_data = pd.concat(
+                        [cached_features_data, computed_features_data]
+                    ).loc[chunk_cell_data.index[chunk_segmentation_status]]
+            if chunk_features_data is not None:
+                cell_features_chunks.append(chunk_features_data)
+            if checkpoint is not None:
+                checkpoint.complete_chunk(
+                    chunk_number,
+                    chunk_features_data,
+                    cell_count=chunk_cell_count,
+                    segmented_count=chunk_segmented_count,
+                )
+            if cell_cache is not None:
+                cell_cache.save(
+                    cell_cache_keys[~cached_status],
+                    cell_detected_nucleus_list,
+                    segmentation_status,
+                    {
+                        mask_name: image_object_data[mask_name].tolist()
+                        for mask_name in ("NucleusMask", "ExpansionMask", "OutlineMask")
+                    },
+                    computed_features_data,
+                )
+            cell_count += chunk_cell_count
+            segmented_count += chunk_segmented_count
+    verbose_print(
+        "[segmentation summary]",
+        f":: Segmented cells: {segmented_count} of {cell_count}",
+        f":: Skipped cells without a detected nucleus: {cell_count - segmented_count}",
+        sep="\n",
     )
+    cell_features_path = None
+    if in_memory_features:
+        if cell_features_chunks:
+            cell_features_data = pd.concat(cell_features_chunks)
+            cell_features_path = save_cell_features_data(
+                cell_features_data,
+                Path(output_path or Path.cwd()),
+                output_format=features_format,
+            )
+            if feature_store_path:
+                # the run id keeps the append idempotent when the run is resumed
+                append_cell_features_store(
+                    cell_features_data,
+                    feature_store_path,
+                    append_id=checkpoint and checkpoint.run_id,
+                )
+    else:
+        extract_features(
+            cell_images_path=cell_images_path,
+            feature_extraction_backend=feature_backend,
+            output_path=Path(output_path),
+            cell_profiler_pipeline_path=cell_profiler_pipeline_path,
+            batch_size=cellprofiler_batch_size,
+            workers=cellprofiler_workers,
+            output_format=features_format,
+            feature_store_path=feature_store_path,
+            checkpoint=checkpoint,
+        )
+    if checkpoint is not None:
+        checkpoint.complete_features(cell_features_path)
 
 
 def main():
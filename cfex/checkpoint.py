@@ -0,0 +1,345 @@
+import os
+import json
+import uuid
+import hashlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from cfex.enums import RunStage
+from cfex.cell_data.cache import load_cell_images_cache, save_cell_images_cache
+
+
+RUN_MANIFEST_FILENAME = "manifest.json"
+RUN_MANIFEST_VERSION = 1
+
+
+class RunCheckpoint:
+    """
+    Manifest and per-chunk artifacts of a run stored in a run directory,
+    used to resume an interrupted run without repeating completed stages.
+
+    Cell images, labels and segmentation status of a segmented chunk are saved
+    until the chunk is completed, cell features extracted in memory are kept
+    for every completed chunk. The manifest is replaced at once after every
+    stage, so a stage interrupted before its manifest entry is written is repeated.
+
+    Parameters
+    ----------
+    run_path : str or Path
+        Path to the run directory, created if it does not exist.
+    parameters : dict
+        JSON-serializable parameters of the run, stored in a new manifest
+        and compared with parameters stored in an existing one.
+    ignored_parameters : list of str, optional, default None
+        Names of parameters that do not affect results and may differ on resume.
+    """
+
+    def __init__(
+        self,
+        run_path: Union[str, Path],
+        parameters: Dict[str, Any],
+        ignored_parameters: Optional[List[str]] = None,
+    ):
+        self.run_path = Path(run_path)
+        self.run_path.mkdir(parents=True, exist_ok=True)
+        manifest = load_run_manifest(self.run_path)
+        if manifest is None:
+            manifest = {
+                "version": RUN_MANIFEST_VERSION,
+                "run_id": uuid.uuid4().hex,
+                "parameters": parameters,
+                "cell_images_path": None,
+                "chunks": {},
+                "batches": {},
+                "features": None,
+            }
+        else:
+            ignored_parameters = set(ignored_parameters or [])
+            changed_parameters = sorted(
+                name
+                for name in set(parameters) | set(manifest["parameters"])
+                if name not in ignored_parameters
+                and parameters.get(name) != manifest["parameters"].get(name)
+            )
+            if changed_parameters:
+                raise ValueError(
+                    f"Parameters differ from the resumed run: {changed_parameters}"
+                )
+        self.manifest = manifest
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest_path = self.run_path / RUN_MANIFEST_FILENAME
+        manifest_tmp_path = manifest_path.with_suffix(".json.tmp")
+        with open(manifest_tmp_path, "w") as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=2)
+        os.replace(manifest_tmp_path, manifest_path)
+
+    def _get_chunk_path(self, chunk_number: int) -> Path:
+        return self.run_path / "chunks" / f"chunk_{chunk_number:05d}"
+
+    def get_chunk_stage(
+        self, chunk_number: int, cell_data: pd.DataFrame
+    ) -> Optional[str]:
+        """
+        Get the last completed stage of a chunk.
+
+        Parameters
+        ----------
+        chunk_number : int
+            Number of the chunk in the order of reading cell data.
+        cell_data : DataFrame
+            DataFrame with cell data of the chunk.
+
+        Returns
+        -------
+        str or None
+            Name of the stage or None if no stage of the chunk was completed.
+        """
+        chunk_entry = self.manifest["chunks"].get(str(chunk_number))
+        if chunk_entry is None:
+            return None
+        if chunk_entry["cells"] != [int(cell_data.index[0]), int(cell_data.index[-1])]:
+            raise ValueError(
+                f"Cells of chunk {chunk_number} differ from the resumed run"
+            )
+        return chunk_entry["stage"]
+
+    def save_segmentation(
+        self,
+        chunk_number: int,
+        cell_data: pd.DataFrame,
+        cell_image_list: List[np.ndarray],
+        cell_detected_nucleus_list: List[np.ndarray],
+        segmentation_status: np.ndarray,
+    ):
+        """
+        Save cell images, labels and segmentation status of a chunk.
+
+        Parameters
+        ----------
+        chunk_number : int
+            Number of the chunk in the order of reading cell data.
+        cell_data : DataFrame
+            DataFrame with cell data of the chunk.
+        cell_image_list : list of ndarray
+            List containing cell images.
+        cell_detected_nucleus_list : list of ndarray
+            List containing cell labels.
+        segmentation_status : ndarray
+            Boolean array, True for cells with a detected nucleus.
+        """
+        chunk_path = self._get_chunk_path(chunk_number)
+        chunk_path.mkdir(parents=True, exist_ok=True)
+        save_cell_images_cache(chunk_path / "images", cell_image_list)
+        save_cell_images_cache(chunk_path / "labels", cell_detected_nucleus_list)
+        np.save(chunk_path / "segmentation_status.npy", segmentation_status)
+        self.manifest["chunks"][str(chunk_number)] = {
+            "cells": [int(cell_data.index[0]), int(cell_data.index[-1])],
+            "stage": RunStage.SEGMENTED.value,
+            "cell_count": len(segmentation_status),
+            "segmented_count": int(segmentation_status.sum()),
+        }
+        self._write_manifest()
+
+    def load_segmentation(
+        self, chunk_number: int
+    ) -> Tuple[List[np.ndarray], List[np.ndarray], np.ndarray]:
+        """
+        Load cell images, labels and segmentation status of a segmented chunk.
+
+        Parameters
+        ----------
+        chunk_number : int
+            Number of the chunk in the order of reading cell data.
+
+        Returns
+        -------
+        tuple of list, list and ndarray
+            Lists containing cell images and labels and the segmentation status.
+        """
+        chunk_path = self._get_chunk_path(chunk_number)
+        return (
+            load_cell_images_cache(chunk_path / "images"),
+            load_cell_images_cache(chunk_path / "labels"),
+            np.load(chunk_path / "segmentation_status.npy"),
+        )
+
+    def complete_chunk(
+        self,
+        chunk_number: int,
+        cell_features_data: Optional[pd.DataFrame] = None,
+        cell_count: Optional[int] = None,
+        segmented_count: Optional[int] = None,
+    ):
+        """
+        Mark a chunk as completed, keeping its cell features if given
+        and removing its cell images and labels.
+
+        Parameters
+        ----------
+        chunk_number : int
+            Number of the chunk in the order of reading cell data.
+        cell_features_data : DataFrame, optional, default None
+            DataFrame with cell features of the chunk extracted in memory.
+        cell_count : int, optional, default None
+            Amount of cells of the chunk, if it differs from the saved segmentation.
+        segmented_count : int, optional, default None
+            Amount of segmented cells of the chunk,
+            if it differs from the saved segmentation.
+        """
+        chunk_path = self._get_chunk_path(chunk_number)
+        if cell_features_data is not None:
+            features_path = chunk_path / "features.parquet"
+            features_tmp_path = features_path.with_suffix(".parquet.tmp")
+            cell_features_data.to_parquet(features_tmp_path, engine="pyarrow")
+            os.replace(features_tmp_path, features_path)
+        chunk_entry = self.manifest["chunks"][str(chunk_number)]
+        chunk_entry["stage"] = RunStage.COMPLETE.value
+        if cell_count is not None:
+            chunk_entry["cell_count"] = cell_count
+        if segmented_count is not None:
+            chunk_entry["segmented_count"] = segmented_count
+        self._write_manifest()
+        for cache_name in ("images", "labels"):
+            for suffix in (".npy", ".index.npy"):
+                (chunk_path / cache_name).with_suffix(suffix).unlink(missing_ok=True)
+
+    def load_features(self, chunk_number: int) -> Optional[pd.DataFrame]:
+        """
+        Load cell features of a completed chunk.
+
+        Parameters
+        ----------
+        chunk_number : int
+            Number of the chunk in the order of reading cell data.
+
+        Returns
+        -------
+        DataFrame or None
+            DataFrame with cell features or None if they were not kept.
+        """
+        features_path = self._get_chunk_path(chunk_number) / "features.parquet"
+        if not features_path.exists():
+            return None
+        return pd.read_parquet(features_path, engine="pyarrow")
+
+    @property
+    def run_id(self) -> str:
+        """
+        Identifier of the run, kept by resumed runs.
+        """
+        return self.manifest["run_id"]
+
+    @property
+    def cell_images_path(self) -> Optional[Path]:
+        """
+        Path to the directory with cell image and mask files exported by the run.
+        """
+        cell_images_path = self.manifest["cell_images_path"]
+        return cell_images_path and Path(cell_images_path)
+
+    def set_cell_images_path(self, cell_images_path: Path):
+        """
+        Record the path to the directory with cell image and mask files
+        exported by the run, so that a resumed run exports to the same directory.
+
+        Parameters
+        ----------
+        cell_images_path : Path
+            Path to the cell images directory.
+        """
+        self.manifest["cell_images_path"] = str(cell_images_path)
+        self._write_manifest()
+
+    def get_completed_batches(self, batches: List[Dict[str, List[str]]]) -> List[int]:
+        """
+        Get numbers of CellProfiler pipeline batches completed by the run
+        with the same contents as given batches.
+
+        Parameters
+        ----------
+        batches : list of dict
+            Batches of cell image and mask file URIs.
+
+        Returns
+        -------
+        list of int
+            Numbers of completed batches.
+        """
+        return [
+            i
+            for i, batch in enumerate(batches)
+            if self.manifest["batches"].get(str(i)) == _calculate_batch_digest(batch)
+        ]
+
+    def complete_batch(self, batch_number: int, batch: Dict[str, List[str]]):
+        """
+        Mark a CellProfiler pipeline batch as completed.
+
+        Contents of the batch are recorded as a digest of its file URIs.
+
+        Parameters
+        ----------
+        batch_number : int
+            Number of the batch.
+        batch : dict
+            Batch of cell image and mask file URIs.
+        """
+        self.manifest["batches"][str(batch_number)] = _calculate_batch_digest(batch)
+        self._write_manifest()
+
+    def get_chunk_counts(self, chunk_number: int) -> Tuple[int, int]:
+        """
+        Get amounts of all and segmented cells of a chunk.
+        """
+        chunk_entry = self.manifest["chunks"][str(chunk_number)]
+        return chunk_entry["cell_count"], chunk_entry["segmented_count"]
+
+    @property
+    def features_complete(self) -> bool:
+        """
+        Whether cell features of the whole run were extracted and saved.
+        """
+        return self.manifest["features"] == RunStage.COMPLETE.value
+
+    def complete_features(self, cell_features_path: Optional[Path] = None):
+        """
+        Mark cell features of the whole run as extracted and saved.
+
+        Parameters
+        ----------
+        cell_features_path : Path, optional, default None
+            Path to the saved cell features file.
+        """
+        self.manifest["features"] = RunStage.COMPLETE.value
+        self.manifest["features_path"] = cell_features_path and str(cell_features_path)
+        self._write_manifest()
+
+
+def _calculate_batch_digest(batch: Dict[str, List[str]]) -> str:
+    # URI lists of large batches are too long to be kept in the manifest
+    return hashlib.sha256(json.dumps(batch, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_run_manifest(run_path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """
+    Load the manifest of a run directory.
+
+    Parameters
+    ----------
+    run_path : str or Path
+        Path to the run directory.
+
+    Returns
+    -------
+    dict or None
+        Manifest of the run or None if the directory contains no manifest.
+    """
+    manifest_path = Path(run_path) / RUN_MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
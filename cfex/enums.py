@@ -31,6 +31,51 @@ class CellImageLoadBackend(ListedEnum):
     SLIDEIO = "slideio"
 
 
+class CellImageReadMode(ListedEnum):
+    """
+    Enumerates strategies of reading cell regions from the WSI.
+
+    CELL
+        Every cell bounding box is read from the WSI separately.
+    TILE
+        Cell bounding boxes are grouped by an aligned tile grid and every group
+        is read from the WSI as a single region, cell images are sliced from it.
+    """
+
+    CELL = "cell"
+    TILE = "tile"
+
+
+class CellCropMode(ListedEnum):
+    """
+    Enumerates ways of sizing cell bounding boxes.
+
+    FIXED
+        Every box is a square with a side of two bounding box margins.
+    ADAPTIVE
+        Every box is a square covering the cell polygon with padding,
+        rounded up to the nearest of a small set of bucket sizes.
+    """
+
+    FIXED = "fixed"
+    ADAPTIVE = "adaptive"
+
+
+class CellSegmentationMode(ListedEnum):
+    """
+    Enumerates extents of images passed to the cell instance segmentation.
+
+    CELL
+        Every cell bounding box image is segmented separately.
+    REGION
+        Regions covering groups of neighbouring cells are segmented once
+        and label images of cell bounding boxes are sliced from region labels.
+    """
+
+    CELL = "cell"
+    REGION = "region"
+
+
 class CellDetectionBackend(ListedEnum):
     """
     Enumerates names of components that serve as a backend for cell instance segmentation.
@@ -39,12 +84,77 @@ class CellDetectionBackend(ListedEnum):
     STARDIST = "stardist"
 
 
+class CellExpansionMethod(ListedEnum):
+    """
+    Enumerates methods of expanding a cell nucleus mask into a cell expansion mask.
+
+    RASTER
+        Distance transform of the label image, the expansion stops at neighbouring nuclei.
+    CONTOUR
+        Offset of the nucleus contour polygon rasterized back into a mask.
+    """
+
+    RASTER = "raster"
+    CONTOUR = "contour"
+
+
+class CellImageExportFormat(ListedEnum):
+    """
+    Enumerates formats of exported cell images and masks.
+
+    FILES
+        A PNG image and TIF masks are saved for every cell.
+    HDF5
+        Images and masks of all cells are appended to a single chunked
+        and compressed HDF5 archive indexed by cell indices.
+    """
+
+    FILES = "files"
+    HDF5 = "hdf5"
+
+
 class CellFeaturesBackend(ListedEnum):
     """
     Enumerates names of components that serve as a backend for extracting cell measurements to be used as features.
+
+    CELLPROFILER
+        CellProfiler pipeline run on exported cell image and mask files.
+    NATIVE
+        Shape, stain intensity and texture features calculated in-process
+        from cell images and object masks held in memory.
     """
 
     CELLPROFILER = "cellprofiler"
+    NATIVE = "native"
+
+
+class CellFeaturesFormat(ListedEnum):
+    """
+    Enumerates formats of saved cell features data.
+
+    PARQUET
+        Columnar Parquet file with float32 features, read without parsing text.
+    CSV
+        Comma-separated text file.
+    """
+
+    PARQUET = "parquet"
+    CSV = "csv"
+
+
+class RunStage(ListedEnum):
+    """
+    Enumerates stages of a checkpointed run recorded in its manifest.
+
+    SEGMENTED
+        Cell images, labels and segmentation status of a chunk are saved.
+    COMPLETE
+        A chunk is exported and its features are extracted in memory if requested,
+        or cell features of the whole run are saved.
+    """
+
+    SEGMENTED = "segmented"
+    COMPLETE = "complete"
 
 
 class CellKidneyTumorGradeLabel(Enum):
@@ -1,173 +1,634 @@
 import os
+import re
 import json
+import logging
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from tqdm import tqdm
 from pathlib import Path
+import numpy as np
 import pandas as pd
-from typing import Union, List
+from typing import Dict, Iterator, Optional, Tuple, Union, List
 
-from cfex.enums import CellFeaturesBackend
+from cfex.enums import CellFeaturesBackend, CellFeaturesFormat
+from cfex.checkpoint import RunCheckpoint
+from cfex.cell_data.geometry import calculate_pixel_centroids
+from cfex.cell_data.export import create_cell_image_filenames
+from cfex.feature_extraction.shape import calculate_shape_features_data
+from cfex.feature_extraction.intensity import (
+    calculate_intensity_features_data,
+    separate_stains,
+)
+from cfex.feature_extraction.store import (
+    append_cell_features_store,
+    downcast_cell_features_data,
+)
 
 
-# TODO: refactor batch processing
+logger = logging.getLogger(__name__)
 
+CELLPROFILER_OBJECT_NAMES = ("NucleusObject", "OutlineObject")
+CELLPROFILER_EXPORTED_TABLE_NAMES = (
+    "Experiment",
+    "Image",
+    "Nucleus",
+    "NucleusObject",
+    "Outline",
+    "OutlineObject",
+)
+# names of cell images and masks provided to pipeline modules
+# in place of the ones assigned by input modules to loaded files
+CELLPROFILER_IMAGE_NAMES = {"ColorImage": "Color"}
+CELLPROFILER_INPUT_OBJECT_NAMES = {"NucleusMask": "Nucleus", "OutlineMask": "Outline"}
+METADATA_COLUMN_PATTERN = re.compile(
+    "Metadata|FileName|PathName|Number_Object_Number|Parent_Cell|ImageNumber|ObjectNumber"
+)
+MEASUREMENT_AXIS_COLUMN_PATTERN = re.compile(r"[\S]+_X|Y|Z$")
 
-def _prepare_data_cellprofiler(cell_images_path: Path) -> List:
-    single_batch = {
-        "png": [path.as_uri() for path in list(cell_images_path.glob("*.png"))],
-        "tif_nucleus": [
-            path.as_uri() for path in list(cell_images_path.glob("*NucleusMask.tif"))
-        ],
-        "tif_outline": [
-            path.as_uri() for path in list(cell_images_path.glob("*OutlineMask.tif"))
-        ],
-    }
-    batches = [single_batch]
+
+def _prepare_data_cellprofiler(
+    cell_images_path: Path, batch_size: Optional[int] = None
+) -> List[Dict[str, List[str]]]:
+    cell_image_paths = sorted(cell_images_path.resolve().glob("*.png"))
+    batch_size = batch_size or max(len(cell_image_paths), 1)
+    batches = []
+    # masks are kept in the batch of their cell image
+    for start in range(0, len(cell_image_paths), batch_size):
+        batch_image_paths = cell_image_paths[start : start + batch_size]
+        batches.append(
+            {
+                "png": [path.as_uri() for path in batch_image_paths],
+                "tif_nucleus": [
+                    path.with_name(f"{path.stem}_NucleusMask.tif").as_uri()
+                    for path in batch_image_paths
+                ],
+                "tif_outline": [
+                    path.with_name(f"{path.stem}_OutlineMask.tif").as_uri()
+                    for path in batch_image_paths
+                ],
+            }
+        )
     print(
         "\n".join(
             (
-                f":: Images: {len(single_batch['png'])}",
-                f":: Nuclei masks: {len(single_batch['tif_nucleus'])}",
-                f":: Nucleus outline masks: {len(single_batch['tif_outline'])}",
+                f":: Images: {len(cell_image_paths)}",
+                f":: Batches: {len(batches)}",
             ),
         )
     )
     return batches
 
 
-def _run_pipeline_cellprofiler(batches: List, pipeline_path: Path, output_path: Path):
+_worker_pipeline = None
+# numbers of batches started by worker processes, read after a pool breaks
+_worker_started_batch_numbers = None
+
+
+def _load_pipeline_cellprofiler(pipeline_path: Path):
     import cellprofiler_core.pipeline
     import cellprofiler_core.preferences
     import cellprofiler_core.utilities.java
 
     cellprofiler_core.preferences.set_headless()
     cellprofiler_core.utilities.java.start_java()
+    pipeline = cellprofiler_core.pipeline.Pipeline()
+    pipeline.load(str(pipeline_path))
+    return pipeline
+
+
+def _initialize_worker_cellprofiler(pipeline_path: Path, started_batch_numbers=None):
+    # every worker process starts its JVM and loads the pipeline once
+    global _worker_pipeline, _worker_started_batch_numbers
+    _worker_started_batch_numbers = started_batch_numbers
+    _worker_pipeline = _load_pipeline_cellprofiler(pipeline_path)
+
+
+def _run_batch_cellprofiler(
+    batch_number: int, batch: Dict[str, List[str]], output_path: Path
+) -> Tuple[int, Optional[str]]:
     output_path_pipeline = output_path / "pipeline"
-    output_path_pipeline.mkdir(exist_ok=True)
-    print(f":: Running pipeline: {pipeline_path.name}...")
-    for batch in tqdm(batches):
-        pipeline = cellprofiler_core.pipeline.Pipeline()
-        pipeline.load(pipeline_path)
+    # batches running concurrently export their tables to separate directories
+    output_path_batch = output_path_pipeline / f"batch_{batch_number}"
+    output_path_batch.mkdir(parents=True, exist_ok=True)
+    if _worker_started_batch_numbers is not None:
+        _worker_started_batch_numbers.put(batch_number)
+    try:
+        pipeline = _worker_pipeline
         pipeline.clear_urls()
         pipeline.read_file_list(batch["png"])
         pipeline.read_file_list(batch["tif_nucleus"])
         pipeline.read_file_list(batch["tif_outline"])
-        pipeline.modules()[-1].directory.value = f"Elsewhere...|{output_path}"
-        pipeline_output = pipeline.run()
-        try:
-            os.rename(
-                output_path / "exported_Experiment.csv",
-                output_path_pipeline
-                / f"exported_Experiment_{batches.index(batch)}.csv",
+        pipeline.modules()[-1].directory.value = f"Elsewhere...|{output_path_batch}"
+        pipeline.run()
+        for table_name in CELLPROFILER_EXPORTED_TABLE_NAMES:
+            os.replace(
+                output_path_batch / f"exported_{table_name}.csv",
+                output_path_pipeline / f"exported_{table_name}_{batch_number}.csv",
             )
-            os.rename(
-                output_path / "exported_Nucleus.csv",
-                output_path_pipeline / f"exported_Nucleus_{batches.index(batch)}.csv",
-            )
-            os.rename(
-                output_path / "exported_NucleusObject.csv",
-                output_path_pipeline
-                / f"exported_NucleusObject_{batches.index(batch)}.csv",
-            )
-            os.rename(
-                output_path / "exported_Outline.csv",
-                output_path_pipeline / f"exported_Outline_{batches.index(batch)}.csv",
-            )
-            os.rename(
-                output_path / "exported_OutlineObject.csv",
-                output_path_pipeline
-                / f"exported_OutlineObject_{batches.index(batch)}.csv",
-            )
-            os.rename(
-                output_path / "exported_Image.csv",
-                output_path_pipeline / f"exported_Image_{batches.index(batch)}.csv",
+        # other files exported by the pipeline are kept in the batch directory
+        with contextlib.suppress(OSError):
+            output_path_batch.rmdir()
+    except Exception as exception:
+        return batch_number, repr(exception)
+    return batch_number, None
+
+
+def _iter_batch_results_pool_cellprofiler(
+    batches: List[Tuple[int, Dict[str, List[str]]]],
+    pipeline_path: Path,
+    output_path: Path,
+    workers: int,
+) -> Iterator[Tuple[int, Optional[str]]]:
+    context = multiprocessing.get_context("spawn")
+    # a simple queue is written synchronously, so a batch is recorded as started
+    # even if its worker process is terminated right after
+    started_batch_numbers = context.SimpleQueue()
+    pending_batches = dict(batches)
+    isolated_batch_numbers = []
+    while pending_batches:
+        # batches running when a worker process was terminated (e.g. by its JVM)
+        # are run one by one to find the one that terminated it
+        if isolated_batch_numbers:
+            round_batch_numbers = [isolated_batch_numbers.pop(0)]
+        else:
+            round_batch_numbers = list(pending_batches)
+        broken_batch_errors = {}
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(round_batch_numbers)),
+            mp_context=context,
+            initializer=_initialize_worker_cellprofiler,
+            initargs=(pipeline_path, started_batch_numbers),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _run_batch_cellprofiler, i, pending_batches[i], output_path
+                ): i
+                for i in round_batch_numbers
+            }
+            for future in as_completed(futures):
+                try:
+                    batch_number, batch_error = future.result()
+                except BrokenProcessPool as exception:
+                    broken_batch_errors[futures[future]] = repr(exception)
+                    continue
+                except Exception as exception:
+                    batch_number, batch_error = futures[future], repr(exception)
+                del pending_batches[batch_number]
+                yield batch_number, batch_error
+        if not broken_batch_errors:
+            continue
+        started_batch_numbers_round = set()
+        while not started_batch_numbers.empty():
+            started_batch_numbers_round.add(started_batch_numbers.get())
+        running_batch_numbers = sorted(
+            started_batch_numbers_round.intersection(broken_batch_errors)
+        )
+        if len(running_batch_numbers) > 1:
+            # batches that never started are resubmitted to a new pool
+            isolated_batch_numbers = running_batch_numbers
+            continue
+        # without a running batch the pool broke before running any of them,
+        # e.g. the pipeline could not be loaded, so all of them are failed
+        for batch_number in running_batch_numbers or sorted(broken_batch_errors):
+            del pending_batches[batch_number]
+            yield batch_number, broken_batch_errors[batch_number]
+
+
+def _run_pipeline_cellprofiler(
+    batches: List,
+    pipeline_path: Path,
+    output_path: Path,
+    workers: Optional[int] = 1,
+    checkpoint: Optional[RunCheckpoint] = None,
+) -> List[int]:
+    import cellprofiler_core.utilities.java
+
+    output_path_pipeline = output_path / "pipeline"
+    output_path_pipeline.mkdir(exist_ok=True)
+    completed_batch_numbers = set()
+    if checkpoint is not None:
+        # batches are reused only if their contents match the ones of the run
+        completed_batch_numbers = {
+            i
+            for i in checkpoint.get_completed_batches(batches)
+            if all(
+                (output_path_pipeline / f"exported_{table_name}_{i}.csv").exists()
+                for table_name in CELLPROFILER_EXPORTED_TABLE_NAMES
             )
-        except:
-            batch_num = batches.index(batch)
-            print(
-                f":: Processing of batch {batch_num} did not succeed, check the measure_cells_batch_{batch_num}_contents.json file for batch contents."
+        }
+        print(f":: Reusing completed batches: {len(completed_batch_numbers)}")
+    pending_batches = [
+        (i, batch)
+        for i, batch in enumerate(batches)
+        if i not in completed_batch_numbers
+    ]
+    if not pending_batches:
+        return list(range(len(batches)))
+    print(f":: Running pipeline: {pipeline_path.name}...")
+    batch_errors = {}
+    if workers > 1:
+        batch_results = _iter_batch_results_pool_cellprofiler(
+            pending_batches, pipeline_path, output_path, workers
+        )
+        for batch_number, batch_error in tqdm(
+            batch_results, total=len(pending_batches)
+        ):
+            if batch_error is not None:
+                batch_errors[batch_number] = batch_error
+            elif checkpoint is not None:
+                checkpoint.complete_batch(batch_number, batches[batch_number])
+    else:
+        _initialize_worker_cellprofiler(pipeline_path)
+        for i, batch in tqdm(pending_batches):
+            batch_number, batch_error = _run_batch_cellprofiler(i, batch, output_path)
+            if batch_error is not None:
+                batch_errors[batch_number] = batch_error
+            elif checkpoint is not None:
+                checkpoint.complete_batch(batch_number, batch)
+        cellprofiler_core.utilities.java.stop_java()
+    for batch_number, batch_error in sorted(batch_errors.items()):
+        batch_contents_path = (
+            output_path / f"measure_cells_batch_{batch_number}_contents.json"
+        )
+        print(
+            f":: Processing of batch {batch_number} did not succeed ({batch_error}), check the {batch_contents_path.name} file for batch contents."
+        )
+        with open(batch_contents_path, "w") as log_file:
+            json.dump(batches[batch_number], log_file)
+    return [i for i in range(len(batches)) if i not in batch_errors]
+
+
+def _run_pipeline_in_memory_cellprofiler(
+    cell_data: pd.DataFrame, pipeline_path: Path
+) -> pd.DataFrame:
+    import cellprofiler_core.image
+    import cellprofiler_core.measurement
+    import cellprofiler_core.object
+    import cellprofiler_core.pipeline
+    import cellprofiler_core.preferences
+    import cellprofiler_core.workspace
+
+    cellprofiler_core.preferences.set_headless()
+    pipeline = cellprofiler_core.pipeline.Pipeline()
+    pipeline.load(str(pipeline_path))
+    # images are not read from files by input modules and measurements are
+    # collected from memory instead of being exported, so the JVM is not needed
+    modules = [
+        module
+        for module in pipeline.modules()
+        if not module.is_input_module()
+        and module.module_name != "ExportToSpreadsheet"
+    ]
+    measurements = cellprofiler_core.measurement.Measurements()
+    cell_image_filenames = create_cell_image_filenames(cell_data)
+    object_rows = {object_name: [] for object_name in CELLPROFILER_OBJECT_NAMES}
+    object_feature_names = {}
+    failed_count = 0
+    print(f":: Running pipeline in memory: {pipeline_path.name}...")
+    cell_data_iterator = zip(cell_data.iterrows(), cell_image_filenames)
+    for image_set_number, ((i, cell_data_point), cell_image_filename) in enumerate(
+        tqdm(cell_data_iterator, total=len(cell_data.index)), start=1
+    ):
+        if image_set_number > 1:
+            measurements.next_image_set(image_set_number)
+        # the file name carries cell metadata, as in the exported pipeline output
+        file_name = f"{cell_image_filename}.png"
+        measurements.add_image_measurement("FileName_Color", file_name)
+        image_set_list = cellprofiler_core.image.ImageSetList()
+        image_set = image_set_list.get_image_set(0)
+        for column, image_name in CELLPROFILER_IMAGE_NAMES.items():
+            image_set.add(
+                image_name, cellprofiler_core.image.Image(cell_data_point[column])
             )
-            with open(
-                f"measure_cells_batch_{batch_num}_contents.json", "a"
-            ) as log_file:
-                json.dump(log_file, batch)
-    cellprofiler_core.utilities.java.stop_java()
-    return pipeline_output
+        object_set = cellprofiler_core.object.ObjectSet()
+        for column, object_name in CELLPROFILER_INPUT_OBJECT_NAMES.items():
+            objects = cellprofiler_core.object.Objects()
+            objects.segmented = np.asarray(cell_data_point[column], dtype=np.int32)
+            object_set.add_objects(objects, object_name)
+        cell_rows = {
+            object_name: {"FileName_Color": file_name}
+            for object_name in CELLPROFILER_OBJECT_NAMES
+        }
+        try:
+            for module in modules:
+                workspace = cellprofiler_core.workspace.Workspace(
+                    pipeline,
+                    module,
+                    image_set,
+                    object_set,
+                    measurements,
+                    image_set_list,
+                )
+                module.run(workspace)
+            for object_name, object_row in cell_rows.items():
+                if object_name not in object_feature_names:
+                    object_feature_names[object_name] = measurements.get_feature_names(
+                        object_name
+                    )
+                for feature_name in object_feature_names[object_name]:
+                    values = measurements.get_current_measurement(
+                        object_name, feature_name
+                    )
+                    if values is not None and len(values):
+                        object_row[feature_name] = values[0]
+        except Exception as exception:
+            # features of the cell are left missing, other cells are still measured
+            logger.warning("Processing of cell %s did not succeed: %r", i, exception)
+            failed_count += 1
+            # a pipeline failing for every cell is not wired to in-memory input
+            if failed_count == len(cell_data.index):
+                raise RuntimeError(
+                    f"Pipeline {pipeline_path.name} failed for all cells"
+                ) from exception
+        for object_name, object_row in cell_rows.items():
+            object_rows[object_name].append(object_row)
+    processed_objects = [
+        _process_object_data_cellprofiler(pd.DataFrame(rows), object_name)
+        for object_name, rows in object_rows.items()
+    ]
+    return _merge_object_data_cellprofiler(processed_objects)
+
+
+def _parse_file_names_cellprofiler(file_names: pd.Series) -> pd.DataFrame:
+    # names follow create_cell_image_filenames: cell{i}_{target}_{x}_{y}_{wsi}.png
+    file_name_parts = file_names.str.replace(r"\.png$", "", regex=True).str.split(
+        "_", n=4, expand=True
+    )
+    return pd.DataFrame(
+        {
+            "CellId": file_name_parts[0].str.slice(len("cell")).astype(np.int64),
+            "CentroidCoordinates": file_name_parts[[2, 3]].values.tolist(),
+            "SlideName": file_name_parts[4].values,
+        }
+    )
 
 
-def _filter_data_cellprofiler(batches: List, output_path: Path):
-    output_path_filtered = output_path / "filtered"
-    output_path_filtered.mkdir(exist_ok=True)
+def _is_feature_column_cellprofiler(column: str) -> bool:
+    return not (
+        METADATA_COLUMN_PATTERN.search(column)
+        or MEASUREMENT_AXIS_COLUMN_PATTERN.search(column)
+    )
+
+
+def _process_object_data_cellprofiler(
+    cell_features_data: pd.DataFrame, object_name: str
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    cell_metadata = _parse_file_names_cellprofiler(cell_features_data["FileName_Color"])
+    feature_columns = [
+        column
+        for column in cell_features_data.columns
+        if _is_feature_column_cellprofiler(column)
+    ]
+    cell_features_data = cell_features_data[feature_columns].add_prefix(
+        f"{object_name}_"
+    )
+    cell_features_data.index = pd.Index(cell_metadata.pop("CellId"), name="CellId")
+    cell_metadata.index = cell_features_data.index
+    return cell_features_data, cell_metadata
+
+
+def _merge_object_data_cellprofiler(
+    processed_objects: List[Tuple[pd.DataFrame, pd.DataFrame]]
+) -> pd.DataFrame:
+    # objects are aligned by cell ids and metadata is kept once per cell
+    object_features = [object_data for object_data, _ in processed_objects]
+    _, cell_metadata = processed_objects[0]
+    return pd.concat(object_features + [cell_metadata], axis=1)
+
+
+def _read_object_data_cellprofiler(table_path: Path) -> pd.DataFrame:
+    # redundant columns are skipped by the parser instead of being dropped later
+    return pd.read_csv(
+        table_path,
+        usecols=lambda column: column == "FileName_Color"
+        or _is_feature_column_cellprofiler(column),
+        dtype={"FileName_Color": str},
+    )
+
+
+def _filter_data_cellprofiler(
+    batch_numbers: List[int],
+    output_path: Path,
+    output_format: Optional[str] = "parquet",
+):
     output_path_pipeline = output_path / "pipeline"
-    object_names = ("NucleusObject", "OutlineObject")
-    metadata_column_regex = "Metadata|FileName|PathName|Number_Object_Number|Parent_Cell|ImageNumber|ObjectNumber"
-    measurement_axis_column_regex = "[\S]+_X|Y|Z$"
-    processed_batches = {object_name: [] for object_name in object_names}
-    for i, object_name in enumerate(object_names):
+    if not batch_numbers:
+        print(":: No batch was processed successfully, no cell features data saved.")
+        return pd.DataFrame()
+    processed_objects = []
+    for object_name in CELLPROFILER_OBJECT_NAMES:
         print(f":: Processing {object_name} cell_features_data...")
-        for i in range(len(batches)):
-            cell_features_data = pd.read_csv(
-                output_path_pipeline / f"exported_{object_name}_{i}.csv"
-            )
-            centroid_coordinates = cell_features_data["FileName_Color"].apply(
-                lambda x: x.split("_")[2:4]
-            )
-            slide_name = cell_features_data["FileName_Color"].apply(
-                lambda x: x.replace(x, str(Path(x).stem.split("_")[4]))
-            )
-            metadata_columns = list(
-                cell_features_data.filter(regex=metadata_column_regex)
+        processed_batches = [
+            _process_object_data_cellprofiler(
+                _read_object_data_cellprofiler(
+                    output_path_pipeline / f"exported_{object_name}_{i}.csv"
+                ),
+                object_name,
             )
-            measurement_axis_columns = list(
-                cell_features_data.filter(regex=measurement_axis_column_regex)
-            )
-            redundant_columns = metadata_columns + measurement_axis_columns
-            cell_features_data.drop(columns=redundant_columns, inplace=True)
-            cell_features_data.columns = f"{object_name}_" + cell_features_data.columns
-            cell_features_data["CentroidCoordinates"] = centroid_coordinates
-            cell_features_data["SlideName"] = slide_name
-            processed_batches[object_name].append(cell_features_data)
+            for i in batch_numbers
+        ]
+        processed_objects.append(
+            tuple(pd.concat(data_list) for data_list in zip(*processed_batches))
+        )
     print(":: Merging batches for each of the objects...")
-    for object_name, data_list in processed_batches.items():
-        cell_features_data = pd.concat(data_list, ignore_index=True)
-        processed_batches[object_name] = cell_features_data
-    cell_features_data = pd.concat(processed_batches.values(), axis=1)
+    cell_features_data = _merge_object_data_cellprofiler(processed_objects)
+    save_cell_features_data(cell_features_data, output_path, output_format)
+    return cell_features_data
+
+
+def save_cell_features_data(
+    cell_features_data: pd.DataFrame,
+    output_path: Union[str, Path],
+    output_format: Optional[str] = "parquet",
+) -> Path:
+    """
+    Save cell features to a file named after the amount of cells and features.
+
+    Floating point features are downcast to float32 and rows are indexed by cell ids.
+
+    Parameters
+    ----------
+    cell_features_data : DataFrame
+        DataFrame with a row of features for every cell
+        and CentroidCoordinates and SlideName columns.
+    output_path : str or Path
+        Path to the output directory, the file is saved in its "filtered" subdirectory.
+    output_format : str, optional, default "parquet"
+        Name of the supported cell features format.
+
+    Returns
+    -------
+    Path
+        Path to the saved file.
+    """
+    if output_format not in CellFeaturesFormat.values():
+        raise ValueError(f"Unsupported cell features format: {output_format}")
+    output_path_filtered = Path(output_path) / "filtered"
+    output_path_filtered.mkdir(parents=True, exist_ok=True)
+    cell_features_data = downcast_cell_features_data(cell_features_data)
     rows = len(cell_features_data.index)
     result_meta_columns = ["CentroidCoordinates", "SlideName"]
     feature_count = len(cell_features_data.drop(columns=result_meta_columns).columns)
     cell_features_filename = (
-        output_path_filtered / f"filtered_on_n{rows}_nf{feature_count}.csv"
+        output_path_filtered
+        / f"filtered_on_n{rows}_nf{feature_count}.{output_format}"
     )
-    cell_features_data.to_csv(cell_features_filename)
+    if output_format == CellFeaturesFormat.PARQUET.value:
+        cell_features_data.to_parquet(cell_features_filename, engine="pyarrow")
+    else:
+        cell_features_data.to_csv(cell_features_filename)
     print(":: Done. Cell features data:", cell_features_filename, sep="\n")
-    return cell_features_data
+    return cell_features_filename
 
 
-# TODO: load images from memory into the pipeline without exporting to files separately
-# TODO: remove batch loading and refactor error reporting to account for different culprits other than unfinished runs
 def _extract_measurements_cellprofiler(
-    cell_images_path: Path,
-    output_path: Path,
+    cell_images_path: Optional[Path],
+    cell_data: Optional[pd.DataFrame],
+    output_path: Optional[Path],
     pipeline_path: Path,
-):
-    batches = _prepare_data_cellprofiler(cell_images_path=cell_images_path)
-    pipeline_output = _run_pipeline_cellprofiler(
-        batches=batches, pipeline_path=pipeline_path, output_path=output_path
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = 1,
+    output_format: Optional[str] = "parquet",
+    checkpoint: Optional[RunCheckpoint] = None,
+) -> pd.DataFrame:
+    if cell_data is not None:
+        cell_features_data = _run_pipeline_in_memory_cellprofiler(
+            cell_data=cell_data, pipeline_path=pipeline_path
+        )
+        if output_path is not None:
+            save_cell_features_data(cell_features_data, output_path, output_format)
+        return cell_features_data
+    batches = _prepare_data_cellprofiler(
+        cell_images_path=cell_images_path, batch_size=batch_size
+    )
+    batch_numbers = _run_pipeline_cellprofiler(
+        batches=batches,
+        pipeline_path=pipeline_path,
+        output_path=output_path,
+        workers=workers,
+        checkpoint=checkpoint,
+    )
+    return _filter_data_cellprofiler(
+        batch_numbers, output_path=output_path, output_format=output_format
     )
-    _filter_data_cellprofiler(batches, output_path=output_path)
+
+
+def _extract_measurements_native(
+    cell_images_path: Optional[Path],
+    cell_data: pd.DataFrame,
+    output_path: Optional[Path],
+    pipeline_path: Optional[Path],
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = 1,
+    output_format: Optional[str] = "parquet",
+    checkpoint: Optional[RunCheckpoint] = None,
+) -> pd.DataFrame:
+    object_masks = {"NucleusObject": "NucleusMask", "OutlineObject": "OutlineMask"}
+    object_features = []
+    # stains of every cell image are separated once for both objects
+    stain_image_list = [separate_stains(image) for image in cell_data["ColorImage"]]
+    for object_name, mask_name in object_masks.items():
+        print(f":: Calculating {object_name} shape features...")
+        mask_list = cell_data[mask_name].tolist()
+        shape_features_data = calculate_shape_features_data(mask_list)
+        print(f":: Calculating {object_name} intensity and texture features...")
+        intensity_features_data = calculate_intensity_features_data(
+            cell_data["ColorImage"].tolist(),
+            mask_list,
+            stain_image_list=stain_image_list,
+        )
+        object_features_data = pd.concat(
+            [shape_features_data, intensity_features_data], axis=1
+        )
+        object_features_data.index = cell_data.index
+        object_features.append(object_features_data.add_prefix(f"{object_name}_"))
+    cell_features_data = pd.concat(object_features, axis=1)
+    nucleus_centroids = calculate_pixel_centroids(cell_data["NucleusPolygon"])
+    cell_features_data["CentroidCoordinates"] = [
+        [str(centroid_x), str(centroid_y)]
+        for centroid_x, centroid_y in nucleus_centroids
+    ]
+    cell_features_data["SlideName"] = cell_data["WSI"]
+    if output_path is not None:
+        save_cell_features_data(cell_features_data, output_path, output_format)
+    return cell_features_data
 
 
 def extract_measurements(
-    cell_images_path: Union[str, Path],
+    cell_images_path: Optional[Union[str, Path]],
     feature_extraction_backend: str,
-    output_path: Union[str, Path],
-    cell_profiler_pipeline_path: Union[str, Path],
-):
+    output_path: Optional[Union[str, Path]],
+    cell_profiler_pipeline_path: Optional[Union[str, Path]] = None,
+    cell_data: Optional[pd.DataFrame] = None,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = 1,
+    output_format: Optional[str] = "parquet",
+    feature_store_path: Optional[Union[str, Path]] = None,
+    checkpoint: Optional[RunCheckpoint] = None,
+) -> pd.DataFrame:
+    """
+    Extract cell features with a given backend.
+
+    Parameters
+    ----------
+    cell_images_path : str or Path, optional
+        Path to the directory with exported cell image and mask files,
+        read by the cellprofiler backend if cell_data is not given.
+    feature_extraction_backend : str
+        Name of the supported cell features backend.
+    output_path : str or Path, optional
+        Path to the output directory for cell feature data, features of cells
+        given in cell_data are only returned without saving them if it is None.
+    cell_profiler_pipeline_path : str or Path, optional, default None
+        Path to the CellProfiler pipeline file, required by the cellprofiler backend.
+    cell_data : DataFrame, optional, default None
+        DataFrame with NucleusPolygon, WSI, ColorImage, NucleusMask and OutlineMask
+        columns of segmented cells, required by the native backend.
+        The cellprofiler backend passes these images and masks to the pipeline
+        modules following its input modules in memory instead of reading files.
+    batch_size : int, optional, default None
+        Amount of exported cells measured by a single run of the CellProfiler
+        pipeline, by default all cells are measured in a single batch.
+    workers : int, optional, default 1
+        Amount of processes running batches of the CellProfiler pipeline,
+        each starting its JVM and loading the pipeline once.
+        A failed batch is logged and left out of the results.
+    output_format : str, optional, default "parquet"
+        Name of the supported format of the saved cell features file.
+    feature_store_path : str or Path, optional, default None
+        Path to a cell features store partitioned by slide,
+        extracted features are also appended to it if it is given.
+    checkpoint : RunCheckpoint, optional, default None
+        Checkpoint of the run recording completed CellProfiler pipeline batches,
+        tables of batches completed with the same contents are reused from output_path
+        and features appended to the store by the run are not appended again.
+
+    Returns
+    -------
+    DataFrame
+        DataFrame with a row of features for every cell.
+    """
     if feature_extraction_backend in CellFeaturesBackend.values():
         extract_measurements_func = globals()[
             f"_extract_measurements_{feature_extraction_backend}"
         ]
-        return extract_measurements_func(
-            cell_images_path=Path(cell_images_path),
-            output_path=Path(output_path),
-            pipeline_path=Path(cell_profiler_pipeline_path),
+        cell_features_data = extract_measurements_func(
+            cell_images_path=cell_images_path and Path(cell_images_path),
+            cell_data=cell_data,
+            output_path=output_path and Path(output_path),
+            pipeline_path=cell_profiler_pipeline_path
+            and Path(cell_profiler_pipeline_path),
+            batch_size=batch_size,
+            workers=workers,
+            output_format=output_format,
+            checkpoint=checkpoint,
         )
+        if feature_store_path is not None and not cell_features_data.empty:
+            append_cell_features_store(
+                cell_features_data,
+                feature_store_path,
+                append_id=checkpoint and checkpoint.run_id,
+            )
+        return cell_features_data
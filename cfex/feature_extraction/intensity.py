@@ -0,0 +1,348 @@
+import numpy as np
+import pandas as pd
+from skimage.color import hed_from_rgb, rgb2hed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+STAIN_NAMES = ("Hematoxylin", "Eosin")
+# highest stain concentrations returned by rgb2hed, used to scale stain images to [0, 1]
+STAIN_RANGES = np.clip(hed_from_rgb, 0, None).sum(axis=0)[: len(STAIN_NAMES)]
+
+TEXTURE_SCALE = 3
+TEXTURE_GRAY_LEVELS = 8
+# pixel offsets of the GLCM directions numbered 00-03 as in CellProfiler MeasureTexture
+TEXTURE_DIRECTIONS = ((0, 1), (1, 1), (1, 0), (1, -1))
+TEXTURE_FEATURE_NAMES = (
+    "AngularSecondMoment",
+    "Contrast",
+    "Correlation",
+    "Variance",
+    "InverseDifferenceMoment",
+    "SumAverage",
+    "SumVariance",
+    "SumEntropy",
+    "Entropy",
+    "DifferenceVariance",
+    "DifferenceEntropy",
+    "InfoMeas1",
+    "InfoMeas2",
+)
+LOG_EPSILON = 1e-12
+
+
+def separate_stains(image_stack: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Separate hematoxylin and eosin stains of RGB images by color deconvolution.
+
+    Parameters
+    ----------
+    image_stack : ndarray
+        Array of shape (..., 3) or (..., 4) with RGB(A) images.
+
+    Returns
+    -------
+    dict
+        Dictionary with stain names as keys and arrays of stain concentrations
+        scaled to [0, 1] as values.
+    """
+    stain_stack = rgb2hed(np.asarray(image_stack)[..., :3])
+    return {
+        stain_name: (stain_stack[..., i] / STAIN_RANGES[i]).astype(np.float32)
+        for i, stain_name in enumerate(STAIN_NAMES)
+    }
+
+
+def _calculate_masked_quantiles(
+    sorted_values: np.ndarray, counts: np.ndarray, quantile: float
+) -> np.ndarray:
+    # linear interpolation between the closest ranks, as in np.percentile
+    positions = np.maximum(counts - 1, 0) * quantile
+    lower_positions = np.floor(positions).astype(np.intp)
+    upper_positions = np.minimum(lower_positions + 1, np.maximum(counts - 1, 0))
+    rows = np.arange(len(sorted_values))
+    lower_values = sorted_values[rows, lower_positions]
+    upper_values = sorted_values[rows, upper_positions]
+    return lower_values + (upper_values - lower_values) * (positions - lower_positions)
+
+
+def calculate_intensity_features(
+    channel_stack: np.ndarray, mask_stack: np.ndarray, channel_name: str
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate intensity statistics of a channel within objects in a stack of masks.
+
+    Feature names follow CellProfiler MeasureObjectIntensity measurements.
+    Features of empty masks are NaN.
+
+    Parameters
+    ----------
+    channel_stack : ndarray
+        Array of shape (N, H, W) with single channel images.
+    mask_stack : ndarray
+        Array of shape (N, H, W) with binary object masks.
+    channel_name : str
+        Name of the channel used as a suffix of feature names.
+
+    Returns
+    -------
+    dict
+        Dictionary with feature names as keys and arrays of N values as values.
+    """
+    mask_stack = np.asarray(mask_stack, dtype=bool)
+    object_count = len(mask_stack)
+    counts = mask_stack.sum(axis=(1, 2))
+    masked_values = np.where(mask_stack, channel_stack, np.nan).reshape(
+        object_count, -1
+    )
+    # values outside of the mask are NaN and are sorted to the end of every row
+    sorted_values = np.sort(masked_values, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        integrated_intensity = np.where(mask_stack, channel_stack, 0).sum(
+            axis=(1, 2), dtype=np.float64
+        )
+        mean_intensity = integrated_intensity / counts
+        squared_deviations = np.where(
+            mask_stack, (channel_stack - mean_intensity[:, None, None]) ** 2, 0
+        )
+        std_intensity = np.sqrt(squared_deviations.sum(axis=(1, 2)) / counts)
+        median_intensity = _calculate_masked_quantiles(sorted_values, counts, 0.5)
+        absolute_deviations = np.abs(masked_values - median_intensity[:, None])
+        absolute_deviations.sort(axis=1)
+        intensity_features = {
+            "IntegratedIntensity": integrated_intensity,
+            "MeanIntensity": mean_intensity,
+            "StdIntensity": std_intensity,
+            "MinIntensity": sorted_values[:, 0],
+            "MaxIntensity": sorted_values[
+                np.arange(object_count), np.maximum(counts - 1, 0)
+            ],
+            "LowerQuartileIntensity": _calculate_masked_quantiles(
+                sorted_values, counts, 0.25
+            ),
+            "MedianIntensity": median_intensity,
+            "UpperQuartileIntensity": _calculate_masked_quantiles(
+                sorted_values, counts, 0.75
+            ),
+            "MADIntensity": _calculate_masked_quantiles(
+                absolute_deviations, counts, 0.5
+            ),
+        }
+    empty_masks = counts == 0
+    intensity_features = {
+        f"Intensity_{feature_name}_{channel_name}": np.where(
+            empty_masks, np.nan, feature_values
+        ).astype(np.float64)
+        for feature_name, feature_values in intensity_features.items()
+    }
+    return intensity_features
+
+
+def _calculate_cooccurrence_matrices(
+    level_stack: np.ndarray,
+    mask_stack: np.ndarray,
+    offset: Tuple[int, int],
+    gray_levels: int,
+) -> np.ndarray:
+    object_count, height, width = level_stack.shape
+    offset_rows, offset_columns = offset
+    first_rows = slice(0, height - offset_rows)
+    second_rows = slice(offset_rows, height)
+    first_columns = slice(max(0, -offset_columns), width - max(0, offset_columns))
+    second_columns = slice(max(0, offset_columns), width - max(0, -offset_columns))
+    pair_mask = (
+        mask_stack[:, first_rows, first_columns]
+        & mask_stack[:, second_rows, second_columns]
+    )
+    object_indices = np.nonzero(pair_mask)[0]
+    first_levels = level_stack[:, first_rows, first_columns][pair_mask]
+    second_levels = level_stack[:, second_rows, second_columns][pair_mask]
+    # matrices of all objects are counted by a single bincount
+    pair_indices = object_indices * gray_levels**2
+    counts = np.bincount(
+        pair_indices + first_levels * gray_levels + second_levels,
+        minlength=object_count * gray_levels**2,
+    ) + np.bincount(
+        pair_indices + second_levels * gray_levels + first_levels,
+        minlength=object_count * gray_levels**2,
+    )
+    return counts.reshape(object_count, gray_levels, gray_levels).astype(np.float64)
+
+
+def _calculate_entropy(probabilities: np.ndarray, axis) -> np.ndarray:
+    return -(probabilities * np.log2(probabilities + LOG_EPSILON)).sum(axis=axis)
+
+
+def _calculate_haralick_features(cooccurrence_matrices: np.ndarray) -> List[np.ndarray]:
+    object_count, gray_levels, _ = cooccurrence_matrices.shape
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = cooccurrence_matrices / cooccurrence_matrices.sum(axis=(1, 2))[
+            :, None, None
+        ]
+        levels = np.arange(gray_levels, dtype=np.float64)
+        i, j = np.meshgrid(levels, levels, indexing="ij")
+        px = p.sum(axis=2)
+        py = p.sum(axis=1)
+        ux = px @ levels
+        uy = py @ levels
+        vx = px @ levels**2 - ux**2
+        vy = py @ levels**2 - uy**2
+        # distributions of sums and absolute differences of gray levels
+        sum_labels = np.arange(2 * gray_levels - 1, dtype=np.float64)
+        sum_indices = (i + j).astype(np.intp).ravel()
+        px_plus_y = np.zeros((object_count, len(sum_labels)))
+        np.add.at(px_plus_y.T, sum_indices, p.reshape(object_count, -1).T)
+        difference_labels = np.arange(gray_levels, dtype=np.float64)
+        difference_indices = np.abs(i - j).astype(np.intp).ravel()
+        px_minus_y = np.zeros((object_count, gray_levels))
+        np.add.at(px_minus_y.T, difference_indices, p.reshape(object_count, -1).T)
+        sum_average = px_plus_y @ sum_labels
+        difference_average = px_minus_y @ difference_labels
+        entropy = _calculate_entropy(p, axis=(1, 2))
+        marginal_products = px[:, :, None] * py[:, None, :]
+        hx = _calculate_entropy(px, axis=1)
+        hy = _calculate_entropy(py, axis=1)
+        hxy1 = -(p * np.log2(marginal_products + LOG_EPSILON)).sum(axis=(1, 2))
+        hxy2 = _calculate_entropy(marginal_products, axis=(1, 2))
+        return [
+            (p**2).sum(axis=(1, 2)),
+            px_minus_y @ difference_labels**2,
+            ((i * j * p).sum(axis=(1, 2)) - ux * uy) / np.sqrt(vx * vy),
+            (((i - ux[:, None, None]) ** 2) * p).sum(axis=(1, 2)),
+            (p / (1 + (i - j) ** 2)).sum(axis=(1, 2)),
+            sum_average,
+            px_plus_y @ sum_labels**2 - sum_average**2,
+            _calculate_entropy(px_plus_y, axis=1),
+            entropy,
+            px_minus_y @ difference_labels**2 - difference_average**2,
+            _calculate_entropy(px_minus_y, axis=1),
+            (entropy - hxy1) / np.maximum(hx, hy),
+            np.sqrt(np.maximum(0, 1 - np.exp(-2 * (hxy2 - entropy)))),
+        ]
+
+
+def calculate_texture_features(
+    channel_stack: np.ndarray,
+    mask_stack: np.ndarray,
+    channel_name: str,
+    scale: Optional[int] = TEXTURE_SCALE,
+    gray_levels: Optional[int] = TEXTURE_GRAY_LEVELS,
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate Haralick texture features of a channel within objects in a stack of masks.
+
+    Gray level co-occurrence matrices of all objects are counted at once
+    for four directions at a given scale. Feature names follow
+    CellProfiler MeasureTexture measurements.
+
+    Parameters
+    ----------
+    channel_stack : ndarray
+        Array of shape (N, H, W) with single channel images scaled to [0, 1].
+    mask_stack : ndarray
+        Array of shape (N, H, W) with binary object masks.
+    channel_name : str
+        Name of the channel used in feature names.
+    scale : int, optional, default 3
+        Distance in pixels between pixels of a co-occurring pair.
+    gray_levels : int, optional, default 8
+        Amount of gray levels the channel is quantized to.
+
+    Returns
+    -------
+    dict
+        Dictionary with feature names as keys and arrays of N values as values.
+    """
+    mask_stack = np.asarray(mask_stack, dtype=bool)
+    level_stack = np.clip(
+        (np.asarray(channel_stack) * gray_levels).astype(np.intp), 0, gray_levels - 1
+    )
+    texture_features = {}
+    for direction, (offset_rows, offset_columns) in enumerate(TEXTURE_DIRECTIONS):
+        cooccurrence_matrices = _calculate_cooccurrence_matrices(
+            level_stack,
+            mask_stack,
+            (offset_rows * scale, offset_columns * scale),
+            gray_levels,
+        )
+        haralick_features = _calculate_haralick_features(cooccurrence_matrices)
+        for feature_name, feature_values in zip(
+            TEXTURE_FEATURE_NAMES, haralick_features
+        ):
+            feature_suffix = f"{channel_name}_{scale}_{direction:02d}_{gray_levels}"
+            texture_features[f"Texture_{feature_name}_{feature_suffix}"] = feature_values
+    return texture_features
+
+
+def calculate_intensity_features_data(
+    cell_image_list: Sequence[np.ndarray],
+    mask_list: Sequence[np.ndarray],
+    batch_size: Optional[int] = 1024,
+    texture_scale: Optional[int] = TEXTURE_SCALE,
+    texture_gray_levels: Optional[int] = TEXTURE_GRAY_LEVELS,
+    stain_image_list: Optional[Sequence[Dict[str, np.ndarray]]] = None,
+) -> pd.DataFrame:
+    """
+    Calculate intensity and texture features of stain channels within objects.
+
+    Cell images are separated into hematoxylin and eosin channels,
+    images and masks of the same shape are stacked and processed in batches.
+
+    Parameters
+    ----------
+    cell_image_list : array-like of ndarray
+        List containing RGB cell images.
+    mask_list : array-like of ndarray
+        List containing binary object masks of the cell images.
+    batch_size : int, optional, default 1024
+        Maximum amount of images processed at once.
+    texture_scale : int, optional, default 3
+        Distance in pixels between pixels of a co-occurring pair.
+    texture_gray_levels : int, optional, default 8
+        Amount of gray levels the channels are quantized to for texture features.
+    stain_image_list : array-like of dict, optional, default None
+        List containing stain channels of the cell images returned by
+        separate_stains, used instead of separating stains of cell_image_list,
+        so that channels separated once are shared by masks of several objects.
+
+    Returns
+    -------
+    DataFrame
+        DataFrame with a row of intensity and texture features for every mask.
+    """
+    shape_groups = {}
+    for i, mask in enumerate(mask_list):
+        shape_groups.setdefault(np.shape(mask), []).append(i)
+    feature_batches = []
+    for mask_indices in shape_groups.values():
+        for start in range(0, len(mask_indices), batch_size):
+            batch_indices = mask_indices[start : start + batch_size]
+            mask_stack = np.stack([mask_list[i] for i in batch_indices]) != 0
+            if stain_image_list is None:
+                stain_stacks = separate_stains(
+                    np.stack([cell_image_list[i] for i in batch_indices])
+                )
+            else:
+                stain_stacks = {
+                    stain_name: np.stack(
+                        [stain_image_list[i][stain_name] for i in batch_indices]
+                    )
+                    for stain_name in STAIN_NAMES
+                }
+            batch_features = {}
+            for stain_name, stain_stack in stain_stacks.items():
+                batch_features.update(
+                    calculate_intensity_features(stain_stack, mask_stack, stain_name)
+                )
+            for stain_name, stain_stack in stain_stacks.items():
+                batch_features.update(
+                    calculate_texture_features(
+                        stain_stack,
+                        mask_stack,
+                        stain_name,
+                        texture_scale,
+                        texture_gray_levels,
+                    )
+                )
+            feature_batches.append(pd.DataFrame(batch_features, index=batch_indices))
+    if not feature_batches:
+        return pd.DataFrame()
+    return pd.concat(feature_batches).sort_index()
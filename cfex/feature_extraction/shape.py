@@ -0,0 +1,281 @@
+import numpy as np
+import pandas as pd
+from math import factorial
+from scipy.ndimage import binary_erosion, convolve
+from skimage.morphology import convex_hull_image
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# weights of border pixel configurations, as in skimage.measure.perimeter
+# with 4-connectivity, indexed by the convolution of the border with PERIMETER_KERNEL
+PERIMETER_KERNEL = np.array([[10, 2, 10], [2, 1, 2], [10, 2, 10]], dtype=np.uint8)
+PERIMETER_WEIGHTS = np.zeros(50, dtype=np.float64)
+PERIMETER_WEIGHTS[[5, 7, 15, 17, 25, 27]] = 1
+PERIMETER_WEIGHTS[[21, 33]] = np.sqrt(2)
+PERIMETER_WEIGHTS[[13, 23]] = (1 + np.sqrt(2)) / 2
+
+ZERNIKE_DEGREE = 9
+
+
+def _get_zernike_indices(degree: int) -> List[Tuple[int, int]]:
+    return [
+        (n, m) for n in range(degree + 1) for m in range(n + 1) if (n - m) % 2 == 0
+    ]
+
+
+def _calculate_raw_moments(
+    mask_stack: np.ndarray, order: int
+) -> Dict[Tuple[int, int], np.ndarray]:
+    rows = np.arange(mask_stack.shape[1], dtype=np.float64)
+    columns = np.arange(mask_stack.shape[2], dtype=np.float64)
+    row_sums = mask_stack.sum(axis=2, dtype=np.float64)
+    column_sums = mask_stack.sum(axis=1, dtype=np.float64)
+    moments = {}
+    for p in range(order + 1):
+        for q in range(order + 1 - p):
+            if q == 0:
+                moments[p, q] = row_sums @ rows**p
+            elif p == 0:
+                moments[p, q] = column_sums @ columns**q
+            else:
+                moments[p, q] = np.einsum(
+                    "nhw,h,w->n", mask_stack, rows**p, columns**q, optimize=True
+                )
+    return moments
+
+
+def _calculate_central_moments(
+    moments: Dict[Tuple[int, int], np.ndarray], centroid_rows, centroid_columns
+) -> Dict[Tuple[int, int], np.ndarray]:
+    r, c = centroid_rows, centroid_columns
+    m = moments
+    return {
+        (2, 0): m[2, 0] - r * m[1, 0],
+        (0, 2): m[0, 2] - c * m[0, 1],
+        (1, 1): m[1, 1] - r * m[0, 1],
+        (3, 0): m[3, 0] - 3 * r * m[2, 0] + 2 * r**2 * m[1, 0],
+        (0, 3): m[0, 3] - 3 * c * m[0, 2] + 2 * c**2 * m[0, 1],
+        (2, 1): m[2, 1] - 2 * r * m[1, 1] - c * m[2, 0] + 2 * r**2 * m[0, 1],
+        (1, 2): m[1, 2] - 2 * c * m[1, 1] - r * m[0, 2] + 2 * c**2 * m[1, 0],
+    }
+
+
+def _calculate_hu_moments(
+    central_moments: Dict[Tuple[int, int], np.ndarray], area: np.ndarray
+) -> List[np.ndarray]:
+    nu = {
+        (p, q): moment / area ** ((p + q) / 2 + 1)
+        for (p, q), moment in central_moments.items()
+    }
+    t0 = nu[3, 0] + nu[1, 2]
+    t1 = nu[2, 1] + nu[0, 3]
+    q0 = nu[3, 0] - 3 * nu[1, 2]
+    q1 = 3 * nu[2, 1] - nu[0, 3]
+    return [
+        nu[2, 0] + nu[0, 2],
+        (nu[2, 0] - nu[0, 2]) ** 2 + 4 * nu[1, 1] ** 2,
+        q0**2 + q1**2,
+        t0**2 + t1**2,
+        q0 * t0 * (t0**2 - 3 * t1**2) + q1 * t1 * (3 * t0**2 - t1**2),
+        (nu[2, 0] - nu[0, 2]) * (t0**2 - t1**2) + 4 * nu[1, 1] * t0 * t1,
+        q1 * t0 * (t0**2 - 3 * t1**2) - q0 * t1 * (3 * t0**2 - t1**2),
+    ]
+
+
+def _calculate_perimeters(mask_stack: np.ndarray) -> np.ndarray:
+    structure = np.array([[[0, 1, 0], [1, 1, 1], [0, 1, 0]]], dtype=bool)
+    eroded_stack = binary_erosion(mask_stack, structure, border_value=0)
+    border_stack = mask_stack.astype(np.uint8) - eroded_stack
+    perimeter_stack = convolve(
+        border_stack, PERIMETER_KERNEL[np.newaxis], mode="constant", cval=0
+    )
+    return PERIMETER_WEIGHTS[perimeter_stack].sum(axis=(1, 2))
+
+
+def _calculate_zernike_moments(
+    mask_stack: np.ndarray,
+    centroid_rows: np.ndarray,
+    centroid_columns: np.ndarray,
+    degree: int,
+) -> Dict[Tuple[int, int], np.ndarray]:
+    # polynomials are evaluated on object pixels only and summed per object
+    object_indices, pixel_rows, pixel_columns = np.nonzero(mask_stack)
+    delta_rows = pixel_rows - centroid_rows[object_indices]
+    delta_columns = pixel_columns - centroid_columns[object_indices]
+    distances = np.hypot(delta_rows, delta_columns)
+    object_count = len(mask_stack)
+    # objects are scaled into a unit disc around their centroid
+    radii = np.zeros(object_count, dtype=np.float64)
+    np.maximum.at(radii, object_indices, distances)
+    radii = np.maximum(radii, 1)
+    rho = distances / radii[object_indices]
+    theta = np.arctan2(delta_rows, delta_columns)
+    rho_powers = [np.ones_like(rho)]
+    for _ in range(degree):
+        rho_powers.append(rho_powers[-1] * rho)
+    disc_areas = np.pi * radii**2
+    zernike_moments = {}
+    for n, m in _get_zernike_indices(degree):
+        radial_polynomial = np.zeros_like(rho)
+        for k in range((n - m) // 2 + 1):
+            coefficient = (-1) ** k * factorial(n - k)
+            coefficient /= (
+                factorial(k)
+                * factorial((n + m) // 2 - k)
+                * factorial((n - m) // 2 - k)
+            )
+            radial_polynomial += coefficient * rho_powers[n - 2 * k]
+        real_part = np.bincount(
+            object_indices,
+            weights=radial_polynomial * np.cos(m * theta),
+            minlength=object_count,
+        )
+        imaginary_part = np.bincount(
+            object_indices,
+            weights=radial_polynomial * np.sin(m * theta),
+            minlength=object_count,
+        )
+        zernike_moments[n, m] = np.hypot(real_part, imaginary_part) / disc_areas
+    return zernike_moments
+
+
+def _calculate_convex_areas(mask_stack: np.ndarray) -> np.ndarray:
+    convex_areas = np.zeros(len(mask_stack), dtype=np.float64)
+    for i, mask in enumerate(mask_stack):
+        rows = np.flatnonzero(mask.any(axis=1))
+        columns = np.flatnonzero(mask.any(axis=0))
+        if len(rows):
+            # the hull is filled only within the bounding box of the object
+            object_mask = mask[rows[0] : rows[-1] + 1, columns[0] : columns[-1] + 1]
+            convex_areas[i] = convex_hull_image(object_mask).sum()
+    return convex_areas
+
+
+def calculate_shape_features(
+    mask_stack: np.ndarray, zernike_degree: Optional[int] = ZERNIKE_DEGREE
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate shape features of objects in a stack of binary masks of the same shape.
+
+    Features are computed for the whole stack at once from image moments,
+    following definitions of skimage.measure.regionprops and names of
+    CellProfiler MeasureObjectSizeShape measurements.
+    Zernike moments are calculated in a unit disc centered on the object centroid.
+    Features of empty masks are NaN.
+
+    Parameters
+    ----------
+    mask_stack : ndarray
+        Array of shape (N, H, W) with binary object masks.
+    zernike_degree : int, optional, default 9
+        Highest degree of calculated Zernike moments.
+
+    Returns
+    -------
+    dict
+        Dictionary with feature names as keys and arrays of N values as values.
+    """
+    mask_stack = np.asarray(mask_stack) != 0
+    mask_values = mask_stack.view(np.uint8)
+    moments = _calculate_raw_moments(mask_values, order=3)
+    area = moments[0, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        centroid_rows = moments[1, 0] / area
+        centroid_columns = moments[0, 1] / area
+        central_moments = _calculate_central_moments(
+            moments, centroid_rows, centroid_columns
+        )
+        # eigenvalues of the inertia tensor of the object
+        mu_rows = central_moments[2, 0] / area
+        mu_columns = central_moments[0, 2] / area
+        mu_mixed = central_moments[1, 1] / area
+        mean_inertia = (mu_rows + mu_columns) / 2
+        inertia_spread = np.sqrt(((mu_rows - mu_columns) / 2) ** 2 + mu_mixed**2)
+        major_inertia = mean_inertia + inertia_spread
+        minor_inertia = np.maximum(mean_inertia - inertia_spread, 0)
+        eccentricity = np.where(
+            major_inertia > 0, np.sqrt(1 - minor_inertia / major_inertia), 0
+        )
+        orientation = np.where(
+            mu_rows == mu_columns,
+            np.where(mu_mixed > 0, -np.pi / 4, np.pi / 4),
+            0.5 * np.arctan2(2 * mu_mixed, mu_rows - mu_columns),
+        )
+        perimeter = _calculate_perimeters(mask_stack)
+        convex_area = _calculate_convex_areas(mask_stack)
+        rows_any = mask_stack.any(axis=2)
+        columns_any = mask_stack.any(axis=1)
+        bounding_box_area = (
+            rows_any.shape[1]
+            - rows_any[:, ::-1].argmax(axis=1)
+            - rows_any.argmax(axis=1)
+        ) * (
+            columns_any.shape[1]
+            - columns_any[:, ::-1].argmax(axis=1)
+            - columns_any.argmax(axis=1)
+        )
+        shape_features = {
+            "AreaShape_Area": area,
+            "AreaShape_BoundingBoxArea": bounding_box_area.astype(np.float64),
+            "AreaShape_ConvexArea": convex_area,
+            "AreaShape_Eccentricity": eccentricity,
+            "AreaShape_EquivalentDiameter": np.sqrt(4 * area / np.pi),
+            "AreaShape_Extent": area / bounding_box_area,
+            "AreaShape_FormFactor": 4 * np.pi * area / perimeter**2,
+            "AreaShape_MajorAxisLength": 4 * np.sqrt(major_inertia),
+            "AreaShape_MinorAxisLength": 4 * np.sqrt(minor_inertia),
+            "AreaShape_Orientation": np.degrees(orientation),
+            "AreaShape_Perimeter": perimeter,
+            "AreaShape_Solidity": area / convex_area,
+        }
+        hu_moments = _calculate_hu_moments(central_moments, area)
+        for i, hu_moment in enumerate(hu_moments):
+            shape_features[f"AreaShape_HuMoment_{i}"] = hu_moment
+        zernike_moments = _calculate_zernike_moments(
+            mask_stack, centroid_rows, centroid_columns, zernike_degree
+        )
+        for (n, m), zernike_moment in zernike_moments.items():
+            shape_features[f"AreaShape_Zernike_{n}_{m}"] = zernike_moment
+    empty_masks = area == 0
+    for feature_values in shape_features.values():
+        feature_values[empty_masks] = np.nan
+    return shape_features
+
+
+def calculate_shape_features_data(
+    mask_list: Sequence[np.ndarray],
+    batch_size: Optional[int] = 1024,
+    zernike_degree: Optional[int] = ZERNIKE_DEGREE,
+) -> pd.DataFrame:
+    """
+    Calculate shape features of objects in a list of binary masks.
+
+    Masks of the same shape are stacked and processed in batches.
+
+    Parameters
+    ----------
+    mask_list : array-like of ndarray
+        List containing binary object masks.
+    batch_size : int, optional, default 1024
+        Maximum amount of masks processed at once.
+    zernike_degree : int, optional, default 9
+        Highest degree of calculated Zernike moments.
+
+    Returns
+    -------
+    DataFrame
+        DataFrame with a row of shape features for every mask.
+    """
+    shape_groups = {}
+    for i, mask in enumerate(mask_list):
+        shape_groups.setdefault(np.shape(mask), []).append(i)
+    feature_batches = []
+    for mask_indices in shape_groups.values():
+        for start in range(0, len(mask_indices), batch_size):
+            batch_indices = mask_indices[start : start + batch_size]
+            shape_features = calculate_shape_features(
+                np.stack([mask_list[i] for i in batch_indices]), zernike_degree
+            )
+            feature_batches.append(pd.DataFrame(shape_features, index=batch_indices))
+    if not feature_batches:
+        return pd.DataFrame()
+    return pd.concat(feature_batches).sort_index()
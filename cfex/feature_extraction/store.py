@@ -0,0 +1,198 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+
+FEATURE_STORE_MANIFEST_FILENAME = "manifest.json"
+FEATURE_STORE_PARTITION_COLUMN = "SlideName"
+FEATURE_STORE_VERSION = 1
+
+
+def downcast_cell_features_data(cell_features_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast floating point cell features to float32 and name the row index CellId.
+
+    Parameters
+    ----------
+    cell_features_data : DataFrame
+        DataFrame with a row of features for every cell.
+
+    Returns
+    -------
+    DataFrame
+        Downcast copy of cell features data.
+    """
+    float_columns = cell_features_data.select_dtypes(include="float").columns
+    return cell_features_data.astype(
+        dict.fromkeys(float_columns, np.float32)
+    ).rename_axis(index="CellId")
+
+
+def _write_manifest(store_path: Path, manifest: Dict):
+    # the manifest is replaced at once, so readers never see it partially written
+    manifest_path = store_path / FEATURE_STORE_MANIFEST_FILENAME
+    manifest_tmp_path = manifest_path.with_suffix(".json.tmp")
+    with open(manifest_tmp_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(manifest_tmp_path, manifest_path)
+
+
+def load_cell_features_store_manifest(store_path: Union[str, Path]) -> Dict:
+    """
+    Load the manifest of a cell features store.
+
+    The manifest lists feature columns of the store and Parquet part files
+    with row counts for every slide.
+
+    Parameters
+    ----------
+    store_path : str or Path
+        Path to the cell features store directory.
+
+    Returns
+    -------
+    dict
+        Manifest of the store, empty slides and columns if the store does not exist.
+    """
+    manifest_path = Path(store_path) / FEATURE_STORE_MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return {
+            "version": FEATURE_STORE_VERSION,
+            "partition_column": FEATURE_STORE_PARTITION_COLUMN,
+            "columns": None,
+            "slides": {},
+        }
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def append_cell_features_store(
+    cell_features_data: pd.DataFrame,
+    store_path: Union[str, Path],
+    append_id: Optional[str] = None,
+) -> List[Path]:
+    """
+    Append cell features to a store partitioned by slide.
+
+    Rows of every slide are written to a new Parquet part file
+    SlideName=<slide name>/part-<number>.parquet and the manifest is updated
+    after all parts are written. Existing parts are never rewritten.
+    The store supports a single writer at a time.
+
+    Parameters
+    ----------
+    cell_features_data : DataFrame
+        DataFrame with a row of features for every cell and a SlideName column,
+        its columns have to match columns already present in the store.
+    store_path : str or Path
+        Path to the cell features store directory, created if it does not exist.
+    append_id : str, optional, default None
+        Identifier of the appended data recorded with its parts, slides that
+        already have a part with the same identifier are skipped, so repeating
+        the append of an interrupted run does not duplicate rows.
+
+    Returns
+    -------
+    list of Path
+        Paths to the written part files.
+    """
+    store_path = Path(store_path)
+    store_path.mkdir(parents=True, exist_ok=True)
+    manifest = load_cell_features_store_manifest(store_path)
+    cell_features_data = downcast_cell_features_data(cell_features_data)
+    feature_columns = [
+        column
+        for column in cell_features_data.columns
+        if column != FEATURE_STORE_PARTITION_COLUMN
+    ]
+    if manifest["columns"] is None:
+        manifest["columns"] = feature_columns
+    elif manifest["columns"] != feature_columns:
+        raise ValueError(
+            f"Cell features columns do not match columns of the store: {store_path}"
+        )
+    part_paths = []
+    for slide_name, slide_features_data in cell_features_data.groupby(
+        FEATURE_STORE_PARTITION_COLUMN, sort=False
+    ):
+        slide_entry = manifest["slides"].setdefault(
+            str(slide_name), {"rows": 0, "parts": []}
+        )
+        if append_id is not None and any(
+            part.get("append_id") == append_id for part in slide_entry["parts"]
+        ):
+            continue
+        partition_path = store_path / f"{FEATURE_STORE_PARTITION_COLUMN}={slide_name}"
+        partition_path.mkdir(exist_ok=True)
+        part_path = partition_path / f"part-{len(slide_entry['parts']):05d}.parquet"
+        part_tmp_path = part_path.with_suffix(".parquet.tmp")
+        slide_features_data[feature_columns].to_parquet(part_tmp_path, engine="pyarrow")
+        os.replace(part_tmp_path, part_path)
+        rows = len(slide_features_data.index)
+        slide_entry["parts"].append(
+            {
+                "path": part_path.relative_to(store_path).as_posix(),
+                "rows": rows,
+                "append_id": append_id,
+            }
+        )
+        slide_entry["rows"] += rows
+        part_paths.append(part_path)
+    _write_manifest(store_path, manifest)
+    return part_paths
+
+
+def load_cell_features_store(
+    store_path: Union[str, Path],
+    slide_names: Optional[Sequence[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Load cell features of selected slides and columns from a store.
+
+    Only part files of selected slides listed in the manifest are read
+    and only selected columns are read from them.
+
+    Parameters
+    ----------
+    store_path : str or Path
+        Path to the cell features store directory.
+    slide_names : array-like of str, optional, default None
+        Names of loaded slides, all slides are loaded by default.
+    columns : array-like of str, optional, default None
+        Names of loaded feature columns, all columns are loaded by default.
+
+    Returns
+    -------
+    DataFrame
+        DataFrame indexed by CellId with selected columns and a SlideName column.
+    """
+    store_path = Path(store_path)
+    manifest = load_cell_features_store_manifest(store_path)
+    if slide_names is None:
+        slide_names = list(manifest["slides"])
+    missing_slide_names = set(slide_names) - set(manifest["slides"])
+    if missing_slide_names:
+        raise KeyError(f"Slides not found in the store: {sorted(missing_slide_names)}")
+    if columns is not None:
+        columns = list(columns)
+        missing_columns = set(columns) - set(manifest["columns"] or [])
+        if missing_columns:
+            raise KeyError(f"Columns not found in the store: {sorted(missing_columns)}")
+    slide_features = []
+    for slide_name in slide_names:
+        for part in manifest["slides"][slide_name]["parts"]:
+            part_features_data = pd.read_parquet(
+                store_path / part["path"], engine="pyarrow", columns=columns
+            )
+            part_features_data[FEATURE_STORE_PARTITION_COLUMN] = slide_name
+            slide_features.append(part_features_data)
+    if not slide_features:
+        return pd.DataFrame(
+            columns=(columns or manifest["columns"] or [])
+            + [FEATURE_STORE_PARTITION_COLUMN]
+        )
+    return pd.concat(slide_features)
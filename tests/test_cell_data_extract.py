@@ -0,0 +1,57 @@
+import io
+import json
+
+import pytest
+
+from cfex.cell_data.extract import _iter_json_array_items, extract_cell_data
+
+
+def _create_feature(i):
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[i, 0], [i + 8, 0], [i + 8, 8], [i, 8], [i, 0]]],
+        },
+        "nucleusGeometry": {
+            "type": "Polygon",
+            "coordinates": [[[i + 2, 2], [i + 6, 2], [i + 6, 6], [i + 2, 2]]],
+        },
+        "properties": {
+            "classification": {"name": "Tumor"},
+            "measurements": {"Nucleus: Area µm^2": 1.5 + i, "Cell: Ø µm": i},
+        },
+    }
+
+
+@pytest.fixture
+def feature_collection_path(tmp_path):
+    feature_collection = {
+        "type": "FeatureCollection",
+        "features": [_create_feature(i) for i in range(5)],
+    }
+    path = tmp_path / "cells.geojson"
+    path.write_text(json.dumps(feature_collection, ensure_ascii=False), "utf-8")
+    return path
+
+
+@pytest.mark.parametrize("buffer_size", [1, 2, 3, 5, 7, 64])
+def test_iter_json_array_items_binary_non_ascii(feature_collection_path, buffer_size):
+    expected = json.loads(feature_collection_path.read_text("utf-8"))["features"]
+    with open(feature_collection_path, "rb") as data:
+        features = list(_iter_json_array_items(data, buffer_size=buffer_size))
+    assert features == expected
+
+
+def test_iter_json_array_items_binary_array():
+    expected = [_create_feature(i) for i in range(5)]
+    data = io.BytesIO(json.dumps(expected, ensure_ascii=False).encode("utf-8"))
+    assert list(_iter_json_array_items(data, buffer_size=3)) == expected
+
+
+def test_extract_cell_data_binary_measurements(feature_collection_path):
+    with open(feature_collection_path, "rb") as data:
+        cell_data = extract_cell_data(data, "qupath", extract_measurements=True)
+    assert len(cell_data.index) == 5
+    assert cell_data["NucleusAreaµm2"].tolist() == [1.5, 2.5, 3.5, 4.5, 5.5]
+
@@ -0,0 +1,35 @@
+import numpy as np
+
+from cfex.cell_data.geometry import (
+    calculate_adaptive_cell_roi_bounding_boxes,
+    calculate_bounding_boxes,
+    calculate_centroids,
+)
+
+
+def _calculate_adaptive_boxes(polygons, padding=8):
+    return calculate_adaptive_cell_roi_bounding_boxes(
+        calculate_centroids(polygons), calculate_bounding_boxes(polygons), padding
+    )
+
+
+def _create_square(x, y, side):
+    return np.array([[x, y], [x + side, y], [x + side, y + side], [x, y + side]])
+
+
+def test_adaptive_boxes_rounded_to_bucket_sizes():
+    boxes = _calculate_adaptive_boxes([_create_square(100, 100, 10)])
+    # half extent of 6 plus padding of 8 on both sides fits the 32 bucket
+    np.testing.assert_array_equal(boxes, [[89, 89, 32, 32]])
+
+
+def test_adaptive_boxes_of_large_cells_are_not_clipped():
+    polygons = [_create_square(500, 500, 300), _create_square(1000, 1000, 190)]
+    boxes = _calculate_adaptive_boxes(polygons)
+    # larger than the 192 bucket, rounded up to its multiple
+    np.testing.assert_array_equal(boxes[:, 2:], [[384, 384], [384, 384]])
+    object_boxes = calculate_bounding_boxes(polygons)
+    assert (boxes[:, :2] <= object_boxes[:, :2]).all()
+    assert (
+        boxes[:, :2] + boxes[:, 2:] >= object_boxes[:, :2] + object_boxes[:, 2:]
+    ).all()
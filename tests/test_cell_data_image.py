@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("slideio")
+
+from cfex.cell_data import image
+from cfex.cell_data.cache import TileCache
+
+
+class _Scene:
+    # a slide reader refusing blocks that are not entirely inside the slide
+    rect = (0, 0, 300, 200)
+    num_channels = 3
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        self.pixels = rng.integers(0, 256, (200, 300, 3), dtype=np.uint8)
+
+    def read_block(self, rect):
+        x, y, width, height = rect
+        assert x >= 0 and y >= 0 and x + width <= 300 and y + height <= 200
+        return self.pixels[y : y + height, x : x + width].copy()
+
+
+def _create_cell_data(centroids):
+    square = np.array([[-4, -4], [4, -4], [4, 4], [-4, 4]])
+    return pd.DataFrame({"CellPolygon": [square + centroid for centroid in centroids]})
+
+
+@pytest.mark.parametrize("read_mode", ["cell", "tile"])
+def test_load_cell_images_slide_border(monkeypatch, read_mode):
+    scene = _Scene()
+    monkeypatch.setattr(
+        image, "_open_scene_slideio", lambda wsi_path, scene_storage: scene
+    )
+    # cells at every border and corner of the slide and one inside it
+    cell_data = _create_cell_data(
+        [(5, 5), (150, 3), (296, 100), (150, 197), (2, 198), (298, 2), (150, 100)]
+    )
+    uncached_images = image._load_cell_images_slideio(
+        "slide.svs", cell_data, 20, False, read_mode=read_mode, tile_size=64
+    )
+    cached_images = image._load_cell_images_slideio(
+        "slide.svs",
+        cell_data,
+        20,
+        False,
+        read_mode=read_mode,
+        tile_size=64,
+        tile_cache=TileCache(tile_size=64),
+    )
+    for uncached_image, cached_image in zip(uncached_images, cached_images):
+        assert uncached_image.shape == (40, 40, 3)
+        np.testing.assert_array_equal(uncached_image, cached_image)
+    # pixels outside of the slide are zeros
+    assert not uncached_images[0][:15, :15].any()
+    np.testing.assert_array_equal(uncached_images[0][15:, 15:], scene.pixels[:25, :25])
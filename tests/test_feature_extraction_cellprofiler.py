@@ -0,0 +1,101 @@
+import sys
+import types
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cfex.feature_extraction.extract import _run_pipeline_in_memory_cellprofiler
+
+
+class _FailingModule:
+    module_name = "MeasureObjectSizeShape"
+
+    def is_input_module(self):
+        return False
+
+    def run(self, workspace):
+        raise KeyError("Color")
+
+
+class _Pipeline:
+    def load(self, path):
+        pass
+
+    def modules(self):
+        return [_FailingModule()]
+
+
+class _Measurements:
+    def add_image_measurement(self, name, value):
+        pass
+
+    def next_image_set(self, image_set_number):
+        pass
+
+
+class _ImageSetList:
+    def get_image_set(self, i):
+        return types.SimpleNamespace(add=lambda name, image: None)
+
+
+class _ObjectSet:
+    def add_objects(self, objects, name):
+        pass
+
+
+@pytest.fixture
+def cellprofiler_core(monkeypatch):
+    # only the parts of cellprofiler_core used by the in-memory pipeline
+    modules = {
+        "cellprofiler_core": types.ModuleType("cellprofiler_core"),
+        "cellprofiler_core.image": types.SimpleNamespace(
+            ImageSetList=_ImageSetList, Image=lambda image: image
+        ),
+        "cellprofiler_core.measurement": types.SimpleNamespace(
+            Measurements=_Measurements
+        ),
+        "cellprofiler_core.object": types.SimpleNamespace(
+            ObjectSet=_ObjectSet, Objects=types.SimpleNamespace
+        ),
+        "cellprofiler_core.pipeline": types.SimpleNamespace(Pipeline=_Pipeline),
+        "cellprofiler_core.preferences": types.SimpleNamespace(
+            set_headless=lambda: None
+        ),
+        "cellprofiler_core.workspace": types.SimpleNamespace(
+            Workspace=lambda *args: None
+        ),
+    }
+    for name, module in modules.items():
+        monkeypatch.setitem(sys.modules, name, module)
+        if "." in name:
+            monkeypatch.setattr(
+                modules["cellprofiler_core"], name.split(".")[1], module, raising=False
+            )
+
+
+def _create_cell_data(cell_count):
+    return pd.DataFrame(
+        {
+            "NucleusPolygon": [
+                np.array([[i, 2], [i + 4, 2], [i + 4, 6], [i, 6]])
+                for i in range(cell_count)
+            ],
+            "WSI": "slide",
+            "ColorImage": [np.zeros((8, 8, 3), np.uint8)] * cell_count,
+            "NucleusMask": [np.ones((8, 8), np.uint8)] * cell_count,
+            "OutlineMask": [np.ones((8, 8), np.uint8)] * cell_count,
+        }
+    )
+
+
+def test_run_pipeline_in_memory_fails_for_all_cells(cellprofiler_core, caplog):
+    with caplog.at_level(logging.WARNING), pytest.raises(
+        RuntimeError, match="failed for all cells"
+    ):
+        _run_pipeline_in_memory_cellprofiler(
+            _create_cell_data(3), pipeline_path=Path("pipeline.cppipe")
+        )
+    assert len(caplog.records) == 3